@@ -0,0 +1,312 @@
+"""Benchmark the workflow, retrieval, loader and splitters against local fakes.
+
+    python -m benchmarks.bench_suite [--scale 1k|100k|1m] [--suites workflow,retrieval,loader,splitters]
+        [--queries 200] [--concurrency 4] [--llm-latency 0.05] [--tavily-latency 0.1] [--output report.json]
+
+Gemini, Tavily and the embedding model are replaced by the deterministic
+fakes in ``benchmarks.fakes``, and the corpus is generated from a seed, so
+two runs of the same command differ only by the code under test. Stores and
+caches live in a temporary directory.
+
+- workflow: ``LegalWorkflow.process_query`` over a small indexed corpus
+  (``--workflow-chunks``); latency is dominated by the configured fake
+  LLM and search latencies, so it measures orchestration overhead.
+- retrieval: indexes ``--scale`` chunks into the local vector store and the
+  BM25 index, then times ``RetrievalChain._retrieve_documents``.
+- loader: writes enough synthetic agreements for ``--scale`` chunks and
+  times ``DocumentLoader.load_directory``.
+- splitters: times ``LegalChunker``, ``RecursiveCharacterTextSplitter`` and
+  ``split_offsets`` per document over the same documents.
+
+Each suite runs in a fresh process so its peak RSS is its own. The report
+is JSON with p50/p95/p99 latency, QPS and peak RSS per suite; compare two
+reports with ``python -m benchmarks.compare``.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Sequence
+
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from benchmarks.corpus import SCALES, synthetic_chunks, synthetic_documents, synthetic_queries, write_documents
+from benchmarks.fakes import FakeGeminiChatModel, HashingEmbeddings, install_fakes
+from config import CHUNK_OVERLAP, CHUNK_SIZE
+from src.chains.retrieval_chain import RetrievalChain
+from src.graphs.workflow import LegalWorkflow
+from src.utils.document_loader import DocumentLoader
+from src.utils.legal_chunker import LegalChunker
+from src.utils.registry import get_registry
+from src.utils.text_splitter import split_offsets
+
+INDEX_BATCH_SIZE = 10_000
+
+
+def peak_rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    """Peak resident set size so far (ru_maxrss is KiB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(who).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def latency_summary(latencies: Sequence[float], seconds: float, errors: int = 0) -> Dict[str, Any]:
+    """Percentiles in milliseconds and throughput for a list of per-request seconds."""
+    summary = {"count": len(latencies), "errors": errors, "seconds": round(seconds, 3),
+               "qps": round(len(latencies) / seconds, 2) if seconds else None}
+    if latencies:
+        millis = np.asarray(latencies) * 1000
+        p50, p95, p99 = np.percentile(millis, [50, 95, 99])
+        summary.update({"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3),
+                        "mean_ms": round(float(millis.mean()), 3), "max_ms": round(float(millis.max()), 3)})
+    return summary
+
+
+def run_load(fn: Callable[[Any], Any], items: Sequence[Any], concurrency: int = 1):
+    """Call ``fn`` on every item from ``concurrency`` threads (closed loop).
+
+    Returns:
+        Tuple[Dict, List]: The latency summary and the results (None where fn raised)
+    """
+    def timed(item):
+        started = time.perf_counter()
+        try:
+            result = fn(item)
+        except Exception as e:
+            logging.getLogger(__name__).warning(f"Benchmark request failed: {str(e)}")
+            return time.perf_counter() - started, None, True
+        return time.perf_counter() - started, result, False
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        outcomes = list(executor.map(timed, items))
+    seconds = time.perf_counter() - started
+    latencies = [latency for latency, _, failed in outcomes if not failed]
+    summary = latency_summary(latencies, seconds, errors=sum(failed for _, _, failed in outcomes))
+    return summary, [result for _, result, _ in outcomes]
+
+
+def index_corpus(chunks: Iterable, hybrid: bool = True) -> Dict[str, Any]:
+    """Add chunks to the registry's vector store (and BM25 index) in batches."""
+    registry = get_registry()
+    vector_store = registry.get_vector_store()
+    lexical_index = registry.get_lexical_index() if hybrid else None
+    chunks = iter(chunks)
+    count = 0
+    started = time.perf_counter()
+    while True:
+        batch = list(islice(chunks, INDEX_BATCH_SIZE))
+        if not batch:
+            break
+        vector_store.add_documents(batch)
+        if lexical_index is not None:
+            lexical_index.add_documents(batch)
+        count += len(batch)
+    seconds = time.perf_counter() - started
+    return {"chunks": count, "seconds": round(seconds, 3),
+            "chunks_per_second": round(count / seconds, 1) if seconds else None}
+
+
+def _mean(values: Iterable[float]):
+    values = list(values)
+    return round(float(np.mean(values)), 2) if values else None
+
+
+def bench_workflow(options: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+    llm = FakeGeminiChatModel(latency=options["llm_latency"], token_latency=options["token_latency"],
+                              output_tokens=options["output_tokens"])
+    install_fakes(get_registry(), workdir, llm=llm, embeddings=HashingEmbeddings(options["dimensions"]),
+                  tavily_latency=options["tavily_latency"])
+    index = index_corpus(synthetic_chunks(options["workflow_chunks"], options["seed"]))
+    workflow = LegalWorkflow(use_cache=False)
+    queries = synthetic_queries(options["queries"], options["seed"])
+    summary, results = run_load(workflow.process_query, queries, options["concurrency"])
+
+    answered = [result for result in results if result is not None]
+    return {
+        "corpus_chunks": index["chunks"],
+        "latency": summary,
+        "errors_in_results": sum(1 for result in answered if result.get("error")),
+        "timed_out": sum(1 for result in answered if result.get("timed_out")),
+        "mean_llm_calls": _mean(result["llm_calls"] for result in answered),
+        "mean_search_calls": _mean(result["search_calls"] for result in answered),
+        "input_tokens": sum(result.get("tokens", {}).get("input", 0) for result in answered),
+        "output_tokens": sum(result.get("tokens", {}).get("output", 0) for result in answered),
+    }
+
+
+def bench_retrieval(options: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+    install_fakes(get_registry(), workdir, embeddings=HashingEmbeddings(options["dimensions"]))
+    index = index_corpus(synthetic_chunks(options["chunks"], options["seed"]))
+    chain = RetrievalChain()
+    summary, _ = run_load(chain._retrieve_documents, synthetic_queries(options["queries"], options["seed"]),
+                          options["concurrency"])
+    return {"index": index, "latency": summary}
+
+
+def _chunks_per_document(seed: int) -> int:
+    sample = next(synthetic_documents(1, seed))
+    return max(1, len(LegalChunker(CHUNK_SIZE, CHUNK_OVERLAP).split_text(sample)))
+
+
+def bench_loader(options: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+    files = max(1, options["chunks"] // _chunks_per_document(options["seed"]))
+    started = time.perf_counter()
+    write_documents(workdir / "documents", files, options["seed"])
+    setup_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    chunks = DocumentLoader().load_directory(str(workdir / "documents"))
+    seconds = time.perf_counter() - started
+    return {
+        "files": files,
+        "chunks": len(chunks),
+        "setup_seconds": round(setup_seconds, 3),
+        "seconds": round(seconds, 3),
+        "files_per_second": round(files / seconds, 1),
+        "chunks_per_second": round(len(chunks) / seconds, 1),
+        "peak_children_rss_mb": peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def bench_splitters(options: Dict[str, Any], workdir: Path) -> Dict[str, Any]:
+    documents = max(1, options["chunks"] // _chunks_per_document(options["seed"]))
+    splitters = {
+        "legal_chunker": LegalChunker(CHUNK_SIZE, CHUNK_OVERLAP).split_text,
+        "recursive": RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, separators=["\n\n", "\n", ".", " ", ""]
+        ).split_text,
+        "split_offsets": lambda text: split_offsets(text, CHUNK_SIZE, CHUNK_OVERLAP),
+    }
+    results = {}
+    for name, split in splitters.items():
+        latencies, chunks, characters = [], 0, 0
+        for text in synthetic_documents(documents, options["seed"]):
+            started = time.perf_counter()
+            chunks += len(split(text))
+            latencies.append(time.perf_counter() - started)
+            characters += len(text)
+        seconds = sum(latencies)
+        results[name] = {
+            "documents": documents,
+            "chunks": chunks,
+            "latency": latency_summary(latencies, seconds),
+            "mb_per_second": round(characters / seconds / 1e6, 2) if seconds else None,
+        }
+    return results
+
+
+SUITES = {
+    "workflow": bench_workflow,
+    "retrieval": bench_retrieval,
+    "loader": bench_loader,
+    "splitters": bench_splitters,
+}
+
+
+def run_suite(name: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one suite in a scratch directory and add the process's peak RSS."""
+    logging.getLogger().setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            result = SUITES[name](options, Path(temp_dir))
+        finally:
+            get_registry().reset()
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def run_suites(names: Sequence[str], options: Dict[str, Any], isolate: bool = True) -> Dict[str, Any]:
+    """Run suites in order, each in a fresh spawned process unless ``isolate`` is off."""
+    results = {}
+    for name in names:
+        if not isolate:
+            results[name] = run_suite(name, options)
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            results[name] = executor.submit(run_suite, name, options).result()
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """Where and on what commit the report was produced."""
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                                  timeout=60).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k", help="Corpus size in chunks")
+    parser.add_argument("--chunks", type=int, help="Corpus size in chunks (overrides --scale)")
+    parser.add_argument("--suites", default=",".join(SUITES), help="Comma-separated suites to run")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per latency measurement")
+    parser.add_argument("--concurrency", type=int, default=4, help="Queries in flight at once")
+    parser.add_argument("--workflow-chunks", type=int, default=1000, help="Corpus size for the workflow suite")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake Gemini seconds per call")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Fake Gemini seconds per output token")
+    parser.add_argument("--output-tokens", type=int, default=64, help="Fake Gemini tokens per reply")
+    parser.add_argument("--tavily-latency", type=float, default=0.1, help="Fake Tavily seconds per search")
+    parser.add_argument("--dimensions", type=int, default=128, help="Fake embedding dimensions")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-isolate", action="store_true", help="Run every suite in this process")
+    parser.add_argument("--output", type=Path, help="Also write the report to this file")
+    args = parser.parse_args(argv)
+
+    names = [name.strip() for name in args.suites.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SUITES]
+    if unknown:
+        parser.error(f"unknown suites: {', '.join(unknown)}")
+
+    options = {
+        "chunks": args.chunks or SCALES[args.scale],
+        "queries": args.queries,
+        "concurrency": args.concurrency,
+        "workflow_chunks": args.workflow_chunks,
+        "llm_latency": args.llm_latency,
+        "token_latency": args.token_latency,
+        "output_tokens": args.output_tokens,
+        "tavily_latency": args.tavily_latency,
+        "dimensions": args.dimensions,
+        "seed": args.seed,
+    }
+    report = {"environment": environment(), "options": options,
+              "results": run_suites(names, options, isolate=not args.no_isolate)}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Benchmark the offset-based splitter against the original split_text loop.
+
+    python -m benchmarks.bench_text_splitter [--size-mb 500] [--corpus path]
+
+A synthetic legal-style corpus of the requested size is generated unless
+--corpus points at an existing UTF-8 text file. Reports wall time and peak
+RSS growth for each strategy as JSON.
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.text_splitter import MappedTextFile, split_offsets
+
+
+def split_text_loop(text, chunk_size=1000, overlap=100):
+    """The original implementation: a Python loop of string slices."""
+    chunks = []
+    start = 0
+
+    while start < len(text):
+        end = min(start + chunk_size, len(text))
+        chunks.append(text[start:end])
+        start += chunk_size - overlap
+
+    return chunks
+
+
+_WORDS = ("agreement party shall notice term breach liability indemnify warranty licensor "
+          "confidential information obligation court statute section jurisdiction").split()
+
+
+def write_corpus(path: Path, size_mb: int, seed: int = 0):
+    """Write numbered clauses made of sentences until the file reaches size_mb."""
+    rng = random.Random(seed)
+    target = size_mb * 1024 * 1024
+    written = 0
+    section = 0
+    with open(path, "w", encoding="utf-8") as f:
+        while written < target:
+            section += 1
+            lines = [f"\n{section}. {rng.choice(_WORDS).title()}.\n"]
+            for clause in "abcd":
+                sentences = " ".join(
+                    " ".join(rng.choices(_WORDS, k=rng.randint(8, 20))).capitalize() + "."
+                    for _ in range(rng.randint(1, 4))
+                )
+                lines.append(f"{section}.1({clause}) {sentences}\n")
+            block = "".join(lines) + "\n"
+            f.write(block)
+            written += len(block)
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def count_mapped_chunks(path: Path, chunk_size: int, overlap: int, **kwargs) -> int:
+    """Split a file through a memory map, unmapping it before returning."""
+    with MappedTextFile(path, chunk_size, overlap, **kwargs) as mapped:
+        return len(mapped)
+
+
+def measure(name, fn):
+    gc.collect()
+    before = peak_rss_mb()
+    started = time.perf_counter()
+    count = fn()
+    elapsed = time.perf_counter() - started
+    return {"strategy": name, "chunks": count, "seconds": round(elapsed, 3),
+            "peak_rss_growth_mb": round(peak_rss_mb() - before, 1)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=500)
+    parser.add_argument("--corpus", type=Path, help="Existing UTF-8 text file to split instead")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--overlap", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus = args.corpus
+        if corpus is None:
+            corpus = Path(temp_dir) / "corpus.txt"
+            write_corpus(corpus, args.size_mb)
+
+        # Memory-mapped strategies run first so peak RSS is not masked by the loaded string
+        results = [
+            measure("mmap_offsets_separators", lambda: count_mapped_chunks(corpus, args.chunk_size, args.overlap)),
+            measure("mmap_offsets_fixed",
+                    lambda: count_mapped_chunks(corpus, args.chunk_size, args.overlap, separators=None)),
+        ]
+        text = corpus.read_text(encoding="utf-8")
+        results.append(measure("split_text_loop", lambda: len(split_text_loop(text, args.chunk_size, args.overlap))))
+        results.append(measure("str_offsets_fixed",
+                               lambda: len(split_offsets(text, args.chunk_size, args.overlap, separators=None))))
+        size = os.path.getsize(corpus)
+
+    print(json.dumps({"corpus_bytes": size, "chunk_size": args.chunk_size,
+                      "overlap": args.overlap, "results": results}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
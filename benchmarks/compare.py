@@ -0,0 +1,86 @@
+"""Compare two bench_suite reports, e.g. from a base and a feature commit.
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.1]
+
+Prints every latency, throughput and memory metric found in both reports
+with its relative change, leaving out the setup timings of each suite. Exits with status 1 when any metric got worse by
+more than the threshold (a fraction, 0.1 = 10%), so it can gate CI.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Metric name endings and whether a larger value is better
+_HIGHER_IS_BETTER = ("qps", "per_second")
+_LOWER_IS_BETTER = ("_ms", "seconds", "rss_mb")
+# Fixture timings (writing the corpus, filling the index a suite queries) are
+# reported for context only and never gate a comparison
+_SETUP_METRICS = ("setup_seconds",)
+_SETUP_SECTIONS = ("index",)
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a nested report as {"suite.section.metric": value}."""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = float(value)
+    return metrics
+
+
+def direction(metric: str) -> Optional[int]:
+    """1 if higher is better, -1 if lower is better, None for counts, settings and setup."""
+    if metric.endswith(_SETUP_METRICS) or any(section in _SETUP_SECTIONS for section in metric.split(".")[:-1]):
+        return None
+    if metric.endswith(_HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(_LOWER_IS_BETTER):
+        return -1
+    return None
+
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float = 0.1):
+    """Rows of (metric, base, new, relative change, regressed) for the comparable metrics."""
+    base_metrics, new_metrics = flatten(base["results"]), flatten(new["results"])
+    rows = []
+    for metric in sorted(base_metrics.keys() & new_metrics.keys()):
+        sign = direction(metric)
+        if sign is None:
+            continue
+        before, after = base_metrics[metric], new_metrics[metric]
+        change = (after - before) / before if before else 0.0
+        rows.append((metric, before, after, change, -sign * change > threshold))
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("base", type=Path, help="Report from the baseline")
+    parser.add_argument("new", type=Path, help="Report to check against it")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Tolerated relative regression")
+    args = parser.parse_args(argv)
+
+    base = json.loads(args.base.read_text(encoding="utf-8"))
+    new = json.loads(args.new.read_text(encoding="utf-8"))
+    if base.get("options") != new.get("options"):
+        print("warning: the reports were produced with different options", file=sys.stderr)
+
+    rows = compare(base, new, args.threshold)
+    width = max((len(row[0]) for row in rows), default=6)
+    print(f"{'metric':<{width}}  {'base':>12}  {'new':>12}  {'change':>8}")
+    for metric, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{metric:<{width}}  {before:>12.3f}  {after:>12.3f}  {change:>+8.1%}{flag}")
+
+    regressions = sum(1 for row in rows if row[4])
+    print(f"{regressions} regression(s) beyond {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
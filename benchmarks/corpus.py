@@ -0,0 +1,110 @@
+"""Synthetic legal corpus and queries, reproducible from a seed.
+
+``synthetic_chunks`` yields ready-made chunks (with the metadata the loader
+would extract) for filling stores at any scale without parsing files.
+``synthetic_document`` renders a whole document with articles, sections and
+clauses for the splitters, and ``write_documents`` writes such documents as
+text files for ``DocumentLoader``.
+"""
+import random
+from pathlib import Path
+from typing import Iterator, List
+
+from langchain_core.documents import Document
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+JURISDICTIONS = ("Federal", "New York", "California", "Texas", "Delaware", "Illinois")
+DOC_TYPES = ("case", "statute", "regulation", "contract")
+COURTS = ("supreme", "appellate", "trial")
+
+_TERMS = ("agreement party shall notice term breach liability indemnify warranty licensor licensee "
+          "confidential information obligation court statute section jurisdiction damages remedy "
+          "negligence duty care reasonable standard review appeal plaintiff defendant holding "
+          "precedent termination assignment consideration performance waiver").split()
+_TOPICS = ("breach of contract", "negligence", "data privacy", "employment termination", "non-compete clauses",
+           "indemnification", "force majeure", "securities disclosure", "landlord obligations",
+           "trade secrets", "consumer protection", "arbitration clauses")
+_QUERY_TEMPLATES = (
+    "What are the elements of {topic} in {jurisdiction}?",
+    "How do courts treat {topic}?",
+    "Explain the statute of limitations for {topic} claims",
+    "What are the latest rulings on {topic} in {jurisdiction}?",
+    "Is a {topic} provision enforceable under {jurisdiction} law?",
+    "Summarize the remedies available for {topic}",
+)
+
+
+def _sentence(rng: random.Random) -> str:
+    return " ".join(rng.choices(_TERMS, k=rng.randint(8, 20))).capitalize() + "."
+
+
+def synthetic_chunks(count: int, seed: int = 0, sentences: int = 8) -> Iterator[Document]:
+    """Yield ``count`` chunks of legal-style text with loader-style metadata."""
+    rng = random.Random(seed)
+    for i in range(count):
+        doc_type = rng.choice(DOC_TYPES)
+        year = rng.randint(1995, 2024)
+        metadata = {
+            "source": f"synthetic/{i // 20:06d}.txt",
+            "chunk_index": i % 20,
+            "jurisdiction": rng.choice(JURISDICTIONS),
+            "doc_type": doc_type,
+            "effective_year": year,
+            "effective_date": f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        }
+        if doc_type == "case":
+            metadata["court"] = rng.choice(COURTS)
+        topic = rng.choice(_TOPICS)
+        text = f"Section {i % 97 + 1}.{i % 13 + 1} concerning {topic}. " + " ".join(
+            _sentence(rng) for _ in range(sentences)
+        )
+        yield Document(page_content=text, metadata=metadata)
+
+
+def synthetic_document(rng: random.Random, articles: int = 4, sections: int = 4) -> str:
+    """One structured document: a header naming the governing law and date, then numbered clauses."""
+    jurisdiction = rng.choice(JURISDICTIONS[1:])
+    lines = [
+        f"MASTER SERVICES AGREEMENT {rng.randint(1, 99999)}",
+        f"This Agreement is governed by the laws of the State of {jurisdiction}, "
+        f"effective as of January {rng.randint(1, 28)}, {rng.randint(1995, 2024)}.",
+        "",
+    ]
+    for article in range(1, articles + 1):
+        lines += [f"ARTICLE {article}. {rng.choice(_TOPICS).upper()}", ""]
+        for section in range(1, sections + 1):
+            lines.append(f"Section {article}.{section} " + " ".join(_sentence(rng) for _ in range(rng.randint(2, 5))))
+            for clause in "abc"[:rng.randint(0, 3)]:
+                lines.append(f"({clause}) " + " ".join(_sentence(rng) for _ in range(rng.randint(1, 3))))
+            lines.append("")
+    return "\n".join(lines)
+
+
+def synthetic_documents(count: int, seed: int = 0) -> Iterator[str]:
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield synthetic_document(rng)
+
+
+def write_documents(directory: Path, count: int, seed: int = 0) -> List[Path]:
+    """Write ``count`` synthetic documents as text files under ``directory``."""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, text in enumerate(synthetic_documents(count, seed)):
+        path = directory / f"agreement_{i:06d}.txt"
+        path.write_text(text, encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def synthetic_queries(count: int, seed: int = 0) -> List[str]:
+    """Distinct research questions, some naming a jurisdiction so metadata filters apply."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(count):
+        query = rng.choice(_QUERY_TEMPLATES).format(topic=rng.choice(_TOPICS),
+                                                    jurisdiction=rng.choice(JURISDICTIONS))
+        queries.append(f"{query} (matter {i})")
+    return queries
@@ -0,0 +1,235 @@
+"""Deterministic local stand-ins for Gemini, Tavily and the embedding model.
+
+Each fake does no network I/O and answers the same input with the same
+output, so benchmark runs differ only by the code under test and the
+configured latencies. ``install_fakes`` registers them, plus stores and
+caches under a scratch directory, in the process-wide component registry
+before any chain is built.
+"""
+import asyncio
+import hashlib
+import random
+import threading
+import time
+import zlib
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from src.agents.search_router import SearchDecision
+from src.cache.corpus_version import bump_corpus_version, get_corpus_version
+from src.cache.llm_cache import LLMCallCache
+from src.cache.response_cache import ResponseCache
+from src.cache.search_cache import SearchCache
+from src.config.config import EMBEDDING_MODEL_NAME, MODEL_NAME, TEMPERATURE
+from src.data.dedup import ChunkDeduplicator
+from src.data.lexical_index import LexicalIndex
+from src.data.vector_store import VectorStore
+from src.utils.context_packer import estimate_tokens
+from src.utils.lexical import tokenize
+from src.utils.registry import ComponentRegistry
+
+_VOCABULARY = ("contract breach damages statute court held appeal liability negligence duty reasonable "
+               "party agreement clause section jurisdiction precedent plaintiff defendant remedy notice "
+               "termination warranty indemnity regulation compliance ruling evidence standard review").split()
+
+# Every temperature the chains ask the registry for
+_TEMPERATURES = (0, 0.2, 0.7, TEMPERATURE)
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+
+
+class FakeGeminiChatModel(BaseChatModel):
+    """Chat model that waits a fixed time and answers with seeded filler text.
+
+    The reply to a prompt is always the same: ``output_tokens`` words from a
+    legal vocabulary, twelve to a line, so query refinement sees several
+    candidate queries. The first line ends with a routing decision; a
+    ``search_fraction`` share of prompts get NEEDS_SEARCH. Token usage is
+    reported like Gemini's, so traces count tokens as in production.
+    """
+
+    model: str = "fake-gemini"
+    temperature: float = 0.0
+    latency: float = 0.0  # Seconds before the first token
+    token_latency: float = 0.0  # Seconds per output token
+    output_tokens: int = 64
+    search_fraction: float = 0.5
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-gemini"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model, "latency": self.latency, "output_tokens": self.output_tokens}
+
+    def _reply(self, messages: List[BaseMessage]) -> Tuple[str, Dict[str, int]]:
+        prompt = "\n".join(str(message.content) for message in messages)
+        rng = random.Random(_seed(prompt))
+        words = rng.choices(_VOCABULARY, k=max(1, self.output_tokens))
+        decision = SearchDecision.NEEDS_SEARCH if rng.random() < self.search_fraction else SearchDecision.NO_SEARCH
+        lines = [" ".join(words[start:start + 12]) for start in range(0, len(words), 12)]
+        lines[0] += f" {decision.value}"
+        text = "\n".join(lines)
+        usage = {"input_tokens": estimate_tokens(prompt), "output_tokens": len(words)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return text, usage
+
+    def _delay(self) -> float:
+        return self.latency + self.token_latency * self.output_tokens
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs) -> ChatResult:
+        text, usage = self._reply(messages)
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager=None, **kwargs) -> ChatResult:
+        text, usage = self._reply(messages)
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        text, usage = self._reply(messages)
+        time.sleep(self.latency)
+        pieces = text.split(" ")
+        for i, piece in enumerate(pieces):
+            time.sleep(self.token_latency)
+            last = i == len(pieces) - 1
+            chunk = ChatGenerationChunk(message=AIMessageChunk(
+                content=piece if last else piece + " ",
+                usage_metadata=usage if last else None
+            ))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class HashingEmbeddings(Embeddings):
+    """Bag-of-words vectors from hashed tokens: similar texts get similar vectors."""
+
+    def __init__(self, dimensions: int = 128):
+        self.dimensions = dimensions
+
+    @staticmethod
+    @lru_cache(maxsize=1 << 16)
+    def _bucket(token: str) -> int:
+        return zlib.crc32(token.encode("utf-8"))
+
+    def _embed(self, text: str) -> List[float]:
+        buckets = np.fromiter((self._bucket(token) for token in tokenize(text)), dtype=np.int64)
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        if len(buckets):
+            signs = np.where(buckets & (1 << 31), -1.0, 1.0).astype(np.float32)
+            np.add.at(vector, buckets % self.dimensions, signs)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        else:
+            vector[0] = 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+class FakeTavilyClient:
+    """Tavily client double: waits ``latency`` seconds and returns seeded results."""
+
+    def __init__(self, latency: float = 0.0, available_results: int = 10):
+        self.latency = latency
+        self.available_results = available_results
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def response(self, query: str, max_results: int = 5) -> Dict[str, Any]:
+        with self._lock:
+            self.calls += 1
+        rng = random.Random(_seed(query))
+        results = []
+        for i in range(min(self.available_results, max_results or 5)):
+            content = " ".join(rng.choices(_VOCABULARY, k=60))
+            results.append({
+                "title": f"Result {i} for {query}",
+                "url": f"https://example.com/{_seed(query) % 100000}/{i}",
+                "content": f"{content}.",
+                "score": round(1.0 - i / 100, 3),
+            })
+        return {"query": query, "results": results, "response_time": self.latency}
+
+    def search(self, query: str, max_results: int = 5, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        return self.response(query, max_results)
+
+
+class FakeAsyncTavilyClient(FakeTavilyClient):
+    async def search(self, query: str, max_results: int = 5, timeout: Optional[float] = None,
+                     **kwargs) -> Dict[str, Any]:
+        await asyncio.sleep(self.latency)
+        return self.response(query, max_results)
+
+
+def install_fakes(registry: ComponentRegistry, workdir: Path, llm: Optional[FakeGeminiChatModel] = None,
+                  embeddings: Optional[Embeddings] = None, tavily_latency: float = 0.0,
+                  callbacks: Optional[List[BaseCallbackHandler]] = None) -> Dict[str, Any]:
+    """Register fakes and scratch-directory stores in a freshly reset registry.
+
+    Args:
+        registry (ComponentRegistry): The registry the chains will read from
+        workdir (Path): Directory for the vector store, indexes and caches
+        llm (FakeGeminiChatModel, optional): Chat model for every temperature
+        embeddings (Embeddings, optional): Embedding model (default: HashingEmbeddings)
+        tavily_latency (float): Seconds per fake Tavily request
+        callbacks (list, optional): Callbacks attached to the chat model
+            (default: the registry's tracing handler, as for Gemini)
+
+    Returns:
+        Dict[str, Any]: The installed llm, embeddings, tavily and async_tavily fakes
+    """
+    workdir = Path(workdir)
+    registry.reset()
+    llm = llm or FakeGeminiChatModel()
+    llm.callbacks = callbacks if callbacks is not None else [registry.get_tracing_handler()]
+    embeddings = embeddings or HashingEmbeddings()
+    tavily, async_tavily = FakeTavilyClient(tavily_latency), FakeAsyncTavilyClient(tavily_latency)
+
+    components = {
+        ("embeddings", EMBEDDING_MODEL_NAME): embeddings,
+        ("tavily",): tavily,
+        ("async_tavily",): async_tavily,
+        # Every call should reach the fakes, so the sub-call cache is off
+        ("llm_cache",): LLMCallCache([]),
+        ("trace_exporters",): [],
+    }
+    for temperature in _TEMPERATURES:
+        components[("llm", MODEL_NAME, float(temperature))] = llm
+    for key, component in components.items():
+        registry.get_or_create(key, lambda component=component: component)
+
+    version_path = workdir / "corpus_version"
+    bump = lambda: bump_corpus_version(version_path)
+    registry.get_or_create(("vector_store",), lambda: VectorStore(
+        "local", embeddings=embeddings, directory=workdir / "vector_store", on_change=bump
+    ))
+    registry.get_or_create(("lexical_index",), lambda: LexicalIndex(workdir / "lexical_index.sqlite", on_change=bump))
+    registry.get_or_create(("deduplicator",), lambda: ChunkDeduplicator(workdir / "dedup_index.sqlite"))
+    registry.get_or_create(("search_cache",), lambda: SearchCache(workdir / "search_results.sqlite"))
+    registry.get_or_create(("response_cache",), lambda: ResponseCache(
+        workdir / "responses.sqlite", corpus_version_fn=lambda: get_corpus_version(version_path)
+    ))
+    return {"llm": llm, "embeddings": embeddings, "tavily": tavily, "async_tavily": async_tavily}
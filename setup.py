@@ -12,8 +12,9 @@ setup(
         "langchain-community>=0.0.10",
         "langchain-text-splitters>=0.0.1",
         "langchain-core>=0.1.0",
-        "tavily-python>=0.2.8",
+        "tavily-python>=0.7.9",
         "chromadb>=0.4.18",
+        "numpy>=1.24",
         "streamlit>=1.27.0",
         "pydantic>=2.0.0",
         "python-dotenv>=1.0.0",
@@ -22,4 +23,8 @@ setup(
         "pytesseract>=0.3.10",
         "langchain-tavily>=0.0.1"
     ],
+    extras_require={
+        # Approximate search for the local vector store (LOCAL_VECTOR_INDEX = "hnsw")
+        "hnsw": ["hnswlib>=0.7.0"],
+    },
 )
@@ -1,18 +1,24 @@
+import asyncio
+import logging
 from langchain_core.runnables import RunnablePassthrough
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
 from enum import Enum
 from typing import Dict, List, Any, Optional, TypedDict, Annotated
 from pydantic import BaseModel, Field
 from ..chains.search_chain import SearchChain
+from .search_router import (
+    RoutingDecision,
+    SearchDecision,
+    build_search_router,
+)
 from src.chains.retrieval_chain import RetrievalChain
 from src.prompts.legal_prompts import SEARCH_DETERMINATION_PROMPT
-from config import GOOGLE_API_KEY, MODEL_NAME
+from src.utils.registry import get_registry
+from src.config.config import SEARCH_ROUTING_MODE
+from config import MODEL_NAME
 from google.api_core import exceptions as google_exceptions
 
-class SearchDecision(str, Enum):
-    NEEDS_SEARCH = "NEEDS_SEARCH"
-    NO_SEARCH = "NO_SEARCH"
+logger = logging.getLogger(__name__)
 
 class LegalResearchOutput(TypedDict):
     answer: str
@@ -20,34 +26,80 @@ class LegalResearchOutput(TypedDict):
     confidence: float
 
 class LegalResearcher:
-    def __init__(self):
-        """Initialize the legal researcher agent."""
+    def __init__(self, search_chain: Optional[SearchChain] = None,
+                 retrieval_chain: Optional[RetrievalChain] = None,
+                 routing_mode: str = SEARCH_ROUTING_MODE):
+        """Initialize the legal researcher agent.
+        
+        Args:
+            search_chain (SearchChain, optional): Chain to reuse instead of building one
+            retrieval_chain (RetrievalChain, optional): Chain to reuse instead of building one
+            routing_mode (str): How to decide on web search: "llm" always asks
+                Gemini, "local" only uses the local router, "hybrid" asks
+                Gemini only when the local score is ambiguous
+        """
         try:
-            self.chat_model = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash-latest",  # Updated model name
-                temperature=0.7,
-            )
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash-latest",  # Updated model name
-                google_api_key=GOOGLE_API_KEY,
-                temperature=0.2
-            )
+            registry = get_registry()
+            self.chat_model = registry.get_llm(model=MODEL_NAME, temperature=0.7)
+            self.llm = registry.get_llm(model=MODEL_NAME, temperature=0.2)
             
-            self.search_chain = SearchChain()
-            self.retrieval_chain = RetrievalChain()
+            self.search_chain = search_chain or SearchChain()
+            self.retrieval_chain = retrieval_chain or RetrievalChain()
             
-            # Search determination chain
-            self.search_determination_chain = (
-                SEARCH_DETERMINATION_PROMPT 
-                | self.llm 
-                | StrOutputParser()
+            # Search determination chain, memoized per query
+            self.search_determination_chain = registry.get_llm_cache().wrap(
+                SEARCH_DETERMINATION_PROMPT,
+                self.llm,
+                StrOutputParser(),
+                namespace="search_determination"
             )
+            
+            # Local router, optionally with a linear model over query embeddings
+            self.routing_mode = routing_mode
+            self.search_router = build_search_router()
         except google_exceptions.NotFound as e:
             print(f"Error initializing Gemini model: {e}")
             raise
     
+    def _local_decision(self, query: str) -> Optional[RoutingDecision]:
+        """Route locally, or return None when the LLM should decide."""
+        if self.routing_mode == "llm":
+            return None
+        decision, score = self.search_router.decide(query)
+        if decision is None and self.routing_mode == "local":
+            decision = SearchDecision.NEEDS_SEARCH if score >= 0.5 else SearchDecision.NO_SEARCH
+        if decision is None:
+            return None
+        return RoutingDecision(decision, "local", score)
+    
+    def classify_query(self, query: str) -> RoutingDecision:
+        """Decide whether the query needs web search and which router decided."""
+        local = self._local_decision(query)
+        if local is not None:
+            return local
+        return RoutingDecision(self.llm_search_decision(query), "llm", None)
+    
+    async def aclassify_query(self, query: str) -> RoutingDecision:
+        """Async version of classify_query."""
+        if self.search_router.embed_fn is not None:
+            # Embedding the query is a blocking call, so keep it off the event loop
+            local = await asyncio.to_thread(self._local_decision, query)
+        else:
+            local = self._local_decision(query)
+        if local is not None:
+            return local
+        return RoutingDecision(await self.allm_search_decision(query), "llm", None)
+    
     def determine_search_need(self, query: str) -> SearchDecision:
         """Determine if the query needs web search."""
+        return self.classify_query(query).decision
+    
+    async def adetermine_search_need(self, query: str) -> SearchDecision:
+        """Async version of determine_search_need."""
+        return (await self.aclassify_query(query)).decision
+    
+    def llm_search_decision(self, query: str) -> SearchDecision:
+        """Ask the LLM whether the query needs web search."""
         try:
             result = self.search_determination_chain.invoke({"query": query})
             if SearchDecision.NEEDS_SEARCH.value in result:
@@ -57,6 +109,17 @@ class LegalResearcher:
             print(f"Error during model inference: {e}")
             raise
     
+    async def allm_search_decision(self, query: str) -> SearchDecision:
+        """Async version of llm_search_decision."""
+        try:
+            result = await self.search_determination_chain.ainvoke({"query": query})
+            if SearchDecision.NEEDS_SEARCH.value in result:
+                return SearchDecision.NEEDS_SEARCH
+            return SearchDecision.NO_SEARCH
+        except google_exceptions.NotFound as e:
+            print(f"Error during model inference: {e}")
+            raise
+    
     def _extract_references(self, text: str) -> List[str]:
         """Extract reference citations from the text."""
         references = []
@@ -98,65 +161,131 @@ class LegalResearcher:
         # Ensure confidence is between 0.1 and 0.95
         return max(0.1, min(0.95, base_confidence))
     
-    def research(self, query: str, chat_history=None) -> LegalResearchOutput:
-        """Conduct legal research based on the query."""
-        try:
-            # Validate and convert query
-            if isinstance(query, dict):
-                query = query.get("query", "")
-            elif not isinstance(query, str):
-                query = str(query)
-
-            if not query.strip():
-                raise ValueError("Empty query received")
+    @staticmethod
+    def _validate_query(query) -> str:
+        # Validate and convert query
+        if isinstance(query, dict):
+            query = query.get("query", "")
+        elif not isinstance(query, str):
+            query = str(query)
 
+        if not query.strip():
+            raise ValueError("Empty query received")
+        return query
+    
+    def _build_output(self, answer: str, search_performed: bool) -> LegalResearchOutput:
+        references = self._extract_references(answer)
+        confidence = self._evaluate_confidence(answer)
+        
+        if search_performed:
+            answer = f"{answer}\n\nThis answer is based on web search results."
+        
+        return {
+            "answer": answer,
+            "references": references,
+            "confidence": confidence,
+            "search_performed": search_performed
+        }
+    
+    @staticmethod
+    def _error_output(error: Exception) -> LegalResearchOutput:
+        logger.error(f"Error in research: {str(error)}")
+        return {
+            "answer": "I apologize, but I encountered an error processing your request.",
+            "references": [],
+            "confidence": 0.0,
+            "search_performed": False
+        }
+    
+    def research(self, query: str, chat_history=None,
+                 search_results: Optional[List[str]] = None,
+                 document_context: Optional[str] = None) -> LegalResearchOutput:
+        """Conduct legal research based on the query.
+        
+        Args:
+            query (str): The legal query
+            chat_history (list, optional): Previous conversation turns
+            search_results (List[str], optional): Web results the caller already
+                fetched. When given, search determination and web search are
+                skipped and these results are used as context instead.
+            document_context (str, optional): Documents the caller already
+                retrieved. When given, the vector store is not queried again.
+        
+        Returns:
+            LegalResearchOutput: Answer, references, confidence and search flag
+        """
+        try:
+            query = self._validate_query(query)
             chat_history = chat_history or []
             
-            search_decision = self.determine_search_need(query)
-        
             search_performed = False
-            if search_decision == SearchDecision.NEEDS_SEARCH:
-                # Perform web search
-                search_results = self.search_chain.search(query, use_refinement=True)
-                search_performed = search_results.get("search_performed", False)
-                
-                # Format search results for context
-                search_context = "\n\n".join(search_results["search_results"])
-                
-                # Get search-based answer
-                search_answer = self.retrieval_chain.retrieve_and_answer(
+            if search_results is None:
+                search_results = []
+                if self.determine_search_need(query) == SearchDecision.NEEDS_SEARCH:
+                    # Perform web search
+                    search_output = self.search_chain.search(query, use_refinement=True)
+                    search_performed = search_output.get("search_performed", False)
+                    if search_performed:
+                        search_results = search_output["search_results"]
+            else:
+                search_performed = bool(search_results)
+            
+            # Answer from retrieved documents plus any web search context
+            search_context = "\n\n".join(search_results)
+            if document_context is None:
+                answer = self.retrieval_chain.retrieve_and_answer(
                     query, 
-                    chat_history=chat_history
+                    chat_history=chat_history,
+                    search_context=search_context
                 )
-                
-                # Format the answer with search-specific information
-                answer = f"{search_answer}\n\nThis answer is based on web search results."
-                references = self._extract_references(search_answer)
-                confidence = self._evaluate_confidence(search_answer)
-                
             else:
-                # Use document retrieval only
-                document_answer = self.retrieval_chain.retrieve_and_answer(
-                    query, 
-                    chat_history=chat_history
+                answer = self.retrieval_chain.answer(
+                    query,
+                    document_context,
+                    chat_history=chat_history,
+                    search_context=search_context
+                )
+            
+            return self._build_output(answer, search_performed)
+        
+        except Exception as e:
+            return self._error_output(e)
+    
+    async def aresearch(self, query: str, chat_history=None,
+                        search_results: Optional[List[str]] = None,
+                        document_context: Optional[str] = None) -> LegalResearchOutput:
+        """Async version of research; takes the same arguments."""
+        try:
+            query = self._validate_query(query)
+            chat_history = chat_history or []
+            
+            search_performed = False
+            if search_results is None:
+                search_results = []
+                if await self.adetermine_search_need(query) == SearchDecision.NEEDS_SEARCH:
+                    search_output = await self.search_chain.asearch(query, use_refinement=True)
+                    search_performed = search_output.get("search_performed", False)
+                    if search_performed:
+                        search_results = search_output["search_results"]
+            else:
+                search_performed = bool(search_results)
+            
+            search_context = "\n\n".join(search_results)
+            if document_context is None:
+                answer = await self.retrieval_chain.aretrieve_and_answer(
+                    query,
+                    chat_history=chat_history,
+                    search_context=search_context
+                )
+            else:
+                answer = await self.retrieval_chain.aanswer(
+                    query,
+                    document_context,
+                    chat_history=chat_history,
+                    search_context=search_context
                 )
-                
-                answer = document_answer
-                references = self._extract_references(document_answer)
-                confidence = self._evaluate_confidence(document_answer)
             
-            return {
-                "answer": answer,
-                "references": references,
-                "confidence": confidence,
-                "search_performed": search_performed  # Add this field
-            }
+            return self._build_output(answer, search_performed)
         
         except Exception as e:
-            logger.error(f"Error in research: {str(e)}")
-            return {
-                "answer": "I apologize, but I encountered an error processing your request.",
-                "references": [],
-                "confidence": 0.0,
-                "search_performed": False
-            }
\ No newline at end of file
+            return self._error_output(e)
@@ -0,0 +1,296 @@
+"""Local, sub-millisecond routing of queries to web search.
+
+The router scores a query with weighted keyword/regex features (recency
+terms, years, jurisdictions, statute and case citations), optionally adding
+a small linear model over the query embedding, and squashes the total with a
+logistic function. Confident scores are decided locally; only scores inside
+the ambiguous band need the LLM router.
+
+Run as a module to measure agreement with the LLM router on a labeled file:
+
+    python -m src.agents.search_router queries.jsonl [--llm] [--output report.json]
+
+Each line of the file is {"query": ..., "label": "NEEDS_SEARCH" | "NO_SEARCH"}.
+With --llm, lines without a label are labeled by the LLM router.
+"""
+import argparse
+import json
+import math
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from ..config.config import (
+    SEARCH_ROUTER_EMBEDDING_MODEL,
+    SEARCH_ROUTER_LOWER_THRESHOLD,
+    SEARCH_ROUTER_UPPER_THRESHOLD,
+)
+
+
+class SearchDecision(str, Enum):
+    NEEDS_SEARCH = "NEEDS_SEARCH"
+    NO_SEARCH = "NO_SEARCH"
+
+
+class RoutingDecision(NamedTuple):
+    decision: SearchDecision
+    source: str  # "local" or "llm"
+    score: Optional[float]  # Local probability that the query needs search
+
+
+_US_STATES = (
+    "alabama|alaska|arizona|arkansas|california|colorado|connecticut|delaware|florida|georgia|"
+    "hawaii|idaho|illinois|indiana|iowa|kansas|kentucky|louisiana|maine|maryland|massachusetts|"
+    "michigan|minnesota|mississippi|missouri|montana|nebraska|nevada|new hampshire|new jersey|"
+    "new mexico|new york|north carolina|north dakota|ohio|oklahoma|oregon|pennsylvania|"
+    "rhode island|south carolina|south dakota|tennessee|texas|utah|vermont|virginia|washington|"
+    "west virginia|wisconsin|wyoming"
+)
+
+# (name, pattern, weight). Positive weights push towards web search.
+DEFAULT_FEATURES: List[Tuple[str, str, float]] = [
+    ("recency", r"\b(latest|recent(ly)?|current(ly)?|new(est)?|now|today|this year|upcoming|pending|"
+                r"as of|amend(ed|ment|ments)|overturned|updated?)\b", 2.2),
+    ("recent_year", r"\b20[2-9]\d\b", 2.0),
+    ("year", r"\b(19|20)\d{2}\b", 0.6),
+    ("us_state", rf"\b({_US_STATES})\b", 1.2),
+    ("jurisdiction", r"\b(federal|state law|jurisdiction|eu|european union|uk|united kingdom|england|"
+                     r"canada|australia|india|germany|france|circuit|district court|county)\b", 1.0),
+    ("usc_citation", r"\b\d+\s*u\.?\s*s\.?\s*c\.?", 1.8),
+    ("cfr_citation", r"\b\d+\s*c\.?\s*f\.?\s*r\.?", 1.8),
+    ("section_symbol", r"§", 1.2),
+    ("section_reference", r"\b(section|article|rule)\s+\d+", 0.8),
+    ("case_citation", r"\b[a-z][\w.'-]*\s+v\.?\s+[a-z][\w.'-]*", 1.5),
+    ("reporter_citation", r"\b\d+\s+(u\.s\.|s\.\s?ct\.|f\.\s?(2d|3d|4th)|f\.\s?supp)", 1.8),
+    ("court", r"\b(supreme court|court of appeals|appellate|ruling|ruled|decision in|precedent|case law)\b", 1.0),
+    ("named_statute", r"\b(act|regulation|directive|gdpr|ccpa|hipaa|ada|fmla|dodd-frank|sarbanes)\b", 0.8),
+    ("statistics", r"\b(how many|statistics|rate of|average|fine[sd]?|penalt(y|ies) (of|for))\b", 0.7),
+    ("definition", r"^\s*(what is|what are|what does|define|definition of|meaning of|explain)\b", -1.6),
+    ("general", r"\b(in general|generally|basic|concept|principle|difference between|elements of)\b", -1.2),
+    ("drafting", r"\b(draft|write|rewrite|summari[sz]e|review (this|my|the attached))\b", -1.5),
+]
+
+
+@dataclass
+class EmbeddingLinearModel:
+    """Logistic-regression weights over query embeddings."""
+    weights: List[float]
+    bias: float = 0.0
+
+    def logit(self, embedding: Sequence[float]) -> float:
+        return self.bias + sum(w * x for w, x in zip(self.weights, embedding))
+
+    @classmethod
+    def load(cls, path: Path) -> "EmbeddingLinearModel":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(weights=data["weights"], bias=data.get("bias", 0.0))
+
+    def save(self, path: Path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"weights": self.weights, "bias": self.bias}, f)
+
+    @classmethod
+    def fit(cls, embeddings: List[Sequence[float]], labels: List[bool],
+            epochs: int = 200, learning_rate: float = 0.1, l2: float = 1e-3) -> "EmbeddingLinearModel":
+        """Fit by batch gradient descent; labels are True for NEEDS_SEARCH."""
+        dims = len(embeddings[0])
+        model = cls(weights=[0.0] * dims, bias=0.0)
+        n = len(embeddings)
+        for _ in range(epochs):
+            grad_w = [0.0] * dims
+            grad_b = 0.0
+            for embedding, label in zip(embeddings, labels):
+                error = _sigmoid(model.logit(embedding)) - (1.0 if label else 0.0)
+                grad_b += error
+                for i, x in enumerate(embedding):
+                    grad_w[i] += error * x
+            model.bias -= learning_rate * grad_b / n
+            model.weights = [
+                w - learning_rate * (g / n + l2 * w) for w, g in zip(model.weights, grad_w)
+            ]
+        return model
+
+
+def _sigmoid(x: float) -> float:
+    if x >= 0:
+        return 1.0 / (1.0 + math.exp(-x))
+    z = math.exp(x)
+    return z / (1.0 + z)
+
+
+@dataclass
+class LocalSearchRouter:
+    """Keyword/regex search-need classifier with an ambiguity band.
+
+    ``score`` returns the probability that a query needs web search;
+    ``decide`` returns a SearchDecision when the score falls outside
+    [lower, upper] and None when it is ambiguous.
+    """
+    features: List[Tuple[str, str, float]] = field(default_factory=lambda: list(DEFAULT_FEATURES))
+    bias: float = -1.0
+    lower: float = SEARCH_ROUTER_LOWER_THRESHOLD
+    upper: float = SEARCH_ROUTER_UPPER_THRESHOLD
+    embedding_model: Optional[EmbeddingLinearModel] = None
+    embed_fn: Optional[Callable[[str], List[float]]] = None
+
+    def __post_init__(self):
+        self._compiled = [
+            (name, re.compile(pattern, re.IGNORECASE), weight)
+            for name, pattern, weight in self.features
+        ]
+
+    def matched_features(self, query: str) -> Dict[str, float]:
+        """Return the features that fire on the query with their weights."""
+        return {
+            name: weight for name, pattern, weight in self._compiled if pattern.search(query)
+        }
+
+    def score(self, query: str) -> float:
+        logit = self.bias + sum(self.matched_features(query).values())
+        if self.embedding_model is not None and self.embed_fn is not None:
+            logit += self.embedding_model.logit(self.embed_fn(query))
+        return _sigmoid(logit)
+
+    def decide(self, query: str) -> Tuple[Optional[SearchDecision], float]:
+        score = self.score(query)
+        if score >= self.upper:
+            return SearchDecision.NEEDS_SEARCH, score
+        if score <= self.lower:
+            return SearchDecision.NO_SEARCH, score
+        return None, score
+
+
+def build_search_router(embedding_model_path: Optional[Path] = SEARCH_ROUTER_EMBEDDING_MODEL,
+                        embed_fn: Optional[Callable[[str], List[float]]] = None) -> LocalSearchRouter:
+    """Build the router the researcher routes with: keyword features, plus the
+    embedding model when one is configured.
+
+    Args:
+        embedding_model_path (Path, optional): EmbeddingLinearModel weights
+        embed_fn (Callable, optional): Embeds a query for the model; defaults
+            to the shared embeddings
+    """
+    router = LocalSearchRouter()
+    if embedding_model_path is not None:
+        if embed_fn is None:
+            from ..utils.registry import get_registry
+            embed_fn = get_registry().get_embeddings().embed_query
+        router.embedding_model = EmbeddingLinearModel.load(embedding_model_path)
+        router.embed_fn = embed_fn
+    return router
+
+
+def load_labeled_queries(path: Path) -> List[Dict[str, str]]:
+    """Load {"query", "label"} records from a JSONL file."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def evaluate_router(router: LocalSearchRouter, records: List[Dict[str, str]],
+                    llm_router: Optional[Callable[[str], SearchDecision]] = None) -> Dict[str, object]:
+    """Compare the local router with LLM-router labels.
+
+    Args:
+        router (LocalSearchRouter): The local router to evaluate
+        records (List[Dict[str, str]]): Queries with optional "label"
+        llm_router (Callable, optional): Labels queries that have no label
+            and decides the ambiguous ones for the hybrid agreement
+
+    Returns:
+        Dict[str, object]: Agreement on confident decisions, agreement with
+            LLM fallback on ambiguous ones, fallback rate, a confusion matrix
+            and mean local latency. Without ``llm_router`` the fallback is
+            assumed to match every label.
+    """
+    confusion = {
+        expected.value: {actual: 0 for actual in ("NEEDS_SEARCH", "NO_SEARCH", "AMBIGUOUS")}
+        for expected in SearchDecision
+    }
+    confident = confident_agree = fallback_agree = evaluated = 0
+    local_seconds = 0.0
+    disagreements = []
+
+    for record in records:
+        query = record["query"]
+        label = record.get("label")
+        llm_decision = None
+        if label is None:
+            if llm_router is None:
+                continue
+            llm_decision = llm_router(query)
+            label = llm_decision.value
+        expected = SearchDecision(label)
+
+        started = time.perf_counter()
+        decision, score = router.decide(query)
+        local_seconds += time.perf_counter() - started
+        evaluated += 1
+
+        confusion[expected.value][decision.value if decision else "AMBIGUOUS"] += 1
+        if decision is not None:
+            confident += 1
+            if decision == expected:
+                confident_agree += 1
+            else:
+                disagreements.append({"query": query, "label": expected.value, "score": round(score, 3)})
+        elif llm_router is None:
+            fallback_agree += 1
+        else:
+            # Reuse the decision that labelled the query rather than asking twice
+            if llm_decision is None:
+                llm_decision = llm_router(query)
+            if llm_decision == expected:
+                fallback_agree += 1
+
+    ambiguous = evaluated - confident
+    return {
+        "evaluated": evaluated,
+        "local_decisions": confident,
+        "llm_fallback_rate": ambiguous / evaluated if evaluated else 0.0,
+        "local_agreement": confident_agree / confident if confident else 0.0,
+        "hybrid_agreement": (confident_agree + fallback_agree) / evaluated if evaluated else 0.0,
+        "mean_local_latency_ms": 1000 * local_seconds / evaluated if evaluated else 0.0,
+        "confusion": confusion,
+        "disagreements": disagreements,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Evaluate the local search router against LLM labels.")
+    parser.add_argument("labels", type=Path, help="JSONL file of {\"query\", \"label\"} records")
+    parser.add_argument("--llm", action="store_true", help="Label unlabeled queries with the LLM router")
+    parser.add_argument("--output", type=Path, help="Write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    llm_router = None
+    if args.llm:
+        from .legal_researcher import LegalResearcher
+        researcher = LegalResearcher()
+        llm_router = researcher.llm_search_decision
+
+    # The same router hybrid routing uses, embedding model included
+    report = evaluate_router(build_search_router(), load_labeled_queries(args.labels), llm_router)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"Evaluated: {report['evaluated']}")
+    print(f"Local decisions: {report['local_decisions']} (LLM fallback rate {report['llm_fallback_rate']:.1%})")
+    print(f"Local agreement: {report['local_agreement']:.1%}")
+    print(f"Hybrid agreement: {report['hybrid_agreement']:.1%}")
+    print(f"Mean local latency: {report['mean_local_latency_ms']:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,309 @@
+"""Headless batch research over a file of queries.
+
+Runs every query in a JSONL or CSV file through ``LegalWorkflow`` and
+streams one JSON line per query to the output file as soon as it finishes:
+
+    python -m src.batch_runner queries.jsonl --output results.jsonl \\
+        [--concurrency 4] [--gemini-rpm 60] [--tavily-rpm 30] [--max-retries 3]
+
+Input lines are {"id": ..., "query": ...} (JSONL; a bare JSON string is also
+accepted) or rows of a CSV with a "query" column and an optional "id"
+column. Queries without an id are numbered by their position in the file.
+
+At most ``concurrency`` queries run at once, on one event loop. Requests to
+Gemini and Tavily go through the process-wide rate limiters, so the limits
+hold however many queries are in flight. A query whose answer comes back
+with an error is retried with exponential backoff and jitter.
+
+The output file doubles as the checkpoint: when it already exists, queries
+recorded there with status "ok" are skipped and the rest are run again, so a
+crashed or interrupted run resumes where it stopped. For an id recorded more
+than once, the last record wins.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from .config.config import (
+    BATCH_CONCURRENCY,
+    BATCH_MAX_RETRIES,
+    BATCH_BACKOFF_SECONDS,
+    BATCH_MAX_BACKOFF_SECONDS,
+    GEMINI_REQUESTS_PER_MINUTE,
+    TAVILY_REQUESTS_PER_MINUTE,
+)
+from .utils.registry import get_registry
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULT_FIELDS = ("answer", "references", "confidence", "search_performed", "llm_calls", "search_calls",
+                 "timed_out", "cache_hit", "tokens")
+
+
+class BatchQuery(NamedTuple):
+    """One query of a batch and its id in the input file."""
+    id: str
+    query: str
+
+
+def load_queries(path: Path, file_format: Optional[str] = None) -> List[BatchQuery]:
+    """Read the queries of a JSONL or CSV file.
+
+    Args:
+        path (Path): Input file
+        file_format (str, optional): "jsonl" or "csv" (default: from the file extension)
+
+    Returns:
+        List[BatchQuery]: The queries in file order, with blank queries skipped
+
+    Raises:
+        ValueError: On a malformed record or a duplicate id
+    """
+    path = Path(path)
+    file_format = file_format or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+    queries, seen = [], set()
+    with open(path, encoding="utf-8", newline="") as f:
+        if file_format == "csv":
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or "query" not in reader.fieldnames:
+                raise ValueError(f"{path}: CSV input needs a 'query' column")
+            records = ((number, row) for number, row in enumerate(reader, 1))
+        else:
+            records = ((number, json.loads(line)) for number, line in enumerate(f, 1) if line.strip())
+        for number, record in records:
+            if isinstance(record, str):
+                record = {"query": record}
+            if not isinstance(record, dict) or not isinstance(record.get("query"), str):
+                raise ValueError(f"{path}: record {number} has no query")
+            if not record["query"].strip():
+                continue
+            query_id = str(number if record.get("id") in (None, "") else record["id"])
+            if query_id in seen:
+                raise ValueError(f"{path}: duplicate id {query_id!r}")
+            seen.add(query_id)
+            queries.append(BatchQuery(query_id, record["query"].strip()))
+    return queries
+
+
+class JsonlWriter:
+    """Append-only JSONL output, one flushed line per record, safe to share between threads."""
+
+    def __init__(self, path: Path, fsync: bool = False):
+        self.path = Path(path)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def completed_ids(path: Path) -> Set[str]:
+    """Ids recorded with status "ok" in an earlier run's output.
+
+    A line cut short by a crash is removed, so new records start on a line
+    of their own.
+    """
+    path = Path(path)
+    if not path.exists():
+        return set()
+    with open(path, "rb") as f:
+        data = f.read()
+    if data and not data.endswith(b"\n"):
+        with open(path, "r+b") as f:
+            f.truncate(data.rfind(b"\n") + 1)
+        data = data[:data.rfind(b"\n") + 1]
+
+    status: Dict[str, str] = {}
+    for line in data.decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+            status[str(record["id"])] = record.get("status")
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Skipping unreadable checkpoint line in {path}")
+    return {query_id for query_id, value in status.items() if value == "ok"}
+
+
+class BatchRunner:
+    def __init__(self, workflow=None, concurrency: int = BATCH_CONCURRENCY,
+                 max_retries: int = BATCH_MAX_RETRIES, backoff: float = BATCH_BACKOFF_SECONDS,
+                 max_backoff: float = BATCH_MAX_BACKOFF_SECONDS,
+                 gemini_rpm: Optional[float] = GEMINI_REQUESTS_PER_MINUTE,
+                 tavily_rpm: Optional[float] = TAVILY_REQUESTS_PER_MINUTE):
+        """Initialize the runner.
+
+        Args:
+            workflow (LegalWorkflow, optional): Workflow to run the queries
+                through (default: a new one, built on first use)
+            concurrency (int): Queries processed at once
+            max_retries (int): Further attempts for a query that ends in an error
+            backoff (float): Seconds before the first retry; doubles per attempt
+            max_backoff (float): Upper bound on a single retry delay
+            gemini_rpm (float, optional): Gemini requests per minute for the
+                whole process; None leaves the current limit in place
+            tavily_rpm (float, optional): Tavily requests per minute, likewise
+        """
+        self._workflow = workflow
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        registry = get_registry()
+        for upstream, rpm in (("gemini", gemini_rpm), ("tavily", tavily_rpm)):
+            if rpm is not None:
+                registry.get_rate_limiter(upstream).set_rate(rpm)
+
+    @property
+    def workflow(self):
+        if self._workflow is None:
+            from .graphs.workflow import LegalWorkflow
+            self._workflow = LegalWorkflow()
+        return self._workflow
+
+    def _delay(self, attempt: int) -> float:
+        """Backoff before retry number ``attempt`` (1-based), jittered over its upper half."""
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def arun_query(self, item: BatchQuery) -> Dict[str, Any]:
+        """Run one query, retrying on errors, and return its output record."""
+        started = time.monotonic()
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                result = await self.workflow.aprocess_query(item.query)
+                error = result.get("error")
+            except Exception as e:
+                result, error = {}, str(e)
+            if not error or attempts > self.max_retries:
+                break
+            delay = self._delay(attempts)
+            logger.warning(f"Query {item.id} failed (attempt {attempts}), retrying in {delay:.1f}s: {error}")
+            await asyncio.sleep(delay)
+
+        record = {"id": item.id, "query": item.query, "status": "error" if error else "ok"}
+        record.update({field: result.get(field) for field in RESULT_FIELDS})
+        record.update({
+            "error": error,
+            "attempts": attempts,
+            "processing_time": round(time.monotonic() - started, 3),
+        })
+        return record
+
+    async def arun(self, queries: Iterable[BatchQuery], output_path: Path, resume: bool = True,
+                   progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run a batch, streaming a record per query to ``output_path``.
+
+        Args:
+            queries (Iterable[BatchQuery]): The queries to run
+            output_path (Path): JSONL output, appended to and used as the checkpoint
+            resume (bool): Skip queries already recorded as "ok" in the output;
+                otherwise the output is overwritten
+            progress_callback (Callable, optional): Called with (done, total,
+                record) as each query finishes
+
+        Returns:
+            Dict[str, Any]: Counts of queries run, skipped and failed, and the wall time
+        """
+        output_path = Path(output_path)
+        if not resume and output_path.exists():
+            output_path.unlink()
+        done = completed_ids(output_path) if resume else set()
+        pending = [item for item in queries if item.id not in done]
+        skipped = len(done)
+        summary = {"total": len(pending) + skipped, "skipped": skipped, "succeeded": 0, "failed": 0}
+        started = time.monotonic()
+        if skipped:
+            logger.info(f"Resuming: {skipped} queries already answered in {output_path}")
+
+        queue: asyncio.Queue = asyncio.Queue()
+        for item in pending:
+            queue.put_nowait(item)
+
+        with JsonlWriter(output_path) as writer:
+            async def worker():
+                while True:
+                    try:
+                        item = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    record = await self.arun_query(item)
+                    # Written before the next query starts, so a crash loses at most the in-flight ones
+                    writer.write(record)
+                    summary["succeeded" if record["status"] == "ok" else "failed"] += 1
+                    if progress_callback is not None:
+                        progress_callback(summary["succeeded"] + summary["failed"], len(pending), record)
+
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(pending)))))
+
+        summary["seconds"] = round(time.monotonic() - started, 3)
+        return summary
+
+    def run(self, queries: Iterable[BatchQuery], output_path: Path, resume: bool = True,
+            progress_callback: Optional[Callable[[int, int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Synchronous version of arun, for scripts and notebooks without an event loop."""
+        return asyncio.run(self.arun(queries, output_path, resume=resume, progress_callback=progress_callback))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run a file of legal queries through the research workflow.")
+    parser.add_argument("queries", type=Path, help="JSONL or CSV file of queries")
+    parser.add_argument("--output", type=Path, required=True, help="JSONL file for the results (and checkpoint)")
+    parser.add_argument("--format", choices=["jsonl", "csv"], help="Input format (default: from the extension)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Queries run at once")
+    parser.add_argument("--max-retries", type=int, default=BATCH_MAX_RETRIES, help="Retries per failed query")
+    parser.add_argument("--backoff", type=float, default=BATCH_BACKOFF_SECONDS, help="First retry delay (seconds)")
+    parser.add_argument("--gemini-rpm", type=float, default=GEMINI_REQUESTS_PER_MINUTE,
+                        help="Gemini requests per minute (default: unlimited)")
+    parser.add_argument("--tavily-rpm", type=float, default=TAVILY_REQUESTS_PER_MINUTE,
+                        help="Tavily requests per minute (default: unlimited)")
+    parser.add_argument("--no-resume", action="store_true", help="Overwrite the output instead of resuming")
+    args = parser.parse_args(argv)
+
+    runner = BatchRunner(
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+        backoff=args.backoff,
+        gemini_rpm=args.gemini_rpm,
+        tavily_rpm=args.tavily_rpm
+    )
+
+    def on_progress(done, total, record):
+        print(f"[{done}/{total}] {record['id']}: {record['status']} in {record['processing_time']}s", flush=True)
+
+    summary = runner.run(load_queries(args.queries, args.format), args.output,
+                         resume=not args.no_resume, progress_callback=on_progress)
+    print(f"Answered {summary['succeeded']} of {summary['total']} queries "
+          f"({summary['skipped']} from an earlier run, {summary['failed']} failed) in {summary['seconds']}s")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
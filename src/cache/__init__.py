@@ -0,0 +1,15 @@
+from .corpus_version import get_corpus_version, bump_corpus_version
+from .response_cache import ResponseCache, normalize_query
+from .llm_cache import LLMCallCache, InMemoryLRUBackend, SQLiteBackend
+from .search_cache import SearchCache
+
+__all__ = [
+    'get_corpus_version',
+    'bump_corpus_version',
+    'ResponseCache',
+    'normalize_query',
+    'LLMCallCache',
+    'InMemoryLRUBackend',
+    'SQLiteBackend',
+    'SearchCache'
+]
@@ -0,0 +1,31 @@
+import os
+import threading
+import uuid
+from pathlib import Path
+from ..config.config import CACHE_DIR
+
+# A token that changes whenever the vector store contents change. Anything
+# derived from the corpus (cached answers, for one) records the token it was
+# built against and is treated as stale once the token moves on.
+CORPUS_VERSION_FILE = CACHE_DIR / "corpus_version"
+
+_lock = threading.Lock()
+
+
+def get_corpus_version(path: Path = CORPUS_VERSION_FILE) -> str:
+    """Return the current corpus version token."""
+    try:
+        return path.read_text(encoding="utf-8").strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+
+def bump_corpus_version(path: Path = CORPUS_VERSION_FILE) -> str:
+    """Record that the corpus changed and return the new version token."""
+    version = uuid.uuid4().hex
+    with _lock:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(version, encoding="utf-8")
+        os.replace(tmp_path, path)
+    return version
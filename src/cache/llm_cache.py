@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from ..utils.tracing import span
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class InMemoryLRUBackend:
+    """Bounded in-process store that evicts the least recently used entry."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteBackend:
+    """On-disk store so cached LLM outputs survive restarts and are shared by processes."""
+
+    def __init__(self, path: Path, ttl: Optional[float] = None):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_calls (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM llm_calls WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or (self.ttl is not None and row[1] < time.time() - self.ttl):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_calls VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_calls")
+            self._conn.commit()
+
+
+class LLMCallCache:
+    """Memoizes ``prompt | llm | parser`` calls.
+
+    Keys combine the fully rendered prompt (template plus variables), the
+    model name and the temperature. Backends are consulted in order, and a
+    hit in a later tier (e.g. SQLite) is copied into the earlier ones (e.g.
+    the in-memory LRU).
+    """
+
+    def __init__(self, backends: Optional[List[Any]] = None):
+        self.backends = backends if backends is not None else [InMemoryLRUBackend()]
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    @staticmethod
+    def make_key(rendered_prompt: str, model: Any, temperature: Any) -> str:
+        payload = json.dumps([str(model), str(temperature), rendered_prompt])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, namespace: str = "default") -> Optional[Any]:
+        for i, backend in enumerate(self.backends):
+            value = backend.get(key)
+            if value is not None:
+                for earlier in self.backends[:i]:
+                    earlier.set(key, value)
+                self.hits[namespace] += 1
+                return value
+        self.misses[namespace] += 1
+        return None
+
+    def set(self, key: str, value: Any):
+        for backend in self.backends:
+            backend.set(key, value)
+
+    def wrap(self, prompt, llm, parser=None, namespace: str = "default", with_status: bool = False) -> Runnable:
+        """Build ``prompt | llm | parser`` with a cache lookup in front of it.
+
+        Args:
+            prompt: The prompt template
+            llm: The chat model
+            parser: Output parser; its output must be JSON-serializable
+                (defaults to StrOutputParser)
+            namespace (str): Label under which hits and misses are counted
+            with_status (bool): Return ``(output, called)`` instead of the
+                output, where ``called`` is False when the cache answered
+
+        Returns:
+            Runnable: Supports invoke and ainvoke like the unwrapped chain
+        """
+        chain = prompt | llm | (parser or StrOutputParser())
+        model = getattr(llm, "model", None)
+        temperature = getattr(llm, "temperature", None)
+
+        def key_for(inputs: Dict[str, Any]) -> str:
+            return self.make_key(prompt.invoke(inputs).to_string(), model, temperature)
+
+        def invoke(inputs: Dict[str, Any]):
+            with span(f"cached_{namespace}", "cache") as call:
+                key = key_for(inputs)
+                cached = self.get(key, namespace)
+                call.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return (cached, False) if with_status else cached
+                result = chain.invoke(inputs)
+                self.set(key, result)
+                return (result, True) if with_status else result
+
+        async def ainvoke(inputs: Dict[str, Any]):
+            with span(f"cached_{namespace}", "cache") as call:
+                key = key_for(inputs)
+                cached = self.get(key, namespace)
+                call.set(cache_hit=cached is not None)
+                if cached is not None:
+                    return (cached, False) if with_status else cached
+                result = await chain.ainvoke(inputs)
+                self.set(key, result)
+                return (result, True) if with_status else result
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"cached_{namespace}")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Hit and miss counts per namespace."""
+        namespaces = set(self.hits) | set(self.misses)
+        return {
+            namespace: {"hits": self.hits[namespace], "misses": self.misses[namespace]}
+            for namespace in sorted(namespaces)
+        }
+
+    def clear(self):
+        for backend in self.backends:
+            backend.clear()
+        self.hits.clear()
+        self.misses.clear()
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import logging
+import math
+import operator
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .corpus_version import get_corpus_version
+from ..config.config import (
+    CACHE_DIR,
+    RESPONSE_CACHE_TTL,
+    RESPONSE_CACHE_MAX_ENTRIES,
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?.!]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Normalize a query so trivially different phrasings share a cache key."""
+    query = _WHITESPACE.sub(" ", query.strip().lower())
+    return _TRAILING_PUNCTUATION.sub("", query)
+
+
+def _unit_vector(vector: List[float]) -> array:
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return array("f", (x / norm for x in vector))
+
+
+class ResponseCache:
+    """Persistent cache of workflow responses, stored in SQLite under CACHE_DIR.
+
+    Entries are keyed on the normalized query and tagged with the corpus
+    version they were built against, so an answer never outlives the documents
+    it came from. Entries also expire after ``ttl`` seconds, and the least
+    recently used ones are evicted beyond ``max_entries``. When an
+    ``embed_fn`` and ``similarity_threshold`` are given, a query with no exact
+    match can still hit an entry whose query embedding is close enough.
+    """
+
+    def __init__(
+        self,
+        path: Path = CACHE_DIR / "responses.sqlite",
+        ttl: float = RESPONSE_CACHE_TTL,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        embed_fn: Optional[Callable[[str], List[float]]] = None,
+        similarity_threshold: Optional[float] = RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+        corpus_version_fn: Callable[[], str] = get_corpus_version,
+    ):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.embed_fn = embed_fn if similarity_threshold is not None else None
+        self.similarity_threshold = similarity_threshold
+        self.corpus_version_fn = corpus_version_fn
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                corpus_version TEXT NOT NULL,
+                response TEXT NOT NULL,
+                embedding BLOB,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _key(normalized_query: str) -> str:
+        return hashlib.sha256(normalized_query.encode("utf-8")).hexdigest()
+
+    def _purge_stale(self, corpus_version: str, now: float):
+        """Drop entries built against another corpus version or past their TTL."""
+        self._conn.execute(
+            "DELETE FROM responses WHERE corpus_version != ? OR created_at < ?",
+            (corpus_version, now - self.ttl)
+        )
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a query, or None on a miss."""
+        normalized = normalize_query(query)
+        # Embed outside the lock; it may be a network call
+        embedding = self._embed(normalized) if self.embed_fn else None
+        corpus_version = self.corpus_version_fn()
+        now = time.time()
+
+        with self._lock:
+            self._purge_stale(corpus_version, now)
+            row = self._conn.execute(
+                "SELECT key, response FROM responses WHERE key = ?",
+                (self._key(normalized),)
+            ).fetchone()
+            if row is None and embedding is not None:
+                row = self._nearest(embedding)
+
+            if row is None:
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, row[0])
+            )
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[1])
+
+    def put(self, query: str, response: Dict[str, Any], corpus_version: Optional[str] = None):
+        """Store a response, evicting least recently used entries beyond max_entries.
+
+        Args:
+            query (str): The query the response answers
+            response (Dict[str, Any]): JSON-serializable response
+            corpus_version (str, optional): Version of the corpus the response
+                was built from, read before answering; defaults to the current one
+        """
+        normalized = normalize_query(query)
+        embedding = self._embed(normalized) if self.embed_fn else None
+        if corpus_version is None:
+            corpus_version = self.corpus_version_fn()
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(normalized),
+                    normalized,
+                    corpus_version,
+                    json.dumps(response),
+                    embedding.tobytes() if embedding is not None else None,
+                    now,
+                    now,
+                )
+            )
+            self._conn.execute(
+                """DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def _embed(self, normalized_query: str) -> Optional[array]:
+        try:
+            return _unit_vector(self.embed_fn(normalized_query))
+        except Exception as e:
+            logger.warning(f"Could not embed query for semantic cache lookup: {str(e)}")
+            return None
+
+    def _nearest(self, embedding: array):
+        """Find the most similar cached query at or above the similarity threshold."""
+        best_row, best_score = None, self.similarity_threshold
+        for key, response, blob in self._conn.execute(
+            "SELECT key, response, embedding FROM responses WHERE embedding IS NOT NULL"
+        ):
+            candidate = array("f")
+            candidate.frombytes(blob)
+            if len(candidate) != len(embedding):
+                continue
+            # Both vectors are unit length, so the dot product is the cosine similarity
+            score = sum(map(operator.mul, embedding, candidate))
+            if score >= best_score:
+                best_row, best_score = (key, response), score
+        return best_row
+
+    def clear(self):
+        """Remove every cached response."""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
@@ -0,0 +1,159 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from .response_cache import normalize_query
+from ..config.config import (
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_MAX_ENTRIES,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SearchCache:
+    """Persistent TTL cache of raw web search responses, with request coalescing.
+
+    Responses are stored in SQLite, keyed on the normalized query and the
+    search parameters. ``get_or_fetch`` and ``aget_or_fetch`` also collapse
+    concurrent misses for the same key into a single outbound call: the first
+    caller fetches, later callers wait for its result (single flight). Failed
+    fetches are never cached.
+    """
+
+    def __init__(self, path: Path = SEARCH_CACHE_PATH, ttl: Optional[float] = SEARCH_CACHE_TTL,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS searches (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS searches_created_at ON searches (created_at)")
+        self._conn.commit()
+
+        self._flights: Dict[str, Future] = {}
+        self._async_flights: Dict[Tuple[int, str], asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    @staticmethod
+    def make_key(query: str, **params) -> str:
+        payload = json.dumps([normalize_query(query), params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            return self._read(key)
+
+    def _read(self, key: str) -> Optional[Any]:
+        """Look a key up; the caller holds ``_lock``."""
+        row = self._conn.execute("SELECT value, created_at FROM searches WHERE key = ?", (key,)).fetchone()
+        if row is None or (self.ttl is not None and row[1] < time.time() - self.ttl):
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO searches VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time())
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM searches WHERE created_at < ?", (time.time() - self.ttl,))
+        count = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM searches WHERE key IN "
+                "(SELECT key FROM searches ORDER BY created_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+
+    def get_or_fetch(self, key: str, fetch: Callable[[], Any]) -> Any:
+        """Return the cached response for ``key``, or fetch it once however many threads ask."""
+        # The lookup and the flight check share one critical section: a leader stores its
+        # result before retiring its flight, so a late arrival finds one or the other
+        with self._lock:
+            value = self._read(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._flights[key] = future
+                self.misses += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+
+        try:
+            value = fetch()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    async def aget_or_fetch(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Async version of get_or_fetch; coalesces callers on the same event loop."""
+        flight_key = (id(asyncio.get_running_loop()), key)
+        with self._lock:
+            value = self._read(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            task = self._async_flights.get(flight_key)
+            if task is None:
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if task is None:
+            async def fetch_and_store():
+                result = await fetch()
+                self.set(key, result)
+                return result
+
+            task = asyncio.ensure_future(fetch_and_store())
+            self._async_flights[flight_key] = task
+            task.add_done_callback(lambda _: self._async_flights.pop(flight_key, None))
+        # Shielded so a caller that gives up (e.g. wait_for) does not cancel the others' fetch
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced, "entries": entries}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM searches")
+            self._conn.commit()
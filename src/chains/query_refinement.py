@@ -0,0 +1,80 @@
+import logging
+import re
+from typing import List
+from langchain_core.output_parsers import StrOutputParser
+from src.prompts.legal_prompts import SEARCH_QUERY_REFINEMENT_PROMPT
+from src.cache.response_cache import normalize_query
+from src.utils.registry import get_registry
+from src.config.config import MAX_REFINED_QUERIES
+
+logger = logging.getLogger(__name__)
+
+# "1. query", "2) query", "- query", "* query", "• query"
+_LIST_MARKER = re.compile(r"^\s*(?:[-*•]|\d+[.)]|query\s*\d*\s*:)\s*", re.IGNORECASE)
+_MAX_QUERY_CHARS = 300
+
+
+def parse_refined_queries(text: str, original_query: str, max_queries: int = MAX_REFINED_QUERIES) -> List[str]:
+    """Turn the refinement prompt's output into a list of search queries.
+
+    Args:
+        text (str): LLM output, one query per line (numbering and bullets are tolerated)
+        original_query (str): The user's query; always returned first
+        max_queries (int): Refined queries kept in addition to the original
+
+    Returns:
+        List[str]: The original query followed by up to max_queries distinct refinements
+    """
+    queries = [original_query]
+    seen = {normalize_query(original_query)}
+    for line in text.splitlines():
+        query = _LIST_MARKER.sub("", line).strip().strip("*\"'` ").strip()
+        # Skip blanks, headings such as "Search queries:" and runaway prose
+        if not query or query.endswith(":") or len(query) > _MAX_QUERY_CHARS:
+            continue
+        key = normalize_query(query)
+        if key in seen:
+            continue
+        seen.add(key)
+        queries.append(query)
+        if len(queries) > max_queries:
+            break
+    return queries
+
+
+class QueryRefiner:
+    def __init__(self, llm=None, max_queries: int = MAX_REFINED_QUERIES):
+        """Initialize the refiner with SEARCH_QUERY_REFINEMENT_PROMPT.
+
+        Args:
+            llm: Chat model to use (defaults to the shared Gemini client at temperature 0)
+            max_queries (int): Refined queries kept in addition to the original
+        """
+        registry = get_registry()
+        self.llm = llm if llm is not None else registry.get_llm(temperature=0)
+        self.max_queries = max_queries
+        # Memoized, so a repeated query costs no LLM call
+        self.refinement_chain = registry.get_llm_cache().wrap(
+            SEARCH_QUERY_REFINEMENT_PROMPT,
+            self.llm,
+            StrOutputParser(),
+            namespace="query_refinement"
+        )
+
+    def refine(self, query: str) -> List[str]:
+        """The original query plus its refinements; just the original if refinement fails."""
+        try:
+            text = self.refinement_chain.invoke({"original_query": query})
+            return parse_refined_queries(text, query, self.max_queries)
+        except Exception as e:
+            logger.warning(f"Query refinement failed, searching the original query only: {str(e)}")
+            return [query]
+
+    async def arefine(self, query: str) -> List[str]:
+        """Async version of refine."""
+        try:
+            text = await self.refinement_chain.ainvoke({"original_query": query})
+            return parse_refined_queries(text, query, self.max_queries)
+        except Exception as e:
+            logger.warning(f"Query refinement failed, searching the original query only: {str(e)}")
+            return [query]
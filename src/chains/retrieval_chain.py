@@ -1,99 +1,504 @@
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
-from langchain_google_genai import ChatGoogleGenerativeAI
+import asyncio
+import logging
+import re
+from typing import List, Optional, Tuple
+from langchain_core.runnables import RunnablePassthrough, RunnableParallel, RunnableLambda
 from langchain_core.output_parsers import StrOutputParser
-from src.data.vector_store import VectorStore
-from src.prompts.legal_prompts import LEGAL_RESEARCH_PROMPT, DOCUMENT_RELEVANCE_PROMPT
-from config import GOOGLE_API_KEY, MODEL_NAME, MAX_DOCUMENTS_TO_RETRIEVE
+from src.prompts.legal_prompts import (
+    LEGAL_RESEARCH_PROMPT,
+    DOCUMENT_RELEVANCE_PROMPT,
+    BATCH_DOCUMENT_RELEVANCE_PROMPT,
+)
+from src.utils.lexical import tokenize, bm25_scores
+from src.utils.rank_fusion import reciprocal_rank_fusion
+from src.utils.legal_metadata import infer_filters
+from src.utils.context_packer import ContextPacker, fit_text
+from src.data.lexical_index import chunk_id
+from src.utils.registry import get_registry
+from src.utils.tracing import span, submit_in_context
+from src.config.config import (
+    CONTEXT_TOKEN_BUDGET,
+    SEARCH_CONTEXT_TOKEN_BUDGET,
+    DEDUP_ENABLED,
+    METADATA_FILTERING_ENABLED,
+    RETRIEVAL_MODE,
+    RRF_K,
+    RERANK_MODE,
+    RERANK_CANDIDATES,
+    RERANK_MIN_SCORE,
+    RERANK_MAX_CHARS_PER_DOCUMENT,
+)
+from config import MODEL_NAME, MAX_DOCUMENTS_TO_RETRIEVE
+
+logger = logging.getLogger(__name__)
+
+# "Document 3: 7", "Document #3 - 7.5", ...
+_SCORE_LINE = re.compile(r"document\s*#?\s*(\d+)\s*[:=-]\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+
+class RetrievedDocuments(list):
+    """(document, distance) pairs, best first, with the LLM calls made to rank them."""
+
+    def __init__(self, pairs=(), llm_calls: int = 0):
+        super().__init__(pairs)
+        self.llm_calls = llm_calls
+
 
 class RetrievalChain:
-    def __init__(self):
-        """Initialize the retrieval chain with vector store and LLM."""
-        self.vector_store = VectorStore()
+    def __init__(self, rerank_mode: str = RERANK_MODE, retrieval_mode: str = RETRIEVAL_MODE,
+                 metadata_filtering: bool = METADATA_FILTERING_ENABLED):
+        """Initialize the retrieval chain with the shared vector store and LLM.
         
-        self.llm = ChatGoogleGenerativeAI(
-            model=MODEL_NAME,
-            google_api_key=GOOGLE_API_KEY,
-            temperature=0.2
+        Args:
+            rerank_mode (str): "off", "lexical" or "llm"; how retrieved chunks
+                are reordered and pruned before they fill the research prompt
+            retrieval_mode (str): "vector", or "hybrid" to fuse vector results
+                with the BM25 index so exact citation matches are not missed
+            metadata_filtering (bool): Restrict retrieval to the jurisdiction,
+                court, document type and dates the query names
+        """
+        self.rerank_mode = rerank_mode
+        self.metadata_filtering = metadata_filtering
+        registry = get_registry()
+        self.vector_store = registry.get_vector_store()
+        self.lexical_index = registry.get_lexical_index() if retrieval_mode == "hybrid" else None
+        self.llm = registry.get_llm(model=MODEL_NAME, temperature=0.2)
+
+        # Document relevance evaluator, memoized per (query, document) pair
+        self.relevance_evaluator = registry.get_llm_cache().wrap(
+            DOCUMENT_RELEVANCE_PROMPT,
+            self.llm,
+            StrOutputParser(),
+            namespace="document_relevance"
         )
         
-        # Document relevance evaluator
-        self.relevance_evaluator = (
-            DOCUMENT_RELEVANCE_PROMPT 
-            | self.llm 
+        # Batched relevance evaluator: one call scores every retrieved chunk;
+        # it also reports whether the model ran, so cache hits are not counted as calls
+        self.batch_relevance_evaluator = registry.get_llm_cache().wrap(
+            BATCH_DOCUMENT_RELEVANCE_PROMPT,
+            self.llm,
+            StrOutputParser(),
+            namespace="batch_relevance",
+            with_status=True
+        )
+
+        # Answer generation from an already assembled context
+        self.answer_chain = (
+            LEGAL_RESEARCH_PROMPT
+            | self.llm
             | StrOutputParser()
         )
-        
-        # Setup retrieval chain
+
+        # Setup retrieval chain (context building has a native async path for ainvoke)
         self.retrieval_chain = (
-            RunnableParallel(
-                {"query": RunnablePassthrough(), "context": self._retrieve_documents}
+            RunnablePassthrough.assign(
+                context=RunnableLambda(self._build_context, afunc=self._abuild_context)
             )
-            | LEGAL_RESEARCH_PROMPT
-            | self.llm
-            | StrOutputParser()
+            | self.answer_chain
         )
-    
+
+    @staticmethod
+    def _normalize_query(query):
+        # Handle dictionary input
+        if isinstance(query, dict):
+            query = query.get("query", "")
+        elif not isinstance(query, str):
+            query = str(query)
+        return query
+
+    def retrieve_documents(self, query, queries: Optional[List[str]] = None) -> RetrievedDocuments:
+        """Retrieve (document, distance) pairs for a query, most relevant first.
+
+        Args:
+            query: The legal query
+            queries (List[str], optional): Refined queries (the original among
+                them) to search as well. They are searched concurrently, fused
+                by chunk ID with reciprocal-rank fusion and reranked against
+                the original query.
+
+        Returns:
+            RetrievedDocuments: The pairs, and how many LLM calls reranking made
+        """
+        query = self._normalize_query(query)
+
+        # Ensure query is not empty
+        if not query.strip():
+            raise ValueError("Empty query received")
+
+        k = self._candidate_count()
+        filters = self.query_filters(query)
+        queries = self._search_queries(query, queries)
+        if len(queries) == 1:
+            rankings = [self._search_vector(query, k, filters)]
+        else:
+            executor = get_registry().get_executor("retrieval")
+            futures = [submit_in_context(executor, self._search_vector, sub_query, k, filters) for sub_query in queries]
+            rankings = [future.result() for future in futures]
+        docs = self._fuse_queries(queries, rankings, k, filters)
+        llm_calls = 0
+        if self.rerank_mode != "off":
+            docs, llm_calls = self._rerank(query, docs, use_llm=self.rerank_mode == "llm")
+        return RetrievedDocuments(self._annotate_sources(docs[:MAX_DOCUMENTS_TO_RETRIEVE]), llm_calls)
+
+    async def aretrieve_documents(self, query, queries: Optional[List[str]] = None) -> RetrievedDocuments:
+        """Async version of retrieve_documents."""
+        query = self._normalize_query(query)
+
+        if not query.strip():
+            raise ValueError("Empty query received")
+
+        k = self._candidate_count()
+        filters = self.query_filters(query)
+        queries = self._search_queries(query, queries)
+        rankings = await asyncio.gather(*(self._asearch_vector(sub_query, k, filters) for sub_query in queries))
+        # In-memory postings lookups are cheap enough to run on the event loop
+        docs = self._fuse_queries(queries, list(rankings), k, filters)
+        llm_calls = 0
+        if self.rerank_mode != "off":
+            docs, llm_calls = await self._arerank(query, docs, use_llm=self.rerank_mode == "llm")
+        return RetrievedDocuments(self._annotate_sources(docs[:MAX_DOCUMENTS_TO_RETRIEVE]), llm_calls)
+
+    @staticmethod
+    def _search_queries(query, queries):
+        queries = [sub_query for sub_query in queries or [] if sub_query and sub_query.strip()]
+        return queries if len(queries) > 1 else [query]
+
+    def _search_vector(self, query, k, filters):
+        docs = self.vector_store.similarity_search_with_score(query, k=k, filter=filters)
+        # Sort by relevance score (lower distance is better)
+        docs.sort(key=lambda x: x[1])
+        if filters and len(docs) < k:
+            docs = self._top_up(docs, self.vector_store.similarity_search_with_score(query, k=k), k)
+        return docs
+
+    async def _asearch_vector(self, query, k, filters):
+        docs = await self.vector_store.asimilarity_search_with_score(query, k=k, filter=filters)
+        docs.sort(key=lambda x: x[1])
+        if filters and len(docs) < k:
+            docs = self._top_up(docs, await self.vector_store.asimilarity_search_with_score(query, k=k), k)
+        return docs
+
+    def _fuse_queries(self, queries, vector_rankings, k, filters):
+        """Fuse per-query vector (and, in hybrid mode, BM25) rankings into one list."""
+        rankings = list(vector_rankings)
+        if self.lexical_index is not None:
+            rankings += [self._search_lexical(sub_query, k, filters) for sub_query in queries]
+        if len(rankings) == 1:
+            return rankings[0]
+        # No more candidates than a single hybrid search yields, however many queries ran
+        return self.fuse_rankings(rankings)[:2 * k]
+
+    def query_filters(self, query):
+        """Metadata filter implied by the query, or None."""
+        if not self.metadata_filtering:
+            return None
+        return infer_filters(query) or None
+
+    @staticmethod
+    def _top_up(docs, fallback, k):
+        """Fill filtered results up to k from unfiltered ones, keeping the filtered ones first.
+        
+        Chunks without metadata for a filtered field (e.g. an untagged upload)
+        can then still be retrieved when too few chunks match the filter.
+        """
+        seen = {chunk_id(doc) for doc, _ in docs}
+        extra = [(doc, score) for doc, score in fallback if chunk_id(doc) not in seen]
+        return docs + extra[:k - len(docs)]
+
+    def _search_lexical(self, query, k, filters):
+        with span("lexical_search", "lexical", k=k, filtered=bool(filters)):
+            docs = self.lexical_index.search(query, k=k, filter=filters)
+            if filters and len(docs) < k:
+                docs = self._top_up(docs, self.lexical_index.search(query, k=k), k)
+            return docs
+
+    def _candidate_count(self):
+        if self.rerank_mode == "off":
+            return MAX_DOCUMENTS_TO_RETRIEVE
+        return max(RERANK_CANDIDATES, MAX_DOCUMENTS_TO_RETRIEVE)
+
+    @staticmethod
+    def _annotate_sources(docs):
+        """Record the sources that still contain each deduplicated chunk in its metadata."""
+        if DEDUP_ENABLED and docs:
+            deduplicator = get_registry().get_deduplicator()
+            for doc, _ in docs:
+                sources = deduplicator.sources(chunk_id(doc))
+                if sources:
+                    doc.metadata["sources"] = sources
+        return docs
+
+    @classmethod
+    def fuse_results(cls, vector_docs, lexical_docs, k: int = RRF_K):
+        """Merge vector and BM25 results with reciprocal-rank fusion.
+        
+        Args:
+            vector_docs (list): (document, distance) pairs, best first
+            lexical_docs (list): (document, BM25 score) pairs, best first
+            k (int): RRF damping constant
+        
+        Returns:
+            list: (document, distance) pairs, best first. The distance is derived
+                from the fused score, so the best chunk gets 0.
+        """
+        return cls.fuse_rankings([vector_docs, lexical_docs], k=k)
+
+    @staticmethod
+    def fuse_rankings(rankings, k: int = RRF_K):
+        """Merge any number of (document, score) rankings by chunk ID with reciprocal-rank fusion.
+        
+        Returns:
+            list: (document, distance) pairs, best first, as for fuse_results
+        """
+        documents = {}
+        keys = []
+        for results in rankings:
+            ranking = []
+            for doc, _ in results:
+                key = chunk_id(doc)
+                documents.setdefault(key, doc)
+                ranking.append(key)
+            keys.append(ranking)
+
+        fused = reciprocal_rank_fusion(keys, k=k)
+        if not fused:
+            return []
+        best = fused[0][1]
+        return [(documents[key], best / score - 1) for key, score in fused]
+
+    @staticmethod
+    def format_documents(docs, max_tokens: int = CONTEXT_TOKEN_BUDGET):
+        """Format (document, distance) pairs as prompt context within a token budget.
+        
+        Overlapping and adjacent chunks of a source are merged into one passage
+        and passages are packed best first, so the context never exceeds
+        ``max_tokens`` however many chunks were retrieved.
+        """
+        def format_passage(number, passage, content):
+            metadata = passage.document.metadata
+            source = ", ".join(metadata.get('sources') or [metadata.get('source', 'Unknown')])
+            section = f"Section: {metadata['section_path']}\n" if metadata.get('section_path') else ""
+            return (
+                f"Document {number}:\n"
+                f"Source: {source}\n"
+                f"{section}"
+                f"Relevance Score: {1/(1+passage.score):.2f}\n"
+                f"Content: {content}\n"
+            )
+
+        return "\n\n".join(ContextPacker(max_tokens).pack(docs, format_passage))
+
     def _retrieve_documents(self, query):
         """Retrieve relevant documents from vector store and format them."""
         try:
-            # Handle dictionary input
-            if isinstance(query, dict):
-                query = query.get("query", "")
-            elif not isinstance(query, str):
-                query = str(query)
-
-            # Ensure query is not empty
-            if not query.strip():
-                raise ValueError("Empty query received")
-
-            docs = self.vector_store.similarity_search_with_score(query, k=MAX_DOCUMENTS_TO_RETRIEVE)
-            
-            # Sort by relevance score (lower distance is better)
-            docs.sort(key=lambda x: x[1])
-            
-            # Format documents
-            formatted_docs = []
-            for i, (doc, score) in enumerate(docs, 1):
-                metadata = doc.metadata
-                source = metadata.get('source', 'Unknown')
-                formatted_docs.append(
-                    f"Document {i}:\n"
-                    f"Source: {source}\n"
-                    f"Relevance Score: {1/(1+score):.2f}\n"
-                    f"Content: {doc.page_content}\n"
-                )
-            
-            return "\n\n".join(formatted_docs)
-        
+            return self.format_documents(self.retrieve_documents(query))
+
         except Exception as e:
             logger.error(f"Error in document retrieval: {str(e)}")
             return "Error retrieving documents. Please try again with a different query."
-    
+
+    async def _aretrieve_documents(self, query):
+        try:
+            return self.format_documents(await self.aretrieve_documents(query))
+
+        except Exception as e:
+            logger.error(f"Error in document retrieval: {str(e)}")
+            return "Error retrieving documents. Please try again with a different query."
+
+    def retrieve_context(self, query):
+        """Retrieve and format the document context for a query without answering it."""
+        return self._retrieve_documents(query)
+
+    @staticmethod
+    def _combine_context(document_context, search_context=""):
+        """Combine retrieved documents with any web search results for the prompt."""
+        if search_context:
+            search_context = fit_text(search_context, SEARCH_CONTEXT_TOKEN_BUDGET)
+            return f"{document_context}\n\nWeb Search Results:\n{search_context}"
+        return document_context
+
+    def _build_context(self, inputs):
+        search_context = inputs.get("search_context", "") if isinstance(inputs, dict) else ""
+        return self._combine_context(self._retrieve_documents(inputs), search_context)
+
+    async def _abuild_context(self, inputs):
+        search_context = inputs.get("search_context", "") if isinstance(inputs, dict) else ""
+        return self._combine_context(await self._aretrieve_documents(inputs), search_context)
+
     def evaluate_document_relevance(self, query, document_content):
         """Evaluate the relevance of a document to the query."""
         return self.relevance_evaluator.invoke({
             "query": query,
             "document_content": document_content
         })
-    
-    def retrieve_and_answer(self, query, chat_history=None):
-        """Retrieve documents and answer the query."""
+
+    @staticmethod
+    def _scoring_inputs(query, documents):
+        return {
+            "query": query,
+            "documents": "\n\n".join(
+                f"Document {i}:\n{doc.page_content[:RERANK_MAX_CHARS_PER_DOCUMENT]}"
+                for i, doc in enumerate(documents, 1)
+            )
+        }
+
+    @staticmethod
+    def parse_relevance_scores(text: str, count: int) -> List[Optional[float]]:
+        """Parse "Document N: score" lines into scores clamped to 1-10 (None if missing)."""
+        scores: List[Optional[float]] = [None] * count
+        for match in _SCORE_LINE.finditer(text):
+            index = int(match.group(1)) - 1
+            if 0 <= index < count and scores[index] is None:
+                scores[index] = min(10.0, max(1.0, float(match.group(2))))
+        return scores
+
+    @staticmethod
+    def lexical_relevance_scores(query: str, documents) -> List[float]:
+        """BM25 scores of the documents against the query, rescaled to 1-10."""
+        raw = bm25_scores(tokenize(query), [tokenize(doc.page_content) for doc in documents])
+        best = max(raw, default=0.0)
+        if best <= 0:
+            return [1.0] * len(raw)
+        return [1.0 + 9.0 * score / best for score in raw]
+
+    def _fill_missing_scores(self, query, documents, scores):
+        if any(score is None for score in scores):
+            lexical = self.lexical_relevance_scores(query, documents)
+            scores = [score if score is not None else fallback for score, fallback in zip(scores, lexical)]
+        return scores
+
+    def score_documents(self, query: str, documents, use_llm: bool = True) -> List[float]:
+        """Score every document's relevance to the query (1-10) in a single LLM call.
+        
+        Documents the LLM leaves unscored, or all of them when use_llm is False
+        or the call fails (e.g. quota exhausted), get lexical BM25 scores instead.
+        """
+        return self._score(query, documents, use_llm)[0]
+
+    async def ascore_documents(self, query: str, documents, use_llm: bool = True) -> List[float]:
+        """Async version of score_documents."""
+        return (await self._ascore(query, documents, use_llm))[0]
+
+    def _score(self, query, documents, use_llm) -> Tuple[List[float], int]:
+        """score_documents plus the number of LLM calls made (0 on a cache hit or failure)."""
+        scores: List[Optional[float]] = [None] * len(documents)
+        llm_calls = 0
+        if use_llm and documents:
+            try:
+                text, called = self.batch_relevance_evaluator.invoke(self._scoring_inputs(query, documents))
+                scores = self.parse_relevance_scores(text, len(documents))
+                llm_calls = int(called)
+            except Exception as e:
+                logger.warning(f"Batched relevance scoring failed, using lexical scores: {str(e)}")
+        return self._fill_missing_scores(query, documents, scores), llm_calls
+
+    async def _ascore(self, query, documents, use_llm) -> Tuple[List[float], int]:
+        scores: List[Optional[float]] = [None] * len(documents)
+        llm_calls = 0
+        if use_llm and documents:
+            try:
+                text, called = await self.batch_relevance_evaluator.ainvoke(self._scoring_inputs(query, documents))
+                scores = self.parse_relevance_scores(text, len(documents))
+                llm_calls = int(called)
+            except Exception as e:
+                logger.warning(f"Batched relevance scoring failed, using lexical scores: {str(e)}")
+        return self._fill_missing_scores(query, documents, scores), llm_calls
+
+    @staticmethod
+    def _prune(docs, scores, top_n, min_score):
+        ranked = sorted(zip(docs, scores), key=lambda pair: pair[1], reverse=True)
+        kept = [pair for pair, score in ranked if score >= min_score][:top_n]
+        # Never prune the context away entirely
+        return kept or [pair for pair, _ in ranked[:1]]
+
+    def rerank_documents(self, query: str, docs, use_llm: bool = True,
+                         top_n: int = MAX_DOCUMENTS_TO_RETRIEVE, min_score: float = RERANK_MIN_SCORE):
+        """Reorder (document, distance) pairs by relevance score and prune the weak ones.
+        
+        Args:
+            query (str): The legal query
+            docs (list): (document, distance) pairs from the vector store
+            use_llm (bool): Score with one batched LLM call rather than BM25
+            top_n (int): Maximum number of pairs to keep
+            min_score (float): Pairs scoring below this are dropped
+        """
+        return self._rerank(query, docs, use_llm, top_n, min_score)[0]
+
+    async def arerank_documents(self, query: str, docs, use_llm: bool = True,
+                                top_n: int = MAX_DOCUMENTS_TO_RETRIEVE, min_score: float = RERANK_MIN_SCORE):
+        """Async version of rerank_documents."""
+        return (await self._arerank(query, docs, use_llm, top_n, min_score))[0]
+
+    def _rerank(self, query, docs, use_llm, top_n=MAX_DOCUMENTS_TO_RETRIEVE, min_score=RERANK_MIN_SCORE):
+        scores, llm_calls = self._score(query, [doc for doc, _ in docs], use_llm)
+        return self._prune(docs, scores, top_n, min_score), llm_calls
+
+    async def _arerank(self, query, docs, use_llm, top_n=MAX_DOCUMENTS_TO_RETRIEVE, min_score=RERANK_MIN_SCORE):
+        scores, llm_calls = await self._ascore(query, [doc for doc, _ in docs], use_llm)
+        return self._prune(docs, scores, top_n, min_score), llm_calls
+
+    def _answer_inputs(self, query, chat_history, **extra):
+        query = self._normalize_query(query)
+        return {
+            "query": query,
+            "user_query": query,
+            "chat_history": chat_history or [],
+            **extra
+        }
+
+    def retrieve_and_answer(self, query, chat_history=None, search_context=""):
+        """Retrieve documents and answer the query.
+
+        Args:
+            query (str): The legal query
+            chat_history (list, optional): Previous conversation turns
+            search_context (str, optional): Web search results to add to the context
+        """
         try:
-            # Handle dictionary input
-            if isinstance(query, dict):
-                query = query.get("query", "")
-            elif not isinstance(query, str):
-                query = str(query)
-                
-            if chat_history is None:
-                chat_history = []
-                
-            return self.retrieval_chain.invoke({
-                "query": query,
-                "user_query": query,
-                "chat_history": chat_history
-            })
-            
+            return self.retrieval_chain.invoke(
+                self._answer_inputs(query, chat_history, search_context=search_context)
+            )
+
         except Exception as e:
             logger.error(f"Error in retrieval chain: {str(e)}")
-            return "Error processing your query. Please try again."
\ No newline at end of file
+            return "Error processing your query. Please try again."
+
+    async def aretrieve_and_answer(self, query, chat_history=None, search_context=""):
+        """Async version of retrieve_and_answer."""
+        try:
+            return await self.retrieval_chain.ainvoke(
+                self._answer_inputs(query, chat_history, search_context=search_context)
+            )
+
+        except Exception as e:
+            logger.error(f"Error in retrieval chain: {str(e)}")
+            return "Error processing your query. Please try again."
+
+    def answer(self, query, document_context, chat_history=None, search_context=""):
+        """Answer the query from a document context that was retrieved separately.
+
+        Args:
+            query (str): The legal query
+            document_context (str): Formatted documents, e.g. from retrieve_context
+            chat_history (list, optional): Previous conversation turns
+            search_context (str, optional): Web search results to add to the context
+        """
+        try:
+            return self.answer_chain.invoke(self._answer_inputs(
+                query, chat_history,
+                context=self._combine_context(document_context, search_context)
+            ))
+        except Exception as e:
+            logger.error(f"Error in answer chain: {str(e)}")
+            return "Error processing your query. Please try again."
+
+    async def aanswer(self, query, document_context, chat_history=None, search_context=""):
+        """Async version of answer."""
+        try:
+            return await self.answer_chain.ainvoke(self._answer_inputs(
+                query, chat_history,
+                context=self._combine_context(document_context, search_context)
+            ))
+        except Exception as e:
+            logger.error(f"Error in answer chain: {str(e)}")
+            return "Error processing your query. Please try again."
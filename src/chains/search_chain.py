@@ -1,61 +1,198 @@
+import asyncio
+import logging
+from typing import List, Optional
 from langchain_core.runnables import RunnablePassthrough
-from tavily import TavilyClient
-from langchain_community.utilities.tavily_search import TavilySearchAPIWrapper
-import os
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
-from config import TAVILY_API_KEY, GOOGLE_API_KEY
+from src.chains.query_refinement import QueryRefiner
+from src.config.config import MAX_SEARCH_RESULTS, SEARCH_TIMEOUT, SEARCH_CACHE_ENABLED, RRF_K
+from src.utils.rank_fusion import reciprocal_rank_fusion
+from src.utils.registry import get_registry
+from src.utils.tracing import span, submit_in_context
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 class SearchChain:
-    def __init__(self):
-        """Initialize the search chain with Tavily API."""
-        self.tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
-        self.search_wrapper = TavilySearchAPIWrapper(tavily_api_key=TAVILY_API_KEY)
+    def __init__(self, max_results: int = MAX_SEARCH_RESULTS, timeout: float = SEARCH_TIMEOUT,
+                 use_cache: bool = SEARCH_CACHE_ENABLED):
+        """Initialize the search chain with the shared Tavily client.
+        
+        Args:
+            max_results (int): Results requested from Tavily and kept per search
+            timeout (float): Seconds before a Tavily request is abandoned
+            use_cache (bool): Serve repeated searches from the on-disk search
+                cache and coalesce concurrent identical searches into one request
+        """
+        registry = get_registry()
+        self.tavily_client = registry.get_tavily_client()
+        self.async_tavily_client = registry.get_async_tavily_client()
+        self.max_results = max_results
+        self.timeout = timeout
+        self.search_cache = registry.get_search_cache() if use_cache else None
+        self.executor = registry.get_executor("search")
+        self.rate_limiter = registry.get_rate_limiter("tavily")
         
         try:
-            # Configure the Google Generative AI
-            genai.configure(api_key=GOOGLE_API_KEY)
-            
-            self.llm = ChatGoogleGenerativeAI(
-                model="gemini-1.5-flash-latest",
-                google_api_key=GOOGLE_API_KEY,
-                temperature=0
-            )
+            self.llm = registry.get_llm(temperature=0)
         except Exception as e:
             raise Exception(f"Failed to initialize Gemini model: {str(e)}")
+        self.query_refiner = QueryRefiner(self.llm)
     
-    def search(self, query: str, use_refinement: bool = False) -> dict:
+    def search(self, query: str, use_refinement: bool = False, queries: Optional[List[str]] = None) -> dict:
         """Perform search using Tavily API.
         
+        With several queries (given, or produced by refinement), every query is
+        searched concurrently and the results are merged by URL with
+        reciprocal-rank fusion, so the search takes as long as the slowest query.
+        
         Args:
             query (str): The search query
-            use_refinement (bool): Whether to use query refinement
+            use_refinement (bool): Refine the query with one LLM call and search
+                the refinements alongside it (ignored when queries are given)
+            queries (List[str], optional): Queries already refined by the caller
             
         Returns:
-            dict: Search results containing the list of results
+            dict: Search results containing the list of results (and, when several
+                queries were searched, the queries)
         """
         try:
-            # Use search() method instead of run()
-            search_results = self.tavily_client.search(query)
-            
-            # Format the results
-            if isinstance(search_results, dict):
-                results = search_results.get('results', [])
-                formatted_results = []
-                for result in results:
-                    formatted_results.append(f"Title: {result.get('title', '')}\nContent: {result.get('content', '')}")
+            if queries is None:
+                queries = self.query_refiner.refine(query) if use_refinement else [query]
+            if len(queries) == 1:
+                responses = [self.raw_search(queries[0])]
             else:
-                formatted_results = [str(search_results)]
+                futures = [submit_in_context(self.executor, self.raw_search, sub_query) for sub_query in queries]
+                responses = [self._outcome(future) for future in futures]
+            return self._merged_results(responses, queries)
+            
+        except Exception as e:
+            return self._error_results(e)
+    
+    async def asearch(self, query: str, use_refinement: bool = False, queries: Optional[List[str]] = None) -> dict:
+        """Async version of search, using the async Tavily client.
+        
+        Args:
+            query (str): The search query
+            use_refinement (bool): Refine the query and search the refinements too
+            queries (List[str], optional): Queries already refined by the caller
             
-            return {
-                "search_results": formatted_results,
-                "search_performed": True
-            }
+        Returns:
+            dict: Search results, as for search
+        """
+        try:
+            if queries is None:
+                queries = await self.query_refiner.arefine(query) if use_refinement else [query]
+            responses = await asyncio.gather(
+                *(self.araw_search(sub_query) for sub_query in queries),
+                return_exceptions=len(queries) > 1
+            )
+            return self._merged_results(list(responses), queries)
             
         except Exception as e:
-            print(f"Error performing search: {str(e)}")
-            return {
-                "search_results": [f"Error performing search: {str(e)}"],
-                "search_performed": False
-            }
\ No newline at end of file
+            return self._error_results(e)
+    
+    @staticmethod
+    def _outcome(future):
+        try:
+            return future.result()
+        except Exception as e:
+            return e
+    
+    def _merged_results(self, responses: list, queries: List[str]) -> dict:
+        """Format the responses to one or more queries; failed sub-queries are skipped."""
+        succeeded = [response for response in responses if not isinstance(response, Exception)]
+        if not succeeded:
+            raise responses[0]
+        failed = len(responses) - len(succeeded)
+        if failed:
+            logger.warning(f"{failed} of {len(queries)} search queries failed")
+        if len(queries) == 1:
+            return self._format_results(succeeded[0], self.max_results)
+        merged = self.merge_responses(succeeded, self.max_results)
+        return {**self._format_results(merged, self.max_results), "queries": queries}
+    
+    @staticmethod
+    def merge_responses(responses: list, max_results: Optional[int] = None, k: int = RRF_K) -> dict:
+        """Merge Tavily responses for several queries into one, deduplicated by URL.
+        
+        Args:
+            responses (list): Tavily response dicts, original query first
+            max_results (int, optional): Results kept after fusion
+            k (int): RRF damping constant
+        
+        Returns:
+            dict: A Tavily-style response whose results are ranked by reciprocal-rank fusion
+        """
+        results = {}
+        rankings = []
+        for response in responses:
+            ranking = []
+            for result in response.get("results", []) if isinstance(response, dict) else []:
+                key = result.get("url") or result.get("title") or result.get("content")
+                results.setdefault(key, result)
+                ranking.append(key)
+            rankings.append(ranking)
+        fused = reciprocal_rank_fusion(rankings, k=k)[:max_results]
+        return {"results": [results[key] for key, _ in fused]}
+    
+    def raw_search(self, query: str) -> dict:
+        """Tavily's response for a query, from the cache when possible."""
+        with span("tavily_search", "search", query=query) as call:
+            fetched = []
+
+            def fetch():
+                fetched.append(True)
+                self.rate_limiter.acquire()
+                return self.tavily_client.search(query, max_results=self.max_results, timeout=self.timeout)
+
+            if self.search_cache is None:
+                response = fetch()
+            else:
+                response = self.search_cache.get_or_fetch(
+                    self.search_cache.make_key(query, max_results=self.max_results), fetch
+                )
+            call.set(cache_hit=not fetched)
+            return response
+
+    async def araw_search(self, query: str) -> dict:
+        """Async version of raw_search."""
+        with span("tavily_search", "search", query=query) as call:
+            fetched = []
+
+            async def fetch():
+                fetched.append(True)
+                await self.rate_limiter.aacquire()
+                return await self.async_tavily_client.search(query, max_results=self.max_results, timeout=self.timeout)
+
+            if self.search_cache is None:
+                response = await fetch()
+            else:
+                response = await self.search_cache.aget_or_fetch(
+                    self.search_cache.make_key(query, max_results=self.max_results), fetch
+                )
+            call.set(cache_hit=not fetched)
+            return response
+
+    @staticmethod
+    def _format_results(search_results, max_results: Optional[int] = None) -> dict:
+        """Format raw Tavily output into the search chain's result dict."""
+        if isinstance(search_results, dict):
+            results = search_results.get('results', [])[:max_results]
+            formatted_results = []
+            for result in results:
+                formatted_results.append(f"Title: {result.get('title', '')}\nContent: {result.get('content', '')}")
+        else:
+            formatted_results = [str(search_results)]
+        
+        return {
+            "search_results": formatted_results,
+            "search_performed": True
+        }
+    
+    @staticmethod
+    def _error_results(error: Exception) -> dict:
+        logger.error(f"Error performing search: {str(error)}")
+        return {
+            "search_results": [f"Error performing search: {str(error)}"],
+            "search_performed": False
+        }
@@ -20,22 +20,128 @@ for directory in [DATA_DIR, LOGS_DIR, CACHE_DIR, Path(CHROMA_PERSIST_DIRECTORY)]
 # API Configuration
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+TAVILY_API_BASE_URL = os.getenv("TAVILY_API_BASE_URL")  # None for the public API; set to target a local fake
 
 # Model Configuration 
 MODEL_NAME = "gemini-1.5-flash-latest"
 TEMPERATURE = 0.7
 MAX_OUTPUT_TOKENS = 2048
+EMBEDDING_MODEL_NAME = "models/embedding-001"
 
 # Document Processing
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 
+# Chunking Configuration
+CHUNKING_MODE = "structure"  # "structure" (sections, articles, clauses) or "recursive" (fixed-size)
+
+# Ingestion Configuration
+INGEST_MAX_WORKERS = os.cpu_count() or 1  # Parser processes for directory ingestion
+INGEST_BATCH_SIZE = 256  # Chunks per vector store insert
+INGEST_MANIFEST_PATH = Path(CHROMA_PERSIST_DIRECTORY).parent / "ingest_manifest.sqlite"
+
+# Embedding Configuration
+EMBEDDING_CACHE_ENABLED = True  # Persist vectors by content hash so no text is embedded twice
+EMBEDDING_CACHE_DIR = CACHE_DIR / "embeddings"
+EMBEDDING_BATCH_SIZE = 100  # Texts per embedding request (the Gemini batch limit)
+EMBEDDING_MAX_CONCURRENCY = 4  # Embedding requests in flight at once
+
+# Vector Store Configuration
+VECTOR_STORE_BACKEND = "chroma"  # "chroma" or "local" (memory-mapped NumPy matrix, no external service)
+COLLECTION_NAME = "legal_documents"
+VECTOR_STORE_BATCH_SIZE = 256  # Chunks per embed + upsert round
+LOCAL_VECTOR_STORE_DIR = DATA_DIR / "vector_store"
+LOCAL_VECTOR_INDEX = "brute"  # "brute" (exact) or "hnsw" (approximate, requires hnswlib)
+
+# Metadata Configuration
+METADATA_EXTRACTION_ENABLED = True  # Tag chunks with jurisdiction, court, document type and effective date
+METADATA_SCAN_CHARS = 20000  # Opening characters of each document scanned for metadata
+METADATA_FILTERING_ENABLED = True  # Restrict retrieval to the jurisdiction/type/dates a query names
+METADATA_FILTER_FIELDS = ("jurisdiction", "court", "doc_type", "effective_year")  # Fields with value bitmaps
+
+# Deduplication Configuration
+DEDUP_ENABLED = True  # Store exact and near-duplicate chunks once, with every source recorded
+DEDUP_INDEX_PATH = DATA_DIR / "dedup_index.sqlite"
+DEDUP_NEAR_THRESHOLD = 0.85  # Estimated Jaccard similarity of word shingles; None for exact dedup only
+DEDUP_NUM_PERM = 128  # MinHash signature length
+DEDUP_BANDS = 32  # LSH bands (4 rows each), tuned to surface pairs around the threshold
+DEDUP_SHINGLE_SIZE = 5  # Words per shingle
+
+# Context Configuration
+CONTEXT_TOKEN_BUDGET = 3000  # Retrieved document context per prompt, after merging overlapping chunks
+SEARCH_CONTEXT_TOKEN_BUDGET = 1500  # Web search results per prompt
+STAGE_CONTEXT_TOKEN_BUDGET = MAX_OUTPUT_TOKENS  # Each earlier stage's output fed into a later prompt
+
+# Conversation Memory Configuration
+MEMORY_RECENT_TURNS = 3  # Latest question/answer pairs kept verbatim
+MEMORY_TOKEN_BUDGET = 1500  # Chat history (summary plus recent turns) per prompt
+MEMORY_SUMMARY_TOKEN_BUDGET = 400  # Running summary of the older turns
+
 # Search Configuration
 MAX_SEARCH_RESULTS = 5
 SEARCH_TIMEOUT = 10
+RETRIEVAL_TIMEOUT = 10
 MAX_DOCUMENTS_TO_RETRIEVE = 5
 SEARCH_CONFIDENCE_THRESHOLD = 0.7
 
+# Query Refinement Configuration
+QUERY_REFINEMENT_MODE = "search"  # "off", "search" (only queries routed to web search) or "always"
+MAX_REFINED_QUERIES = 4  # Refined queries searched alongside the original
+QUERY_REFINEMENT_TIMEOUT = 5  # Seconds; past this the original query is searched alone
+
+# Hybrid Retrieval Configuration
+RETRIEVAL_MODE = "hybrid"  # "vector" (Chroma only) or "hybrid" (Chroma + BM25 index, fused with RRF)
+LEXICAL_INDEX_PATH = DATA_DIR / "lexical_index.sqlite"
+RRF_K = 60  # Reciprocal-rank fusion damping constant
+
+# Reranking Configuration
+RERANK_MODE = "off"  # "off", "lexical" (BM25 against the query) or "llm" (one batched call)
+RERANK_CANDIDATES = 10  # Chunks fetched for reranking before pruning to MAX_DOCUMENTS_TO_RETRIEVE
+RERANK_MIN_SCORE = 3.0  # Chunks scoring below this (1-10 scale) are pruned
+RERANK_MAX_CHARS_PER_DOCUMENT = 1500  # Chunk text shown to the LLM scorer
+
+# Search Routing Configuration
+SEARCH_ROUTING_MODE = "hybrid"  # "llm", "local" or "hybrid" (LLM only for ambiguous queries)
+SEARCH_ROUTER_LOWER_THRESHOLD = 0.3  # Local score at or below this -> NO_SEARCH
+SEARCH_ROUTER_UPPER_THRESHOLD = 0.7  # Local score at or above this -> NEEDS_SEARCH
+SEARCH_ROUTER_EMBEDDING_MODEL = None  # Path to EmbeddingLinearModel weights (JSON)
+
+# Workflow Configuration
+MERGE_ANALYSIS_AND_FINAL = True  # One synthesis LLM call instead of analyze + finalize
+WORKFLOW_MAX_WORKERS = 8  # Threads shared by the parallel search/retrieval stage
+
+# Rate Limits (requests per minute shared by every caller in the process; None for no limit)
+GEMINI_REQUESTS_PER_MINUTE = None
+TAVILY_REQUESTS_PER_MINUTE = None
+
+# Batch Runner Configuration
+BATCH_CONCURRENCY = 4  # Queries processed at once
+BATCH_MAX_RETRIES = 3  # Further attempts for a query whose answer came back with an error
+BATCH_BACKOFF_SECONDS = 2.0  # First retry delay; doubles per attempt, with jitter
+BATCH_MAX_BACKOFF_SECONDS = 60.0
+
+# Tracing Configuration
+TRACE_EXPORTER = "jsonl"  # "jsonl" (one object per span), "otel" (OTLP/JSON per trace) or None
+TRACE_PATH = LOGS_DIR / "traces.jsonl"
+
+# Search Cache Configuration
+SEARCH_CACHE_ENABLED = True
+SEARCH_CACHE_PATH = CACHE_DIR / "search_results.sqlite"
+SEARCH_CACHE_TTL = 24 * 3600  # Seconds; web results go stale faster than answers from documents
+SEARCH_CACHE_MAX_ENTRIES = 10000
+
+# Response Cache Configuration
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_TTL = 7 * 24 * 3600  # Seconds
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_SIMILARITY_THRESHOLD = None  # e.g. 0.95 to also serve near-duplicate queries
+
+# LLM Call Cache Configuration (search determination, query refinement, relevance scoring)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_MAX_ENTRIES = 4096
+LLM_CACHE_SQLITE = False  # Also persist cached calls to CACHE_DIR/llm_calls.sqlite
+LLM_CACHE_TTL = 7 * 24 * 3600  # Seconds, for the SQLite backend
+
 # Define what to export
 __all__ = [
     'ROOT_DIR',
@@ -46,13 +152,81 @@ __all__ = [
     'CHROMA_PERSIST_DIRECTORY',
     'GOOGLE_API_KEY',
     'TAVILY_API_KEY',
+    'TAVILY_API_BASE_URL',
     'MODEL_NAME',
     'TEMPERATURE',
     'MAX_OUTPUT_TOKENS',
+    'EMBEDDING_MODEL_NAME',
     'CHUNK_SIZE',
     'CHUNK_OVERLAP',
+    'CHUNKING_MODE',
+    'INGEST_MAX_WORKERS',
+    'INGEST_BATCH_SIZE',
+    'INGEST_MANIFEST_PATH',
+    'EMBEDDING_CACHE_ENABLED',
+    'EMBEDDING_CACHE_DIR',
+    'EMBEDDING_BATCH_SIZE',
+    'EMBEDDING_MAX_CONCURRENCY',
+    'VECTOR_STORE_BACKEND',
+    'COLLECTION_NAME',
+    'VECTOR_STORE_BATCH_SIZE',
+    'LOCAL_VECTOR_STORE_DIR',
+    'LOCAL_VECTOR_INDEX',
+    'METADATA_EXTRACTION_ENABLED',
+    'METADATA_SCAN_CHARS',
+    'METADATA_FILTERING_ENABLED',
+    'METADATA_FILTER_FIELDS',
+    'DEDUP_ENABLED',
+    'DEDUP_INDEX_PATH',
+    'DEDUP_NEAR_THRESHOLD',
+    'DEDUP_NUM_PERM',
+    'DEDUP_BANDS',
+    'DEDUP_SHINGLE_SIZE',
+    'CONTEXT_TOKEN_BUDGET',
+    'SEARCH_CONTEXT_TOKEN_BUDGET',
+    'STAGE_CONTEXT_TOKEN_BUDGET',
+    'MEMORY_RECENT_TURNS',
+    'MEMORY_TOKEN_BUDGET',
+    'MEMORY_SUMMARY_TOKEN_BUDGET',
     'MAX_SEARCH_RESULTS',
     'SEARCH_TIMEOUT',
+    'RETRIEVAL_TIMEOUT',
     'MAX_DOCUMENTS_TO_RETRIEVE',
-    'SEARCH_CONFIDENCE_THRESHOLD'
+    'SEARCH_CONFIDENCE_THRESHOLD',
+    'QUERY_REFINEMENT_MODE',
+    'MAX_REFINED_QUERIES',
+    'QUERY_REFINEMENT_TIMEOUT',
+    'RETRIEVAL_MODE',
+    'LEXICAL_INDEX_PATH',
+    'RRF_K',
+    'RERANK_MODE',
+    'RERANK_CANDIDATES',
+    'RERANK_MIN_SCORE',
+    'RERANK_MAX_CHARS_PER_DOCUMENT',
+    'SEARCH_ROUTING_MODE',
+    'SEARCH_ROUTER_LOWER_THRESHOLD',
+    'SEARCH_ROUTER_UPPER_THRESHOLD',
+    'SEARCH_ROUTER_EMBEDDING_MODEL',
+    'MERGE_ANALYSIS_AND_FINAL',
+    'WORKFLOW_MAX_WORKERS',
+    'GEMINI_REQUESTS_PER_MINUTE',
+    'TAVILY_REQUESTS_PER_MINUTE',
+    'BATCH_CONCURRENCY',
+    'BATCH_MAX_RETRIES',
+    'BATCH_BACKOFF_SECONDS',
+    'BATCH_MAX_BACKOFF_SECONDS',
+    'TRACE_EXPORTER',
+    'TRACE_PATH',
+    'SEARCH_CACHE_ENABLED',
+    'SEARCH_CACHE_PATH',
+    'SEARCH_CACHE_TTL',
+    'SEARCH_CACHE_MAX_ENTRIES',
+    'RESPONSE_CACHE_ENABLED',
+    'RESPONSE_CACHE_TTL',
+    'RESPONSE_CACHE_MAX_ENTRIES',
+    'RESPONSE_CACHE_SIMILARITY_THRESHOLD',
+    'LLM_CACHE_ENABLED',
+    'LLM_CACHE_MAX_ENTRIES',
+    'LLM_CACHE_SQLITE',
+    'LLM_CACHE_TTL'
 ]
@@ -0,0 +1,19 @@
+from .lexical_index import LexicalIndex, chunk_id
+from .embeddings import CachedEmbeddings, EmbeddingCache
+from .dedup import ChunkDeduplicator, MinHasher, Removal
+from .vector_store import VectorStore
+from .manifest import IngestionManifest, ManifestEntry, hash_file
+
+__all__ = [
+    'VectorStore',
+    'LexicalIndex',
+    'chunk_id',
+    'CachedEmbeddings',
+    'EmbeddingCache',
+    'ChunkDeduplicator',
+    'MinHasher',
+    'Removal',
+    'IngestionManifest',
+    'ManifestEntry',
+    'hash_file'
+]
@@ -0,0 +1,292 @@
+"""Exact and near-duplicate chunk detection for the ingest path.
+
+Chunks are grouped: the first chunk of a group is the only one stored in the
+vector store and BM25 index, and every later exact copy (same normalized text)
+or near copy (MinHash Jaccard estimate at or above the threshold, found via
+LSH banding) joins its group as a member with its own source reference.
+Only chunks that agree on the filterable metadata fields are grouped, so a
+metadata filter never hides a duplicate from another jurisdiction or
+document type. Removing members only deletes the stored chunk once its group
+is empty, so boilerplate shared by many files survives re-ingestion of any
+one of them; when the member whose metadata the stored chunk carries goes
+away, the chunk is re-pointed at a surviving member.
+"""
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import threading
+import zlib
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .lexical_index import chunk_id
+from ..config.config import (
+    DEDUP_INDEX_PATH,
+    DEDUP_NEAR_THRESHOLD,
+    DEDUP_NUM_PERM,
+    DEDUP_BANDS,
+    DEDUP_SHINGLE_SIZE,
+    METADATA_FILTER_FIELDS,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase and collapse whitespace so formatting differences do not matter."""
+    return " ".join(text.lower().split())
+
+
+def metadata_scope(metadata: Dict[str, Any]) -> str:
+    """The filterable metadata values of a chunk; only chunks with equal scopes are grouped."""
+    return json.dumps([metadata.get(field) for field in METADATA_FILTER_FIELDS], default=str)
+
+
+class Removal(NamedTuple):
+    """Outcome of ``ChunkDeduplicator.remove``."""
+    emptied: List[str]  # Stored chunk IDs to delete
+    repointed: Dict[str, Dict[str, Any]]  # Stored chunk ID -> metadata of the surviving member to take on
+
+
+class MinHasher:
+    """MinHash signatures over word shingles, using multiply-shift hashing in NumPy."""
+
+    def __init__(self, num_perm: int = DEDUP_NUM_PERM, shingle_size: int = DEDUP_SHINGLE_SIZE, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self._a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        n = self.shingle_size
+        grams = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        return np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.uint64, count=len(grams))
+
+    def signature(self, text: str) -> np.ndarray:
+        shingles = self.shingles(text)
+        # (a * x + b) mod 2^64, keeping the high 32 bits
+        hashed = (np.outer(self._a, shingles) + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+class ChunkDeduplicator:
+    """Persistent grouping of duplicate chunks, backed by SQLite."""
+
+    def __init__(self, path: Path = DEDUP_INDEX_PATH, near_threshold: Optional[float] = DEDUP_NEAR_THRESHOLD,
+                 num_perm: int = DEDUP_NUM_PERM, bands: int = DEDUP_BANDS):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = Path(path)
+        self.near_threshold = near_threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.hasher = MinHasher(num_perm=num_perm)
+
+        self._lock = threading.Lock()
+        self._reset_memory()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunk_groups (
+                group_id TEXT PRIMARY KEY,
+                text_hash TEXT NOT NULL,
+                signature BLOB,
+                scope TEXT,
+                primary_member TEXT
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunk_members (
+                member_id TEXT PRIMARY KEY,
+                group_id TEXT NOT NULL,
+                source TEXT,
+                metadata TEXT
+            )"""
+        )
+        self._add_missing_columns()
+        self._conn.execute("CREATE INDEX IF NOT EXISTS chunk_members_group ON chunk_members (group_id)")
+        self._conn.commit()
+        self._load()
+
+    def _add_missing_columns(self):
+        # Indexes written before scopes and member metadata were recorded
+        for table, column in (("chunk_groups", "scope"), ("chunk_groups", "primary_member"),
+                              ("chunk_members", "metadata")):
+            columns = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+
+    def _reset_memory(self):
+        self._by_hash: Dict[Tuple[str, str], str] = {}
+        self._hash_of: Dict[str, Tuple[str, str]] = {}
+        self._primary: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, bytes], List[str]] = defaultdict(list)
+        self._group_of: Dict[str, str] = {}
+        self._members: Dict[str, Set[str]] = defaultdict(set)
+
+    def _index_group(self, group_id: str, key: Tuple[str, str], signature: Optional[np.ndarray],
+                     primary_member: str):
+        self._by_hash[key] = group_id
+        self._hash_of[group_id] = key
+        self._primary[group_id] = primary_member
+        if signature is not None:
+            self._signatures[group_id] = signature
+            for band, key in self._band_keys(signature):
+                self._buckets[(band, key)].append(group_id)
+
+    def _load(self):
+        for group_id, text_hash, blob, scope, primary_member in self._conn.execute(
+            "SELECT group_id, text_hash, signature, scope, primary_member FROM chunk_groups"
+        ):
+            signature = np.frombuffer(blob, dtype=np.uint32) if blob is not None else None
+            self._index_group(group_id, (text_hash, scope or metadata_scope({})), signature,
+                              primary_member or group_id)
+        for member_id, group_id in self._conn.execute("SELECT member_id, group_id FROM chunk_members"):
+            self._group_of[member_id] = group_id
+            self._members[group_id].add(member_id)
+
+    def _band_keys(self, signature: np.ndarray):
+        r = self.rows_per_band
+        for band in range(self.bands):
+            yield band, signature[band * r:(band + 1) * r].tobytes()
+
+    def _near_group(self, signature: np.ndarray, scope: str) -> Optional[str]:
+        best, best_score = None, self.near_threshold
+        seen = set()
+        for band, key in self._band_keys(signature):
+            for group_id in self._buckets.get((band, key), ()):
+                if group_id in seen:
+                    continue
+                seen.add(group_id)
+                if self._hash_of[group_id][1] != scope:
+                    continue
+                score = float(np.mean(self._signatures[group_id] == signature))
+                if score >= best_score:
+                    best, best_score = group_id, score
+        return best
+
+    def add(self, chunks: Iterable[Document]) -> List[Document]:
+        """Register chunks and return only those that start a new group.
+
+        Returns:
+            List[Document]: The chunks that should be embedded and stored
+        """
+        unique = []
+        groups, members = [], []
+        with self._lock:
+            for chunk in chunks:
+                member_id = chunk_id(chunk)
+                if member_id in self._group_of:
+                    continue
+                text_hash = hashlib.sha1(normalize_text(chunk.page_content).encode("utf-8")).hexdigest()
+                scope = metadata_scope(chunk.metadata)
+                group_id = self._by_hash.get((text_hash, scope))
+                signature = None
+                if group_id is None and self.near_threshold is not None:
+                    signature = self.hasher.signature(chunk.page_content)
+                    group_id = self._near_group(signature, scope)
+                if group_id is None:
+                    group_id = member_id
+                    self._index_group(group_id, (text_hash, scope), signature, member_id)
+                    groups.append((group_id, text_hash, signature.tobytes() if signature is not None else None,
+                                   scope, member_id))
+                    unique.append(chunk)
+
+                self._group_of[member_id] = group_id
+                self._members[group_id].add(member_id)
+                members.append((member_id, group_id, chunk.metadata.get("source"),
+                                json.dumps(chunk.metadata, default=str)))
+
+            self._conn.executemany("INSERT OR REPLACE INTO chunk_groups VALUES (?, ?, ?, ?, ?)", groups)
+            self._conn.executemany("INSERT OR REPLACE INTO chunk_members VALUES (?, ?, ?, ?)", members)
+            self._conn.commit()
+
+        if len(members) > len(unique):
+            logger.info(f"Deduplicated {len(members) - len(unique)} of {len(members)} chunks")
+        return unique
+
+    def remove(self, member_ids: Iterable[str]) -> Removal:
+        """Drop members.
+
+        Returns:
+            Removal: The stored chunk IDs whose groups became empty, and the
+                new metadata of stored chunks whose defining member was dropped
+                while other members survive
+        """
+        emptied, orphaned = [], []
+        with self._lock:
+            member_ids = [member_id for member_id in member_ids if member_id in self._group_of]
+            for member_id in member_ids:
+                group_id = self._group_of.pop(member_id)
+                self._members[group_id].discard(member_id)
+                if not self._members[group_id]:
+                    del self._members[group_id]
+                    emptied.append(group_id)
+                elif self._primary[group_id] == member_id:
+                    orphaned.append(group_id)
+            for group_id in emptied:
+                self._drop_group(group_id)
+
+            self._conn.executemany("DELETE FROM chunk_members WHERE member_id = ?", [(m,) for m in member_ids])
+            self._conn.executemany("DELETE FROM chunk_groups WHERE group_id = ?", [(g,) for g in emptied])
+            repointed = self._repoint([group_id for group_id in orphaned if group_id in self._members])
+            self._conn.commit()
+        return Removal(emptied, repointed)
+
+    def _repoint(self, group_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Make a surviving member define each group; returns the metadata the stored chunks should carry."""
+        repointed = {}
+        for group_id in group_ids:
+            primary = min(self._members[group_id])
+            self._primary[group_id] = primary
+            self._conn.execute("UPDATE chunk_groups SET primary_member = ? WHERE group_id = ?", (primary, group_id))
+            row = self._conn.execute("SELECT metadata FROM chunk_members WHERE member_id = ?", (primary,)).fetchone()
+            if row is None or row[0] is None:
+                # Recorded before member metadata was kept; the stored chunk keeps what it has
+                continue
+            # The stored chunk keeps its ID, whichever member it now stands for
+            repointed[group_id] = {**json.loads(row[0]), "chunk_id": group_id}
+        return repointed
+
+    def _drop_group(self, group_id: str):
+        key = self._hash_of.pop(group_id, None)
+        self._primary.pop(group_id, None)
+        if self._by_hash.get(key) == group_id:
+            del self._by_hash[key]
+        signature = self._signatures.pop(group_id, None)
+        if signature is not None:
+            for band, key in self._band_keys(signature):
+                bucket = self._buckets.get((band, key))
+                if bucket and group_id in bucket:
+                    bucket.remove(group_id)
+
+    def sources(self, stored_id: str) -> List[str]:
+        """Every source that contains the stored chunk or a duplicate of it."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT source FROM chunk_members WHERE group_id = ? AND source IS NOT NULL ORDER BY source",
+                (stored_id,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunk_groups")
+            self._conn.execute("DELETE FROM chunk_members")
+            self._conn.commit()
+            self._reset_memory()
+
+    def stats(self) -> Dict[str, int]:
+        return {"chunks": len(self._group_of), "stored": len(self._members)}
@@ -0,0 +1,178 @@
+"""Batched, cached embeddings.
+
+``CachedEmbeddings`` wraps any LangChain ``Embeddings``. It sends only the
+texts it has not embedded before, in batches of ``batch_size`` with up to
+``max_concurrency`` requests in flight. Every vector is kept in an
+``EmbeddingCache``: a content-addressed store whose float32 vectors live in
+one append-only file read through ``np.memmap``, with a SQLite index from
+content hash to row.
+"""
+import asyncio
+import hashlib
+import logging
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from ..config.config import (
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_MAX_CONCURRENCY,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingCache:
+    """Content hash -> float32 vector, persisted under ``directory``."""
+
+    def __init__(self, directory: Path = EMBEDDING_CACHE_DIR):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / "index.sqlite"), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimensions'").fetchone()
+        self.dimensions: Optional[int] = row[0] if row else None
+        self._rows = 0
+        if self.dimensions and self.vectors_path.exists():
+            # Rows are numbered by file position; drop any torn trailing write
+            row_bytes = 4 * self.dimensions
+            size = self.vectors_path.stat().st_size
+            if size % row_bytes:
+                with open(self.vectors_path, "r+b") as f:
+                    f.truncate(size - size % row_bytes)
+            self._rows = size // row_bytes
+        self._mapped: Optional[np.memmap] = None
+
+    @staticmethod
+    def key(namespace: str, text: str) -> str:
+        return hashlib.sha256(f"{namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def _matrix(self) -> Optional[np.memmap]:
+        # Remap only when rows were appended since the last mapping
+        if self._rows == 0:
+            return None
+        if self._mapped is None or len(self._mapped) < self._rows:
+            self._mapped = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(self._rows, self.dimensions))
+        return self._mapped
+
+    def _rows_for(self, keys: Sequence[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(keys), 500):
+            batch = list(keys[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(
+                f"SELECT key, row FROM vectors WHERE key IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Return the cached vectors among ``keys``."""
+        with self._lock:
+            rows = self._rows_for(keys)
+            matrix = self._matrix()
+            return {key: np.array(matrix[row]) for key, row in rows.items()}
+
+    def put_many(self, vectors: Dict[str, Sequence[float]]):
+        """Append vectors that are not cached yet."""
+        if not vectors:
+            return
+        with self._lock:
+            existing = self._rows_for(list(vectors))
+            new = {
+                key: np.asarray(vector, dtype=np.float32)
+                for key, vector in vectors.items() if key not in existing
+            }
+            if not new:
+                return
+            if self.dimensions is None:
+                self.dimensions = len(next(iter(new.values())))
+                self._conn.execute("INSERT INTO meta VALUES ('dimensions', ?)", (self.dimensions,))
+
+            # Vectors are written before their index rows, so a crash leaves at most unused rows
+            with open(self.vectors_path, "ab") as f:
+                first_row = f.seek(0, 2) // (4 * self.dimensions)
+                np.stack(list(new.values())).astype(np.float32).tofile(f)
+            self._conn.executemany(
+                "INSERT INTO vectors VALUES (?, ?)",
+                [(key, first_row + i) for i, key in enumerate(new)]
+            )
+            self._conn.commit()
+            self._rows = first_row + len(new)
+
+    def __len__(self) -> int:
+        return self._rows
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings that batch requests, run them concurrently and never embed a text twice."""
+
+    def __init__(self, embeddings: Embeddings, cache: Optional[EmbeddingCache] = None,
+                 namespace: str = "", batch_size: int = EMBEDDING_BATCH_SIZE,
+                 max_concurrency: int = EMBEDDING_MAX_CONCURRENCY):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace or getattr(embeddings, "model", type(embeddings).__name__)
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="embeddings")
+        self.hits = 0
+        self.misses = 0
+
+    def _embed_missing(self, texts: List[str]) -> List[List[float]]:
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = self._executor.map(self.embeddings.embed_documents, batches)
+        return [vector for batch in results for vector in batch]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        unique = list(dict.fromkeys(texts))
+        keys = {text: EmbeddingCache.key(f"{self.namespace}:document", text) for text in unique}
+        cached = self.cache.get_many(list(keys.values())) if self.cache is not None else {}
+
+        missing = [text for text in unique if keys[text] not in cached]
+        self.hits += len(unique) - len(missing)
+        self.misses += len(missing)
+        vectors = dict(cached)
+        if missing:
+            embedded = self._embed_missing(missing)
+            fresh = {keys[text]: vector for text, vector in zip(missing, embedded)}
+            if self.cache is not None:
+                self.cache.put_many(fresh)
+            vectors.update(fresh)
+        return [list(map(float, vectors[keys[text]])) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = EmbeddingCache.key(f"{self.namespace}:query", text)
+        if self.cache is not None:
+            cached = self.cache.get_many([key])
+            if key in cached:
+                self.hits += 1
+                return [float(x) for x in cached[key]]
+        self.misses += 1
+        vector = self.embeddings.embed_query(text)
+        if self.cache is not None:
+            self.cache.put_many({key: vector})
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses,
+                "cached_vectors": len(self.cache) if self.cache is not None else 0}
@@ -0,0 +1,330 @@
+"""Persistent BM25 inverted index over document chunks.
+
+Each term's posting list is a pair of parallel ``array('I')`` buffers (chunk
+ordinals and term frequencies). Ordinals only ever grow, so appends keep the
+lists sorted, and queries score them through NumPy views of the same buffers
+without copying. Only the postings of the query's terms are touched, which
+keeps citation lookups fast even over very large corpora.
+
+On disk, every ``add_documents`` call appends one posting segment per
+touched term to SQLite, so updates are incremental. Removed chunks are
+tombstoned and filtered out at query time, as are chunks excluded by a
+metadata filter (answered from per-value bitmaps, see ``metadata_index``).
+"""
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .metadata_index import BitmapIndex, filter_sql
+from ..cache.corpus_version import bump_corpus_version
+from ..config.config import LEXICAL_INDEX_PATH
+from ..utils.lexical import tokenize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def chunk_id(document: Document) -> str:
+    """Stable ID of a chunk: ``metadata["chunk_id"]`` if set, else a hash of its source and text."""
+    explicit = document.metadata.get("chunk_id")
+    if explicit:
+        return str(explicit)
+    payload = f"{document.metadata.get('source', '')}\0{document.page_content}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+class LexicalIndex:
+    """Incrementally updated BM25 index persisted in SQLite."""
+
+    def __init__(self, path: Path = LEXICAL_INDEX_PATH, k1: float = 1.5, b: float = 0.75,
+                 on_change: Optional[Callable[[], Any]] = bump_corpus_version):
+        """Open (or create) the index.
+
+        Args:
+            path (Path): SQLite file
+            k1 (float): BM25 term frequency saturation
+            b (float): BM25 length normalization
+            on_change (Callable, optional): Called after every write, by default
+                to bump the corpus version so cached answers are dropped
+        """
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.on_change = on_change
+
+        self._lock = threading.Lock()
+        self._reset_memory()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                ordinal INTEGER PRIMARY KEY,
+                chunk_id TEXT UNIQUE NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                length INTEGER NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS postings (
+                segment INTEGER PRIMARY KEY AUTOINCREMENT,
+                term TEXT NOT NULL,
+                ordinals BLOB NOT NULL,
+                frequencies BLOB NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._load()
+
+    def _reset_memory(self):
+        self._terms: Dict[str, int] = {}
+        self._ordinals: List[array] = []
+        self._frequencies: List[array] = []
+        self._lengths = array("I")
+        self._live = bytearray()
+        self._total_length = 0
+        self._live_count = 0
+        self._bitmaps = BitmapIndex()
+
+    def _slot(self, term: str) -> int:
+        slot = self._terms.get(term)
+        if slot is None:
+            slot = len(self._ordinals)
+            self._terms[term] = slot
+            self._ordinals.append(array("I"))
+            self._frequencies.append(array("I"))
+        return slot
+
+    def _load(self):
+        size = self._conn.execute("SELECT COALESCE(MAX(ordinal) + 1, 0) FROM chunks").fetchone()[0]
+        self._lengths = array("I", bytes(4 * size))
+        self._live = bytearray(size)
+        fields = ", ".join(f"json_extract(metadata, '$.{field}')" for field in self._bitmaps.fields)
+        for ordinal, length, *values in self._conn.execute(f"SELECT ordinal, length, {fields} FROM chunks"):
+            self._bitmaps.add(ordinal, dict(zip(self._bitmaps.fields, values)))
+            self._lengths[ordinal] = length
+            self._live[ordinal] = 1
+            self._total_length += length
+            self._live_count += 1
+
+        for term, ordinals, frequencies in self._conn.execute(
+            "SELECT term, ordinals, frequencies FROM postings ORDER BY segment"
+        ):
+            slot = self._slot(term)
+            self._ordinals[slot].frombytes(ordinals)
+            self._frequencies[slot].frombytes(frequencies)
+
+        # Postings may reference ordinals of chunks removed since (and beyond the last live one)
+        highest = max((postings[-1] for postings in self._ordinals if postings), default=-1)
+        if highest >= size:
+            self._lengths.extend([0] * (highest + 1 - size))
+            self._live.extend(bytes(highest + 1 - size))
+        if self._live_count:
+            logger.info(f"Loaded lexical index with {self._live_count} chunks and {len(self._terms)} terms")
+
+    def add_documents(self, documents: Iterable[Document]) -> int:
+        """Index documents, skipping chunks that are already indexed.
+
+        Returns:
+            int: Number of chunks newly indexed
+        """
+        documents = list(documents)
+        with self._lock:
+            existing = self._existing_ids([chunk_id(document) for document in documents])
+            segments: Dict[str, Tuple[array, array]] = {}
+            rows = []
+            for document in documents:
+                cid = chunk_id(document)
+                if cid in existing:
+                    continue
+                existing.add(cid)
+
+                ordinal = len(self._lengths)
+                tokens = tokenize(document.page_content)
+                for term, frequency in Counter(tokens).items():
+                    slot = self._slot(term)
+                    self._ordinals[slot].append(ordinal)
+                    self._frequencies[slot].append(frequency)
+                    segment = segments.setdefault(term, (array("I"), array("I")))
+                    segment[0].append(ordinal)
+                    segment[1].append(frequency)
+
+                self._lengths.append(len(tokens))
+                self._live.append(1)
+                self._bitmaps.add(ordinal, document.metadata)
+                self._total_length += len(tokens)
+                self._live_count += 1
+                rows.append((ordinal, cid, document.page_content,
+                             json.dumps(document.metadata, default=str), len(tokens)))
+
+            self._conn.executemany("INSERT INTO chunks VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.executemany(
+                "INSERT INTO postings (term, ordinals, frequencies) VALUES (?, ?, ?)",
+                [(term, ordinals.tobytes(), frequencies.tobytes())
+                 for term, (ordinals, frequencies) in segments.items()]
+            )
+            self._conn.commit()
+        if rows:
+            self._changed()
+        return len(rows)
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def _existing_ids(self, ids: List[str]) -> Set[str]:
+        found = set()
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            found.update(row[0] for row in self._conn.execute(
+                f"SELECT chunk_id FROM chunks WHERE chunk_id IN ({placeholders})", batch
+            ))
+        return found
+
+    def remove(self, ids: Iterable[str]) -> int:
+        """Tombstone chunks by ID.
+
+        Returns:
+            int: Number of chunks removed
+        """
+        ids = list(ids)
+        removed = 0
+        with self._lock:
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT ordinal, length FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ).fetchall()
+                for ordinal, length in rows:
+                    self._live[ordinal] = 0
+                    self._total_length -= length
+                    self._live_count -= 1
+                self._conn.execute(f"DELETE FROM chunks WHERE chunk_id IN ({placeholders})", batch)
+                removed += len(rows)
+            self._conn.commit()
+        if removed:
+            self._changed()
+        return removed
+
+    def update_metadata(self, metadatas: Dict[str, Dict[str, Any]]) -> int:
+        """Replace the metadata of indexed chunks, keyed by chunk ID.
+
+        Returns:
+            int: Number of chunks updated
+        """
+        ids = list(metadatas)
+        with self._lock:
+            contents = {}
+            for start in range(0, len(ids), 500):
+                batch = ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                contents.update(self._conn.execute(
+                    f"SELECT chunk_id, content FROM chunks WHERE chunk_id IN ({placeholders})", batch
+                ).fetchall())
+        # Bitmaps only grow, so the chunk is re-indexed under a new ordinal
+        self.remove(list(contents))
+        return self.add_documents(
+            Document(page_content=content, metadata=metadatas[cid]) for cid, content in contents.items()
+        )
+
+    def search(self, query: str, k: int = 5, filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Return up to ``k`` (document, BM25 score) pairs, best first.
+
+        Args:
+            query (str): The query text
+            k (int): Maximum number of results
+            filter (dict, optional): Chroma-style metadata filter applied before scoring
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            allowed = self._filter_mask(filter) if filter else None
+            ranked = self._score(terms, k, allowed)
+            if not ranked:
+                return []
+            placeholders = ",".join("?" * len(ranked))
+            rows = {
+                ordinal: (content, metadata)
+                for ordinal, content, metadata in self._conn.execute(
+                    f"SELECT ordinal, content, metadata FROM chunks WHERE ordinal IN ({placeholders})",
+                    [ordinal for ordinal, _ in ranked]
+                )
+            }
+        return [
+            (Document(page_content=rows[ordinal][0], metadata=json.loads(rows[ordinal][1])), score)
+            for ordinal, score in ranked if ordinal in rows
+        ]
+
+    def _filter_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        size = len(self._lengths)
+        mask = self._bitmaps.mask(where, size)
+        if mask is None:
+            # Filters on fields without bitmaps are evaluated by SQLite
+            sql, params = filter_sql(where)
+            mask = np.zeros(size, dtype=bool)
+            mask[[row[0] for row in self._conn.execute(f"SELECT ordinal FROM chunks WHERE {sql}", params)]] = True
+        return mask
+
+    def _score(self, terms: Set[str], k: int, allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        # The NumPy views below pin the array buffers, so they must not outlive the lock
+        if not self._live_count:
+            return []
+        slots = [self._terms[term] for term in terms if term in self._terms]
+        if not slots:
+            return []
+
+        n = self._live_count
+        avg_length = self._total_length / n or 1.0
+        lengths = np.frombuffer(self._lengths, dtype=np.uint32)
+        matched, contributions = [], []
+        for slot in slots:
+            ordinals = np.frombuffer(self._ordinals[slot], dtype=np.uint32)
+            frequencies = np.frombuffer(self._frequencies[slot], dtype=np.uint32).astype(np.float32)
+            df = min(len(ordinals), n)
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[ordinals] / avg_length)
+            matched.append(ordinals)
+            contributions.append(idf * frequencies * (self.k1 + 1) / (frequencies + norm))
+
+        if len(slots) == 1:
+            candidates, scores = matched[0], contributions[0]
+        else:
+            candidates, inverse = np.unique(np.concatenate(matched), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(contributions))
+
+        live = np.frombuffer(self._live, dtype=np.uint8)[candidates].astype(bool)
+        if allowed is not None:
+            live &= allowed[candidates]
+        candidates, scores = candidates[live], scores[live]
+        if len(candidates) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            candidates, scores = candidates[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [(int(candidates[i]), float(scores[i])) for i in order]
+
+    def clear(self):
+        """Remove every indexed chunk."""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM postings")
+            self._conn.commit()
+            self._reset_memory()
+        self._changed()
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def stats(self) -> Dict[str, int]:
+        return {"chunks": self._live_count, "terms": len(self._terms)}
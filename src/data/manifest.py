@@ -0,0 +1,96 @@
+"""Record of ingested files, used to sync a directory incrementally.
+
+Each file is stored with its size, mtime, content hash and the IDs of the
+chunks it produced. A re-run only needs to hash files whose size or mtime
+changed and only re-parses files whose content actually changed.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional
+
+from ..config.config import INGEST_MANIFEST_PATH
+
+
+class ManifestEntry(NamedTuple):
+    path: str
+    size: int
+    mtime: float
+    content_hash: str
+    chunk_ids: List[str]
+
+
+def hash_file(path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """SQLite-backed map of file path to ManifestEntry."""
+
+    def __init__(self, path: Path = INGEST_MANIFEST_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                content_hash TEXT NOT NULL,
+                chunk_ids TEXT NOT NULL,
+                ingested_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _entry(row) -> ManifestEntry:
+        return ManifestEntry(row[0], row[1], row[2], row[3], json.loads(row[4]))
+
+    def get(self, path: str) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT path, size, mtime, content_hash, chunk_ids FROM files WHERE path = ?", (path,)
+            ).fetchone()
+        return self._entry(row) if row else None
+
+    def entries(self, prefix: str = "") -> Dict[str, ManifestEntry]:
+        """Every entry whose path starts with ``prefix``."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, size, mtime, content_hash, chunk_ids FROM files WHERE substr(path, 1, ?) = ?",
+                (len(prefix), prefix)
+            ).fetchall()
+        return {row[0]: self._entry(row) for row in rows}
+
+    def record(self, entry: ManifestEntry):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?)",
+                (entry.path, entry.size, entry.mtime, entry.content_hash,
+                 json.dumps(entry.chunk_ids), time.time())
+            )
+            self._conn.commit()
+
+    def forget(self, path: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE path = ?", (path,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
@@ -0,0 +1,152 @@
+"""Metadata filtering for the local indexes.
+
+``BitmapIndex`` keeps one bitmap of row positions per (field, value) of the
+filterable metadata fields. A filter on those fields is answered with bitwise
+operations on the bitmaps, before any scoring, so a filtered query only scores
+matching rows. Rows are append-only in both the local vector store and the
+lexical index (updates and deletions are tombstones), so bitmaps are only
+ever extended; callers combine the result with their own live-row mask.
+
+Filters that use other fields fall back to ``filter_sql``, which evaluates the
+same Chroma-style filter against metadata stored as JSON in SQLite.
+"""
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config.config import METADATA_FILTER_FIELDS
+
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+
+def filter_sql(where: Dict[str, Any], column: str = "metadata") -> Tuple[str, List[Any]]:
+    """Translate a Chroma-style filter into a SQLite condition over a JSON column.
+
+    Returns:
+        Tuple[str, List[Any]]: The condition and its parameters
+    """
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [filter_sql(part, column) for part in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, part_params in parts for param in part_params)
+            continue
+        field = f"json_extract({column}, '$.{key}')"
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, value in condition.items():
+            if operator in ("$in", "$nin"):
+                placeholders = ",".join("?" * len(value))
+                clauses.append(f"{field} {'IN' if operator == '$in' else 'NOT IN'} ({placeholders})")
+                params.extend(value)
+            elif operator in _COMPARISONS:
+                clauses.append(f"{field} {_COMPARISONS[operator]} ?")
+                params.append(value)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return " AND ".join(clauses) or "1", params
+
+
+class BitmapIndex:
+    """Per-(field, value) bitmaps of row positions, held in memory."""
+
+    def __init__(self, fields: Iterable[str] = METADATA_FILTER_FIELDS):
+        self.fields = tuple(fields)
+        self._lock = threading.Lock()
+        self._bitmaps: Dict[str, Dict[Any, bytearray]] = {field: {} for field in self.fields}
+
+    def add(self, position: int, metadata: Dict[str, Any]):
+        """Record the indexed field values of the row at ``position``."""
+        byte, bit = divmod(position, 8)
+        with self._lock:
+            for field in self.fields:
+                value = metadata.get(field)
+                if value is None:
+                    continue
+                bitmap = self._bitmaps[field].setdefault(value, bytearray())
+                if len(bitmap) <= byte:
+                    bitmap.extend(bytes(byte + 1 - len(bitmap)))
+                bitmap[byte] |= 1 << bit
+
+    def clear(self):
+        with self._lock:
+            self._bitmaps = {field: {} for field in self.fields}
+
+    def values(self, field: str) -> List[Any]:
+        """Distinct values seen for a field."""
+        return list(self._bitmaps.get(field, {}))
+
+    def supports(self, where: Dict[str, Any]) -> bool:
+        """Whether a filter only touches indexed fields and operators."""
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                if not all(self.supports(part) for part in condition):
+                    return False
+            elif key not in self._bitmaps:
+                return False
+            elif isinstance(condition, dict) and not set(condition) <= set(_COMPARISONS) | {"$in", "$nin"}:
+                return False
+        return True
+
+    def mask(self, where: Dict[str, Any], size: int) -> Optional[np.ndarray]:
+        """Boolean mask over ``size`` rows matching a filter, or None if the filter is not supported."""
+        if not self.supports(where):
+            return None
+        with self._lock:
+            return self._mask(where, size)
+
+    def _bits(self, bitmap: bytearray, size: int) -> np.ndarray:
+        bits = np.unpackbits(np.frombuffer(bytes(bitmap), dtype=np.uint8), bitorder="little")
+        mask = np.zeros(size, dtype=bool)
+        count = min(size, len(bits))
+        mask[:count] = bits[:count]
+        return mask
+
+    def _union(self, field: str, accept, size: int) -> np.ndarray:
+        mask = np.zeros(size, dtype=bool)
+        for value, bitmap in self._bitmaps[field].items():
+            try:
+                matches = accept(value)
+            except TypeError:  # e.g. comparing a string value with a number
+                matches = False
+            if matches:
+                mask |= self._bits(bitmap, size)
+        return mask
+
+    def _mask(self, where: Dict[str, Any], size: int) -> np.ndarray:
+        mask = np.ones(size, dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for part in condition:
+                    mask &= self._mask(part, size)
+                continue
+            if key == "$or":
+                union = np.zeros(size, dtype=bool)
+                for part in condition:
+                    union |= self._mask(part, size)
+                mask &= union
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, target in condition.items():
+                if operator == "$eq":
+                    bitmap = self._bitmaps[key].get(target)
+                    mask &= self._bits(bitmap, size) if bitmap is not None else False
+                elif operator == "$in":
+                    mask &= self._union(key, lambda value: value in target, size)
+                elif operator == "$ne":
+                    mask &= self._union(key, lambda value: value != target, size)
+                elif operator == "$nin":
+                    mask &= self._union(key, lambda value: value not in target, size)
+                elif operator == "$gt":
+                    mask &= self._union(key, lambda value: value > target, size)
+                elif operator == "$gte":
+                    mask &= self._union(key, lambda value: value >= target, size)
+                elif operator == "$lt":
+                    mask &= self._union(key, lambda value: value < target, size)
+                elif operator == "$lte":
+                    mask &= self._union(key, lambda value: value <= target, size)
+        return mask
@@ -0,0 +1,466 @@
+"""Document storage and similarity search over chunk embeddings.
+
+``VectorStore`` embeds chunks (through the shared, cached embeddings) and
+delegates storage to a backend:
+
+- ``ChromaBackend``: a persistent Chroma collection (the default).
+- ``LocalBackend``: an in-process index over a memory-mapped float32 matrix,
+  searched by blocked NumPy brute force, or by HNSW when ``hnswlib`` is
+  installed. It needs no external service, which makes it the backend for
+  offline runs and load tests.
+
+Both backends upsert by chunk ID in batches, return cosine distances (lower
+is better) and accept Chroma-style metadata filters such as
+``{"source": "a.pdf"}`` or ``{"$and": [{"jurisdiction": "NY"}, {"year": {"$gte": 2020}}]}``.
+"""
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from .lexical_index import chunk_id
+from ..cache.corpus_version import bump_corpus_version
+from .metadata_index import BitmapIndex, filter_sql
+from ..utils.tracing import span
+from ..config.config import (
+    CHROMA_PERSIST_DIRECTORY,
+    COLLECTION_NAME,
+    VECTOR_STORE_BACKEND,
+    VECTOR_STORE_BATCH_SIZE,
+    LOCAL_VECTOR_STORE_DIR,
+    LOCAL_VECTOR_INDEX,
+)
+
+try:
+    import hnswlib
+except ImportError:  # Optional: the local backend falls back to brute force
+    hnswlib = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_SCALARS = (str, int, float, bool)
+
+
+def _clean_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Vector stores only hold scalar metadata; anything else is stored as JSON."""
+    return {
+        key: value if isinstance(value, _SCALARS) else json.dumps(value, default=str)
+        for key, value in metadata.items() if value is not None
+    }
+
+
+def normalize_filter(where: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Rewrite a filter into the form Chroma requires: one key, and one operator per condition.
+
+    ``{"a": 1, "b": {"$gte": 2, "$lt": 5}}`` becomes
+    ``{"$and": [{"a": 1}, {"b": {"$gte": 2}}, {"b": {"$lt": 5}}]}``.
+    """
+    if not where:
+        return None
+    parts = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts.append({key: [normalize_filter(part) for part in condition]})
+        elif isinstance(condition, dict) and len(condition) > 1:
+            parts.extend({key: {operator: value}} for operator, value in condition.items())
+        else:
+            parts.append({key: condition})
+    return parts[0] if len(parts) == 1 else {"$and": parts}
+
+
+class ChromaBackend:
+    """Persistent Chroma collection using cosine distance."""
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, persist_directory: str = CHROMA_PERSIST_DIRECTORY):
+        import chromadb
+        from chromadb.config import Settings
+
+        self.name = collection_name
+        self._client = chromadb.PersistentClient(
+            path=str(persist_directory), settings=Settings(anonymized_telemetry=False)
+        )
+        self._collection = self._open()
+
+    def _open(self):
+        return self._client.get_or_create_collection(
+            self.name, metadata={"hnsw:space": "cosine"}, embedding_function=None
+        )
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]):
+        self._collection.upsert(
+            ids=ids,
+            embeddings=vectors.tolist(),
+            documents=texts,
+            metadatas=[metadata or None for metadata in metadatas]
+        )
+
+    def search(self, vector: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        result = self._collection.query(
+            query_embeddings=[vector.tolist()],
+            n_results=k,
+            where=normalize_filter(where),
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            (Document(page_content=text, metadata=metadata or {}), float(distance))
+            for text, metadata, distance in zip(result["documents"][0], result["metadatas"][0], result["distances"][0])
+        ]
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        # Chroma's update merges metadata keys; upserting the stored vector replaces them
+        stored = self._collection.get(ids=ids, include=["embeddings", "documents"])
+        if not stored["ids"]:
+            return
+        new = dict(zip(ids, metadatas))
+        self.upsert(stored["ids"], np.asarray(stored["embeddings"], dtype=np.float32), stored["documents"],
+                    [new[cid] for cid in stored["ids"]])
+
+    def delete(self, ids: List[str]):
+        self._collection.delete(ids=ids)
+
+    def count(self) -> int:
+        return self._collection.count()
+
+    def clear(self):
+        self._client.delete_collection(self.name)
+        self._collection = self._open()
+
+
+class LocalBackend:
+    """In-process vector index: float32 rows in a memory-mapped file, documents in SQLite.
+
+    Vectors are stored unit-normalized so cosine similarity is a dot product.
+    Upserting an existing ID appends a new row and tombstones the old one.
+    """
+
+    def __init__(self, collection_name: str = COLLECTION_NAME, directory: Path = LOCAL_VECTOR_STORE_DIR,
+                 index: str = LOCAL_VECTOR_INDEX, block_rows: int = 1 << 16):
+        self.name = collection_name
+        self.directory = Path(directory) / collection_name
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.block_rows = block_rows
+        self.use_hnsw = index == "hnsw" and hnswlib is not None
+        if index == "hnsw" and hnswlib is None:
+            logger.warning("hnswlib is not installed; the local vector store will use brute-force search")
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.directory / "store.sqlite"), check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS chunks (
+                id TEXT PRIMARY KEY,
+                row INTEGER UNIQUE NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )"""
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+        self._load()
+
+    def _load(self):
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'dimensions'").fetchone()
+        self.dimensions: Optional[int] = row[0] if row else None
+        self._rows = 0
+        if self.dimensions and self.vectors_path.exists():
+            self._rows = self.vectors_path.stat().st_size // (4 * self.dimensions)
+        self._live = np.zeros(self._rows, dtype=bool)
+        self._bitmaps = BitmapIndex()
+        fields = ", ".join(f"json_extract(metadata, '$.{field}')" for field in self._bitmaps.fields)
+        for row, *values in self._conn.execute(f"SELECT row, {fields} FROM chunks"):
+            if row < self._rows:
+                self._live[row] = True
+                self._bitmaps.add(row, dict(zip(self._bitmaps.fields, values)))
+        self._mapped: Optional[np.memmap] = None
+        self._hnsw = None
+        if self.use_hnsw and self.dimensions:
+            self._load_hnsw()
+
+    def _load_hnsw(self):
+        path = self.directory / "hnsw.bin"
+        self._hnsw = hnswlib.Index(space="ip", dim=self.dimensions)
+        if path.exists():
+            self._hnsw.load_index(str(path), max_elements=max(self._rows, 1))
+        else:
+            self._hnsw.init_index(max_elements=max(self._rows, 1024), ef_construction=200, M=16)
+            live_rows = np.flatnonzero(self._live)
+            if len(live_rows):
+                self._hnsw.add_items(self._matrix()[live_rows], live_rows)
+        self._hnsw.set_ef(64)
+
+    def _matrix(self) -> np.memmap:
+        if self._mapped is None or len(self._mapped) < self._rows:
+            self._mapped = np.memmap(self.vectors_path, dtype=np.float32, mode="r",
+                                     shape=(self._rows, self.dimensions))
+        return self._mapped
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, texts: List[str], metadatas: List[Dict[str, Any]]):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = vectors.shape[1]
+                self._conn.execute("INSERT INTO meta VALUES ('dimensions', ?)", (self.dimensions,))
+                if self.use_hnsw:
+                    self._load_hnsw()
+            if vectors.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional vectors, got {vectors.shape[1]}")
+
+            replaced = self._rows_for(ids)
+            with open(self.vectors_path, "ab") as f:
+                first_row = f.seek(0, 2) // (4 * self.dimensions)
+                vectors.tofile(f)
+            rows = np.arange(first_row, first_row + len(ids))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)",
+                [(cid, int(row), text, json.dumps(metadata))
+                 for cid, row, text, metadata in zip(ids, rows, texts, metadatas)]
+            )
+            self._conn.commit()
+            for row, metadata in zip(rows, metadatas):
+                self._bitmaps.add(int(row), metadata)
+
+            self._rows = first_row + len(ids)
+            live = np.zeros(self._rows, dtype=bool)
+            live[:len(self._live)] = self._live
+            live[list(replaced.values())] = False
+            live[rows] = True
+            self._live = live
+
+            if self._hnsw is not None:
+                for row in replaced.values():
+                    self._hnsw.mark_deleted(row)
+                if self._hnsw.get_max_elements() < self._rows:
+                    self._hnsw.resize_index(max(self._rows, 2 * self._hnsw.get_max_elements()))
+                self._hnsw.add_items(vectors, rows)
+                self._hnsw.save_index(str(self.directory / "hnsw.bin"))
+
+    def _rows_for(self, ids: Sequence[str]) -> Dict[str, int]:
+        rows = {}
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows.update(self._conn.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchall())
+        return rows
+
+    def filter_rows(self, where: Dict[str, Any]) -> np.ndarray:
+        """Rows whose metadata matches a filter, from the value bitmaps when possible."""
+        with self._lock:
+            mask = self._bitmaps.mask(where, self._rows)
+            if mask is not None:
+                return np.flatnonzero(mask & self._live)
+            sql, params = filter_sql(where)
+            rows = self._conn.execute(f"SELECT row FROM chunks WHERE {sql}", params).fetchall()
+        return np.fromiter((row for (row,) in rows), dtype=np.int64, count=len(rows))
+
+    def search(self, vector: np.ndarray, k: int, where: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        if not self._rows or k <= 0:
+            return []
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        candidates = self.filter_rows(where) if where else None
+
+        with self._lock:
+            if self._hnsw is not None and (candidates is None or len(candidates) > 4 * k):
+                allowed = set(candidates.tolist()) if candidates is not None else None
+                limit = min(k, int(self._live.sum()) if allowed is None else len(allowed))
+                if not limit:
+                    return []
+                labels, distances = self._hnsw.knn_query(
+                    query, k=limit, filter=(allowed.__contains__ if allowed is not None else None)
+                )
+                ranked = [(int(row), float(distance)) for row, distance in zip(labels[0], distances[0])]
+            else:
+                ranked = self._brute_force(query, k, candidates)
+            if not ranked:
+                return []
+
+            placeholders = ",".join("?" * len(ranked))
+            documents = {
+                row: Document(page_content=content, metadata=json.loads(metadata))
+                for row, content, metadata in self._conn.execute(
+                    f"SELECT row, content, metadata FROM chunks WHERE row IN ({placeholders})",
+                    [row for row, _ in ranked]
+                )
+            }
+        return [(documents[row], distance) for row, distance in ranked if row in documents]
+
+    def _brute_force(self, query: np.ndarray, k: int, candidates: Optional[np.ndarray]) -> List[Tuple[int, float]]:
+        matrix = self._matrix()
+        best_rows, best_scores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if candidates is not None:
+            blocks = [candidates[candidates < self._rows]]
+        else:
+            blocks = [np.arange(start, min(start + self.block_rows, self._rows))
+                      for start in range(0, self._rows, self.block_rows)]
+        for rows in blocks:
+            rows = rows[self._live[rows]]
+            if not len(rows):
+                continue
+            if candidates is None:
+                scores = matrix[rows[0]:rows[-1] + 1] @ query
+                scores = scores[rows - rows[0]]
+            else:
+                scores = matrix[np.sort(rows)] @ query
+                rows = np.sort(rows)
+            rows = np.concatenate([best_rows, rows])
+            scores = np.concatenate([best_scores, scores])
+            if len(rows) > k:
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows, scores = rows[top], scores[top]
+            best_rows, best_scores = rows, scores
+        order = np.argsort(-best_scores, kind="stable")
+        # Cosine distance, as Chroma reports it
+        return [(int(best_rows[i]), float(1.0 - best_scores[i])) for i in order]
+
+    def update_metadata(self, ids: List[str], metadatas: List[Dict[str, Any]]):
+        # Bitmaps only grow, so the chunk is re-appended with its vector and the old row tombstoned
+        with self._lock:
+            rows = self._rows_for(ids)
+            placeholders = ",".join("?" * len(rows)) or "NULL"
+            texts = dict(self._conn.execute(
+                f"SELECT id, content FROM chunks WHERE id IN ({placeholders})", list(rows)
+            ).fetchall())
+            found = [(cid, metadata) for cid, metadata in zip(ids, metadatas) if cid in rows]
+            vectors = np.array(self._matrix()[[rows[cid] for cid, _ in found]]) if found else None
+        if found:
+            self.upsert([cid for cid, _ in found], vectors, [texts[cid] for cid, _ in found],
+                        [metadata for _, metadata in found])
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            rows = self._rows_for(ids)
+            for row in rows.values():
+                self._live[row] = False
+                if self._hnsw is not None:
+                    self._hnsw.mark_deleted(row)
+            self._conn.executemany("DELETE FROM chunks WHERE id = ?", [(cid,) for cid in rows])
+            self._conn.commit()
+            if self._hnsw is not None and rows:
+                self._hnsw.save_index(str(self.directory / "hnsw.bin"))
+
+    def count(self) -> int:
+        return int(self._live.sum())
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.commit()
+            self._mapped = None
+            for path in (self.vectors_path, self.directory / "hnsw.bin"):
+                if path.exists():
+                    path.unlink()
+            self._load()
+
+
+BACKENDS = {
+    "chroma": ChromaBackend,
+    "local": LocalBackend,
+}
+
+
+class VectorStore:
+    def __init__(self, backend: str = VECTOR_STORE_BACKEND, collection_name: str = COLLECTION_NAME,
+                 embeddings=None, batch_size: int = VECTOR_STORE_BATCH_SIZE,
+                 on_change: Optional[Callable[[], Any]] = bump_corpus_version, **backend_options):
+        """Initialize the vector store.
+
+        Args:
+            backend (str): "chroma" or "local"
+            collection_name (str): Collection to read and write
+            embeddings: LangChain embeddings (defaults to the shared cached embeddings)
+            batch_size (int): Chunks per upsert
+            on_change (Callable, optional): Called after every write, by default
+                to bump the corpus version so cached answers built on the old
+                corpus are dropped
+            **backend_options: Passed to the backend, e.g. ``directory`` or ``index``
+        """
+        if embeddings is None:
+            from ..utils.registry import get_registry
+            embeddings = get_registry().get_embeddings()
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.on_change = on_change
+        self.backend_name = backend
+        self.backend = BACKENDS[backend](collection_name, **backend_options)
+
+    def add_documents(self, documents: Iterable[Document]) -> List[str]:
+        """Embed and upsert documents, keyed by their chunk IDs.
+
+        Returns:
+            List[str]: IDs of the stored chunks
+        """
+        unique = {chunk_id(document): document for document in documents}
+        ids = list(unique)
+        for start in range(0, len(ids), self.batch_size):
+            batch_ids = ids[start:start + self.batch_size]
+            batch = [unique[cid] for cid in batch_ids]
+            vectors = np.asarray(
+                self.embeddings.embed_documents([document.page_content for document in batch]), dtype=np.float32
+            )
+            self.backend.upsert(
+                batch_ids, vectors,
+                [document.page_content for document in batch],
+                [_clean_metadata(document.metadata) for document in batch]
+            )
+        logger.info(f"Stored {len(ids)} chunks in {self.backend_name} collection {self.backend.name}")
+        if ids:
+            self._changed()
+        return ids
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def similarity_search_with_score(self, query: str, k: int = 4,
+                                     filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Return up to k (document, cosine distance) pairs, closest first."""
+        with span("vector_search", "vector", backend=self.backend_name, k=k, filtered=bool(filter)) as call:
+            with span("embed_query", "embedding"):
+                vector = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            results = self.backend.search(vector, k, filter)
+            call.set(results=len(results))
+            return results
+
+    async def asimilarity_search_with_score(self, query: str, k: int = 4,
+                                            filter: Optional[Dict[str, Any]] = None) -> List[Tuple[Document, float]]:
+        """Async version of similarity_search_with_score."""
+        with span("vector_search", "vector", backend=self.backend_name, k=k, filtered=bool(filter)) as call:
+            with span("embed_query", "embedding"):
+                vector = np.asarray(await self.embeddings.aembed_query(query), dtype=np.float32)
+            results = await asyncio.to_thread(self.backend.search, vector, k, filter)
+            call.set(results=len(results))
+            return results
+
+    def update_metadata(self, metadatas: Dict[str, Dict[str, Any]]):
+        """Replace the metadata of stored chunks, keyed by chunk ID, without re-embedding them."""
+        if metadatas:
+            ids = list(metadatas)
+            self.backend.update_metadata(ids, [_clean_metadata(metadatas[cid]) for cid in ids])
+            self._changed()
+
+    def delete(self, ids: List[str]):
+        """Delete chunks by ID."""
+        if ids:
+            self.backend.delete(list(ids))
+            self._changed()
+
+    def get_collection_stats(self) -> Dict[str, Any]:
+        return {"name": self.backend.name, "count": self.backend.count(), "backend": self.backend_name}
+
+    def delete_collection(self):
+        """Remove every chunk; the collection stays usable."""
+        self.backend.clear()
+        self._changed()
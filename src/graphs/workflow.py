@@ -1,172 +1,662 @@
-from typing import Dict, List, Any, Optional, TypedDict, Sequence, Literal
+from typing import Dict, List, Any, Iterator, Optional, TypedDict, Sequence, Literal
 from enum import Enum
 from langgraph.graph import StateGraph, END
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage, HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
-import google.generativeai as genai
+from langchain_core.runnables import RunnableLambda
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+import asyncio
 import logging
-from ..agents.legal_researcher import LegalResearcher
-from ..chains.retrieval_chain import RetrievalChain
-from ..config.config import GOOGLE_API_KEY
+import time
+from ..agents.legal_researcher import LegalResearcher, SearchDecision
+from ..cache.response_cache import ResponseCache
+from ..chains.query_refinement import QueryRefiner
+from ..chains.retrieval_chain import RetrievalChain, RetrievedDocuments
+from ..config.config import (
+    MODEL_NAME,
+    MERGE_ANALYSIS_AND_FINAL,
+    SEARCH_TIMEOUT,
+    RETRIEVAL_TIMEOUT,
+    RESPONSE_CACHE_ENABLED,
+    QUERY_REFINEMENT_MODE,
+    QUERY_REFINEMENT_TIMEOUT,
+    SEARCH_CONTEXT_TOKEN_BUDGET,
+    STAGE_CONTEXT_TOKEN_BUDGET,
+)
+from ..utils.context_packer import fit_text
+from ..utils.registry import get_registry
+from ..utils.tracing import Trace, span, submit_in_context, trace, traced
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class Action(str, Enum):
+    CLASSIFY = "classify"
     SEARCH = "search"
+    GATHER = "gather"
     RETRIEVE = "retrieve"
     ANALYZE = "analyze"
     FINALIZE = "finalize"
+    SYNTHESIZE = "synthesize"
 
 class WorkflowState(TypedDict):
     """State maintained between nodes."""
     messages: Sequence[BaseMessage]
+    chat_history: List[BaseMessage]
     context: Dict[str, Any]
     current_step: str
+    needs_search: bool
+    search_performed: bool
     search_results: str
+    document_context: str
+    documents_retrieved: int
+    timed_out: List[str]
     research_output: str
     analysis_results: str
     final_answer: str
     references: List[str]
     confidence: float
     error_context: str
+    llm_calls: int
+    search_calls: int
 
 class LegalWorkflow:
-    def __init__(self):
-        """Initialize the workflow components."""
-        self.legal_researcher = LegalResearcher()
+    def __init__(self, merge_final: bool = MERGE_ANALYSIS_AND_FINAL,
+                 search_timeout: float = SEARCH_TIMEOUT,
+                 retrieval_timeout: float = RETRIEVAL_TIMEOUT,
+                 use_cache: bool = RESPONSE_CACHE_ENABLED,
+                 response_cache: Optional[ResponseCache] = None,
+                 refinement_mode: str = QUERY_REFINEMENT_MODE):
+        """Initialize the workflow components.
+
+        Args:
+            merge_final (bool): Produce the final answer with one synthesis call
+                instead of separate analysis and finalization calls
+            search_timeout (float): Seconds to wait for the web search branch
+            retrieval_timeout (float): Seconds to wait for the vector retrieval branch
+            use_cache (bool): Serve repeated queries from the response cache
+            response_cache (ResponseCache, optional): Cache to use instead of
+                the shared one
+            refinement_mode (str): "off", "search" or "always"; when to expand
+                the query into refined queries searched alongside it
+        """
         self.retrieval_chain = RetrievalChain()
-        
-        # Initialize Gemini
-        genai.configure(api_key=GOOGLE_API_KEY)
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-1.5-flash-latest",
-            temperature=0.7
-        )
-        
-        # Create and compile workflow
+        self.legal_researcher = LegalResearcher(retrieval_chain=self.retrieval_chain)
+        self.merge_final = merge_final
+        self.branch_timeouts = {"search": search_timeout, "retrieve": retrieval_timeout}
+
+        # Shared Gemini client and thread pool for the parallel stage
+        registry = get_registry()
+        self.llm = registry.get_llm(model=MODEL_NAME, temperature=0.7)
+        self.executor = registry.get_executor()
+        self.trace_exporters = registry.get_trace_exporters()
+        self.refinement_mode = refinement_mode
+        self.query_refiner = QueryRefiner(registry.get_llm(temperature=0)) if refinement_mode != "off" else None
+        self.response_cache = None
+        if use_cache:
+            self.response_cache = response_cache if response_cache is not None else registry.get_response_cache()
+
+        # Create and compile workflow, plus a copy that stops before the final
+        # LLM call so stream_query can stream that call's tokens itself
         self.workflow = self._create_workflow()
-    
-    def _create_workflow(self) -> StateGraph:
-        """Create the workflow graph."""
-        workflow = StateGraph(WorkflowState)
-        
-        # Define workflow nodes
-        def search_node(state: WorkflowState) -> WorkflowState:
-            try:
-                query = state["messages"][-1].content if state["messages"] else ""
-                search_results = self.legal_researcher.search_chain.search(query, use_refinement=True)
-                state["search_results"] = str(search_results.get("search_results", []))
-                state["current_step"] = Action.RETRIEVE
-            except Exception as e:
-                state["error_context"] = f"Error in search: {str(e)}"
-            return state
-        
-        def research_node(state: WorkflowState) -> WorkflowState:
-            try:
-                query = state["messages"][-1].content if state["messages"] else ""
-                research_output = self.legal_researcher.research(query)
-                state["research_output"] = research_output["answer"]
-                state["references"] = research_output["references"]
-                state["current_step"] = Action.ANALYZE
-            except Exception as e:
-                state["error_context"] = f"Error in research: {str(e)}"
-            return state
-        
-        def analysis_node(state: WorkflowState) -> WorkflowState:
+        self.prepare_workflow = self._create_workflow(include_final=False)
+
+    @staticmethod
+    def _get_query(state: WorkflowState) -> str:
+        return state["messages"][-1].content if state["messages"] else ""
+
+    def _classify_node(self, state: WorkflowState) -> WorkflowState:
+        """Decide once, up front, whether the query needs web search.
+
+        Only counts as an LLM call when the local router defers to Gemini.
+        """
+        try:
+            routing = self.legal_researcher.classify_query(self._get_query(state))
+            state["needs_search"] = routing.decision == SearchDecision.NEEDS_SEARCH
+            state["current_step"] = Action.GATHER
+            if routing.source == "llm":
+                state["llm_calls"] += 1
+        except Exception as e:
+            state["error_context"] = f"Error in classification: {str(e)}"
+        return state
+
+    async def _aclassify_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            routing = await self.legal_researcher.aclassify_query(self._get_query(state))
+            state["needs_search"] = routing.decision == SearchDecision.NEEDS_SEARCH
+            state["current_step"] = Action.GATHER
+            if routing.source == "llm":
+                state["llm_calls"] += 1
+        except Exception as e:
+            state["error_context"] = f"Error in classification: {str(e)}"
+        return state
+
+    def _apply_branch_result(self, state: WorkflowState, branch: str, result: Any):
+        """Fold one branch's outcome (result, timeout or error) into the state."""
+        if isinstance(result, (FuturesTimeoutError, asyncio.TimeoutError)):
+            state["timed_out"].append(branch)
+            logger.warning(f"{branch} branch timed out after {self.branch_timeouts[branch]}s")
+        elif isinstance(result, Exception):
+            state["error_context"] = f"Error in {branch}: {str(result)}"
+        elif branch == "retrieve":
+            state["document_context"] = self.retrieval_chain.format_documents(result)
+            state["documents_retrieved"] = len(result)
+            if isinstance(result, RetrievedDocuments):
+                # Only reranks that reached the model; cache hits and lexical fallbacks cost none
+                state["llm_calls"] += result.llm_calls
+        elif result.get("search_performed", False):
+            state["search_results"] = "\n\n".join(result.get("search_results", []))
+            state["search_performed"] = True
+
+    def _should_refine(self, state: WorkflowState) -> bool:
+        if self.query_refiner is None:
+            return False
+        return self.refinement_mode == "always" or state["needs_search"]
+
+    def _refine_query(self, state: WorkflowState, query: str) -> List[str]:
+        """Expand the query with one (time-boxed) refinement call; [query] if skipped or too slow.
+
+        A refinement that times out is abandoned, not stopped: it keeps running
+        on the shared executor until the LLM call returns.
+        """
+        if not self._should_refine(state):
+            return [query]
+        state["llm_calls"] += 1
+        future = submit_in_context(self.executor, traced(self.query_refiner.refine, "refine", "step"), query)
+        try:
+            return future.result(timeout=QUERY_REFINEMENT_TIMEOUT)
+        except FuturesTimeoutError:
+            logger.warning(f"Query refinement timed out after {QUERY_REFINEMENT_TIMEOUT}s")
+            return [query]
+
+    async def _arefine_query(self, state: WorkflowState, query: str) -> List[str]:
+        if not self._should_refine(state):
+            return [query]
+        state["llm_calls"] += 1
+        try:
+            return await asyncio.wait_for(
+                traced(self.query_refiner.arefine, "refine", "step")(query), QUERY_REFINEMENT_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Query refinement timed out after {QUERY_REFINEMENT_TIMEOUT}s")
+            return [query]
+
+    def _gather_node(self, state: WorkflowState) -> WorkflowState:
+        """Fan out web search and vector retrieval in parallel, then fan back in.
+
+        The query is refined once up front; both branches then search every
+        refined query concurrently, so refinement adds one LLM call plus the
+        slowest sub-query rather than one search per refinement. Each branch
+        gets its own timeout measured from the fan-out, so the stage takes
+        about as long as the slowest branch. A branch that times out is
+        dropped and the answer is built from whatever the other branch returned;
+        its thread cannot be interrupted, so it keeps running and holds a slot of
+        the shared executor until its calls return.
+        """
+        query = self._get_query(state)
+        queries = self._refine_query(state, query)
+        started = time.monotonic()
+        futures = {"retrieve": submit_in_context(
+            self.executor, traced(self.retrieval_chain.retrieve_documents, "retrieve", "branch"), query, queries=queries
+        )}
+        if state["needs_search"]:
+            futures["search"] = submit_in_context(
+                self.executor, traced(self.legal_researcher.search_chain.search, "search", "branch"), query,
+                queries=queries
+            )
+            state["search_calls"] += len(queries)  # One Tavily request per refined query
+
+        for branch, future in futures.items():
+            remaining = max(0.0, started + self.branch_timeouts[branch] - time.monotonic())
             try:
-                prompt = f"""Analyze the following legal information:
-                Search Results: {state['search_results']}
-                Research: {state['research_output']}
-                
+                result = future.result(timeout=remaining)
+            except Exception as e:  # Including the timeout
+                result = e
+            self._apply_branch_result(state, branch, result)
+
+        state["current_step"] = Action.RETRIEVE
+        return state
+
+    async def _agather_node(self, state: WorkflowState) -> WorkflowState:
+        """Async fan-out/fan-in; a timed-out branch is cancelled rather than left running."""
+        query = self._get_query(state)
+        queries = await self._arefine_query(state, query)
+        branches = {"retrieve": traced(self.retrieval_chain.aretrieve_documents, "retrieve", "branch")(
+            query, queries=queries
+        )}
+        if state["needs_search"]:
+            branches["search"] = traced(self.legal_researcher.search_chain.asearch, "search", "branch")(
+                query, queries=queries
+            )
+            state["search_calls"] += len(queries)  # One Tavily request per refined query
+
+        results = await asyncio.gather(
+            *(asyncio.wait_for(coro, self.branch_timeouts[branch]) for branch, coro in branches.items()),
+            return_exceptions=True
+        )
+        for branch, result in zip(branches, results):
+            self._apply_branch_result(state, branch, result)
+
+        state["current_step"] = Action.RETRIEVE
+        return state
+
+    def _research_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            # Gathered context is passed in so the researcher neither re-searches nor re-retrieves
+            search_results = [state["search_results"]] if state["search_results"] else []
+            research_output = self.legal_researcher.research(
+                self._get_query(state),
+                chat_history=state["chat_history"],
+                search_results=search_results,
+                document_context=state["document_context"]
+            )
+            state["research_output"] = research_output["answer"]
+            state["references"] = research_output["references"]
+            state["current_step"] = Action.SYNTHESIZE if self.merge_final else Action.ANALYZE
+        except Exception as e:
+            state["error_context"] = f"Error in research: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    async def _aresearch_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            search_results = [state["search_results"]] if state["search_results"] else []
+            research_output = await self.legal_researcher.aresearch(
+                self._get_query(state),
+                chat_history=state["chat_history"],
+                search_results=search_results,
+                document_context=state["document_context"]
+            )
+            state["research_output"] = research_output["answer"]
+            state["references"] = research_output["references"]
+            state["current_step"] = Action.SYNTHESIZE if self.merge_final else Action.ANALYZE
+        except Exception as e:
+            state["error_context"] = f"Error in research: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    @staticmethod
+    def _bounded(state: WorkflowState, key: str) -> str:
+        """A state field cut to its token budget before it is placed in a prompt."""
+        budget = SEARCH_CONTEXT_TOKEN_BUDGET if key == "search_results" else STAGE_CONTEXT_TOKEN_BUDGET
+        return fit_text(state[key], budget)
+
+    def _analysis_prompt(self, state: WorkflowState) -> str:
+        return f"""Analyze the following legal information:
+                Search Results: {self._bounded(state, 'search_results')}
+                Research: {self._bounded(state, 'research_output')}
+
                 Provide a clear analysis focusing on:
                 1. Key legal principles
                 2. Relevant precedents
                 3. Practical implications
                 """
-                analysis = self.llm.invoke(prompt).content
-                state["analysis_results"] = analysis
-                state["current_step"] = Action.FINALIZE
-            except Exception as e:
-                state["error_context"] = f"Error in analysis: {str(e)}"
-            return state
-        
-        def final_node(state: WorkflowState) -> WorkflowState:
-            try:
-                prompt = f"""Based on the research and analysis, provide a comprehensive answer:
-                Research: {state['research_output']}
-                Analysis: {state['analysis_results']}
-                
+
+    def _final_prompt(self, state: WorkflowState) -> str:
+        return f"""Based on the research and analysis, provide a comprehensive answer:
+                Research: {self._bounded(state, 'research_output')}
+                Analysis: {self._bounded(state, 'analysis_results')}
+
                 Format the response with:
                 1. Clear explanation
                 2. Legal basis
                 3. Practical recommendations
                 """
-                final_answer = self.llm.invoke(prompt).content
-                state["final_answer"] = final_answer
-                state["confidence"] = 0.8 if not state["error_context"] else 0.4
-                state["current_step"] = "complete"
-            except Exception as e:
-                state["error_context"] = f"Error in final answer: {str(e)}"
-            return state
-        
-        # Add nodes
-        workflow.add_node("search", search_node)
-        workflow.add_node("research", research_node)
-        workflow.add_node("analyze", analysis_node)
-        workflow.add_node("finalize", final_node)
-        
+
+    def _synthesis_prompt(self, state: WorkflowState) -> str:
+        return f"""Analyze the following legal research and provide a comprehensive answer:
+                Research: {self._bounded(state, 'research_output')}
+
+                In your analysis, consider key legal principles, relevant precedents
+                and practical implications.
+
+                Format the response with:
+                1. Clear explanation
+                2. Legal basis
+                3. Practical recommendations
+                """
+
+    def _analysis_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            state["analysis_results"] = self.llm.invoke(self._analysis_prompt(state)).content
+            state["current_step"] = Action.FINALIZE
+        except Exception as e:
+            state["error_context"] = f"Error in analysis: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    async def _aanalysis_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            state["analysis_results"] = (await self.llm.ainvoke(self._analysis_prompt(state))).content
+            state["current_step"] = Action.FINALIZE
+        except Exception as e:
+            state["error_context"] = f"Error in analysis: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    def _complete(self, state: WorkflowState, final_answer: str) -> WorkflowState:
+        state["final_answer"] = final_answer
+        state["confidence"] = 0.8 if not state["error_context"] else 0.4
+        state["current_step"] = "complete"
+        return state
+
+    def _final_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            self._complete(state, self.llm.invoke(self._final_prompt(state)).content)
+        except Exception as e:
+            state["error_context"] = f"Error in final answer: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    def _synthesis_node(self, state: WorkflowState) -> WorkflowState:
+        """Analysis and finalization folded into a single LLM call."""
+        try:
+            self._complete(state, self.llm.invoke(self._synthesis_prompt(state)).content)
+        except Exception as e:
+            state["error_context"] = f"Error in final answer: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    async def _afinal_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            self._complete(state, (await self.llm.ainvoke(self._final_prompt(state))).content)
+        except Exception as e:
+            state["error_context"] = f"Error in final answer: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    async def _asynthesis_node(self, state: WorkflowState) -> WorkflowState:
+        try:
+            self._complete(state, (await self.llm.ainvoke(self._synthesis_prompt(state))).content)
+        except Exception as e:
+            state["error_context"] = f"Error in final answer: {str(e)}"
+        state["llm_calls"] += 1
+        return state
+
+    def _route_after_research(self, state: WorkflowState) -> str:
+        return "synthesize" if self.merge_final else "analyze"
+
+    @staticmethod
+    def _node(name: str, func, afunc) -> RunnableLambda:
+        """A graph node whose sync and async bodies are each recorded as a span."""
+        return RunnableLambda(traced(func, name), afunc=traced(afunc, name), name=name)
+
+    def _create_workflow(self, include_final: bool = True) -> StateGraph:
+        """Create the routed workflow graph.
+
+        classify -> gather (search || retrieve) -> research -> (synthesize | analyze -> finalize)
+
+        Args:
+            include_final (bool): Whether to include the node making the final
+                LLM call (synthesize or finalize)
+        """
+        workflow = StateGraph(WorkflowState)
+
+        # Add nodes; each has a sync body for invoke/stream and an async one for ainvoke
+        workflow.add_node("classify", self._node("classify", self._classify_node, self._aclassify_node))
+        workflow.add_node("gather", self._node("gather", self._gather_node, self._agather_node))
+        workflow.add_node("research", self._node("research", self._research_node, self._aresearch_node))
+        workflow.add_node("analyze", self._node("analyze", self._analysis_node, self._aanalysis_node))
+
         # Add edges
-        workflow.add_edge("search", "research")
-        workflow.add_edge("research", "analyze")
-        workflow.add_edge("analyze", "finalize")
-        
-        # Set entry and end points
-        workflow.set_entry_point("search")
-        workflow.set_finish_point("finalize")
-        
+        workflow.add_edge("classify", "gather")
+        workflow.add_edge("gather", "research")
+        if include_final:
+            workflow.add_node("finalize", self._node("finalize", self._final_node, self._afinal_node))
+            workflow.add_node("synthesize", self._node("synthesize", self._synthesis_node, self._asynthesis_node))
+            workflow.add_conditional_edges(
+                "research",
+                self._route_after_research,
+                {"synthesize": "synthesize", "analyze": "analyze"}
+            )
+            workflow.add_edge("analyze", "finalize")
+            workflow.add_edge("finalize", END)
+            workflow.add_edge("synthesize", END)
+        elif self.merge_final:
+            workflow.add_edge("research", END)
+        else:
+            workflow.add_edge("research", "analyze")
+            workflow.add_edge("analyze", END)
+
+        # Set entry point
+        workflow.set_entry_point("classify")
+
         return workflow.compile()
-    
-    def process_query(self, query: str) -> Dict[str, Any]:
+
+    def _initial_state(self, query: str, chat_history: Optional[List[BaseMessage]] = None) -> WorkflowState:
+        return {
+            "messages": [HumanMessage(content=query)],
+            "chat_history": list(chat_history or []),
+            "context": {},
+            "current_step": Action.CLASSIFY,
+            "needs_search": False,
+            "search_performed": False,
+            "search_results": "",
+            "document_context": "",
+            "documents_retrieved": 0,
+            "timed_out": [],
+            "research_output": "",
+            "analysis_results": "",
+            "final_answer": "",
+            "references": [],
+            "confidence": 0.0,
+            "error_context": "",
+            "llm_calls": 0,
+            "search_calls": 0
+        }
+
+    @staticmethod
+    def _format_result(state: WorkflowState) -> Dict[str, Any]:
+        return {
+            "answer": state["final_answer"],
+            "references": state["references"],
+            "confidence": state["confidence"],
+            "search_performed": state["search_performed"],
+            "llm_calls": state["llm_calls"],
+            "search_calls": state["search_calls"],
+            "timed_out": state["timed_out"],
+            "error": state["error_context"] or None,
+            "cache_hit": False
+        }
+
+    @staticmethod
+    def _error_result(error: Exception) -> Dict[str, Any]:
+        return {
+            "answer": f"An error occurred: {str(error)}",
+            "references": [],
+            "confidence": 0.0,
+            "search_performed": False,
+            "llm_calls": 0,
+            "search_calls": 0,
+            "timed_out": [],
+            "error": str(error),
+            "cache_hit": False
+        }
+
+    @staticmethod
+    def _traced_result(result: Dict[str, Any], query_trace: Trace) -> Dict[str, Any]:
+        """Add the query's wall time, token usage and span waterfall to a result."""
+        return {
+            **result,
+            "processing_time": round(query_trace.duration, 3),
+            "tokens": query_trace.token_usage(),
+            "trace": query_trace.waterfall(),
+        }
+
+    def _corpus_version(self) -> Optional[str]:
+        """The corpus version a query starts from; its answer is cached under it.
+
+        Read before the cache lookup, so an ingest that lands while the query
+        runs leaves the answer tagged with the older version, and it is dropped.
+        """
+        if self.response_cache is None:
+            return None
+        try:
+            return self.response_cache.corpus_version_fn()
+        except Exception as e:
+            logger.warning(f"Reading the corpus version failed: {str(e)}")
+            return None
+
+    def _cached_result(self, query: str, chat_history: Optional[List[BaseMessage]] = None) -> Optional[Dict[str, Any]]:
+        """Look the query up in the response cache; a hit costs no LLM or search calls.
+
+        Follow-up questions (any chat history) depend on the conversation, so
+        they are never served from or stored in the cache.
+        """
+        if self.response_cache is None or chat_history:
+            return None
+        with span("response_cache", "cache") as lookup:
+            try:
+                cached = self.response_cache.get(query)
+            except Exception as e:
+                logger.warning(f"Response cache lookup failed: {str(e)}")
+                return None
+            lookup.set(cache_hit=cached is not None)
+        if cached is None:
+            return None
+        return {**cached, "llm_calls": 0, "search_calls": 0, "timed_out": [], "error": None, "cache_hit": True}
+
+    def _store_result(self, query: str, state: WorkflowState, corpus_version: Optional[str]):
+        """Cache a complete answer under the corpus version it was built from.
+
+        Degraded answers (errors, timeouts) are not cached.
+        """
+        if self.response_cache is None or state["error_context"] or state["timed_out"] or state["chat_history"]:
+            return
+        if corpus_version is None:
+            return
+        if not state["final_answer"]:
+            return
+        try:
+            self.response_cache.put(query, {
+                "answer": state["final_answer"],
+                "references": state["references"],
+                "confidence": state["confidence"],
+                "search_performed": state["search_performed"]
+            }, corpus_version=corpus_version)
+        except Exception as e:
+            logger.warning(f"Response cache store failed: {str(e)}")
+
+    def process_query(self, query: str, chat_history: Optional[List[BaseMessage]] = None) -> Dict[str, Any]:
         """Process a legal query through the workflow.
-        
+
         Args:
             query (str): The legal query to process
-            
+            chat_history (List[BaseMessage], optional): Earlier turns of the
+                conversation, e.g. from ConversationMemory.messages(); already
+                bounded to a token budget by the caller
+
         Returns:
-            Dict[str, Any]: Results containing answer, references, and confidence
+            Dict[str, Any]: Results containing answer, references, confidence,
+                the number of LLM and search calls the query used, any
+                branches that timed out, any error met along the way,
+                whether it was a cache hit, the processing time in seconds,
+                the LLM tokens used and the query's spans (see Trace.waterfall)
         """
-        try:
-            # Initialize workflow state
-            initial_state: WorkflowState = {
-                "messages": [HumanMessage(content=query)],
-                "context": {},
-                "current_step": "search",
-                "search_results": "",
-                "research_output": "",
-                "analysis_results": "",
-                "final_answer": "",
-                "references": [],
-                "confidence": 0.0,
-                "error_context": ""
-            }
-            
-            # Run the workflow
-            final_state = self.workflow.invoke(initial_state)
-            
-            # Format response
-            return {
-                "answer": final_state["final_answer"],
-                "references": final_state["references"],
-                "confidence": final_state["confidence"]
-            }
-            
-        except Exception as e:
-            logger.error(f"Error in workflow: {str(e)}")
-            return {
-                "answer": f"An error occurred: {str(e)}",
-                "references": [],
-                "confidence": 0.0
-            }
\ No newline at end of file
+        with trace("query", self.trace_exporters, query=query) as query_trace:
+            try:
+                corpus_version = self._corpus_version()
+                cached = self._cached_result(query, chat_history)
+                if cached is not None:
+                    return self._traced_result(cached, query_trace)
+
+                # Run the workflow
+                final_state = self.workflow.invoke(self._initial_state(query, chat_history))
+                self._store_result(query, final_state, corpus_version)
+
+                # Format response
+                return self._traced_result(self._format_result(final_state), query_trace)
+
+            except Exception as e:
+                logger.error(f"Error in workflow: {str(e)}")
+                return self._traced_result(self._error_result(e), query_trace)
+
+    async def aprocess_query(self, query: str, chat_history: Optional[List[BaseMessage]] = None) -> Dict[str, Any]:
+        """Async version of process_query, running every node on the async graph API.
+
+        No thread is held while waiting on Gemini, Tavily or the vector store,
+        so one event loop can serve many concurrent queries.
+        """
+        with trace("query", self.trace_exporters, query=query) as query_trace:
+            try:
+                # The cache does local disk (and, for near-duplicate lookups, embedding) I/O
+                corpus_version = await asyncio.to_thread(self._corpus_version)
+                cached = await asyncio.to_thread(self._cached_result, query, chat_history)
+                if cached is not None:
+                    return self._traced_result(cached, query_trace)
+
+                final_state = await self.workflow.ainvoke(self._initial_state(query, chat_history))
+                await asyncio.to_thread(self._store_result, query, final_state, corpus_version)
+                return self._traced_result(self._format_result(final_state), query_trace)
+
+            except Exception as e:
+                logger.error(f"Error in workflow: {str(e)}")
+                return self._traced_result(self._error_result(e), query_trace)
+
+    def _step_message(self, node: str, state: WorkflowState) -> str:
+        if node == "classify":
+            return "Web search needed" if state["needs_search"] else "Answering from your documents"
+        if node == "gather":
+            messages = []
+            if state["needs_search"]:
+                messages.append("Search timed out" if "search" in state["timed_out"] else "Search done")
+            messages.append(f"{state['documents_retrieved']} documents retrieved")
+            return ", ".join(messages)
+        if node == "research":
+            return "Research complete"
+        if node == "analyze":
+            return "Analysis complete"
+        return node
+
+    def stream_query(self, query: str, chat_history: Optional[List[BaseMessage]] = None) -> Iterator[Dict[str, Any]]:
+        """Process a legal query, yielding progress events as they happen.
+
+        Takes the same arguments as process_query.
+
+        Yields, in order:
+            {"type": "step", "step": <node>, "message": <str>} after each
+                node up to the final LLM call
+            {"type": "token", "content": <str>} for each chunk of the final
+                answer as the LLM produces it
+            {"type": "result", "result": <dict>} with the same fields as
+                process_query
+        """
+        with trace("query", self.trace_exporters, query=query) as query_trace:
+            try:
+                corpus_version = self._corpus_version()
+                cached = self._cached_result(query, chat_history)
+                if cached is not None:
+                    yield {"type": "step", "step": "cache", "message": "Answer found in cache"}
+                    yield {"type": "token", "content": cached["answer"]}
+                    yield {"type": "result", "result": self._traced_result(cached, query_trace)}
+                    return
+
+                state = self._initial_state(query, chat_history)
+                for update in self.prepare_workflow.stream(state, stream_mode="updates"):
+                    for node, node_state in update.items():
+                        state = node_state
+                        yield {"type": "step", "step": node, "message": self._step_message(node, state)}
+
+                final_step = "synthesize" if self.merge_final else "finalize"
+                prompt = self._synthesis_prompt(state) if self.merge_final else self._final_prompt(state)
+                chunks = []
+                with span(final_step, "node"):
+                    try:
+                        for chunk in self.llm.stream(prompt):
+                            if chunk.content:
+                                chunks.append(chunk.content)
+                                yield {"type": "token", "content": chunk.content}
+                    except Exception as e:
+                        state["error_context"] = f"Error in final answer: {str(e)}"
+                state["llm_calls"] += 1
+                self._complete(state, "".join(chunks))
+                self._store_result(query, state, corpus_version)
+
+                yield {"type": "result", "result": self._traced_result(self._format_result(state), query_trace)}
+
+            except Exception as e:
+                logger.error(f"Error in workflow: {str(e)}")
+                result = self._traced_result(self._error_result(e), query_trace)
+                yield {"type": "token", "content": result["answer"]}
+                yield {"type": "result", "result": result}
@@ -1,18 +1,16 @@
 import streamlit as st
+import html
 import os
 import time
 from typing import Dict, List
 import tempfile
 from src.graphs.workflow import LegalWorkflow
 from src.utils.document_loader import DocumentLoader
-from src.data.vector_store import VectorStore
+from src.utils.registry import get_registry
+from src.utils.conversation_memory import ConversationMemory
+from src.config.config import DEDUP_ENABLED
 from google.api_core import exceptions as google_exceptions
 
-# Initialize components
-workflow = LegalWorkflow()
-document_loader = DocumentLoader()
-vector_store = VectorStore()
-
 # Set page configuration
 st.set_page_config(
     page_title="Legal RAG System",
@@ -21,6 +19,91 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource(show_spinner="Loading legal research components...")
+def load_components():
+    """Build the heavyweight components once per process, not on every rerun."""
+    registry = get_registry()
+    registry.warm_up()
+    return LegalWorkflow(), DocumentLoader(), registry.get_vector_store(), registry.get_lexical_index()
+
+# Initialize components
+workflow, document_loader, vector_store, lexical_index = load_components()
+
+def add_chunks(chunks):
+    """Insert one batch of chunks into the vector store and the BM25 index."""
+    if DEDUP_ENABLED:
+        # Duplicates are only recorded as extra sources of the chunk already stored
+        chunks = get_registry().get_deduplicator().add(chunks)
+    if chunks:
+        vector_store.add_documents(chunks)
+        lexical_index.add_documents(chunks)
+
+def delete_chunks(chunk_ids):
+    """Remove chunks from the vector store and the BM25 index by ID."""
+    if DEDUP_ENABLED:
+        # Stored chunks stay as long as another source still contains them, re-pointed at that source
+        removal = get_registry().get_deduplicator().remove(chunk_ids)
+        chunk_ids = removal.emptied
+        if removal.repointed:
+            vector_store.update_metadata(removal.repointed)
+            lexical_index.update_metadata(removal.repointed)
+    if chunk_ids:
+        vector_store.delete(chunk_ids)
+        lexical_index.remove(chunk_ids)
+
+def waterfall_html(spans):
+    """Render a query's spans as an indented timeline, bars scaled to the whole query."""
+    if not spans:
+        return ""
+    total = max(spans[0]["duration_ms"], 1e-3)
+    rows = []
+    for span in spans:
+        offset = min(100.0, 100 * span["start_ms"] / total)
+        width = max(0.5, min(100.0 - offset, 100 * span["duration_ms"] / total))
+        details = [f"{span['duration_ms']:.0f} ms"]
+        attributes = span.get("attributes") or {}
+        if attributes.get("input_tokens") is not None:
+            details.append(f"{attributes['input_tokens']}→{attributes.get('output_tokens') or 0} tokens")
+        if attributes.get("cache_hit"):
+            details.append("cache hit")
+        color = "#4a90d9"
+        if span.get("error"):
+            details.append(html.escape(span["error"]))
+            color = "#d9534f"
+        rows.append(f"""
+            <div style="display: flex; align-items: center; gap: 8px;">
+                <div style="width: 40%; padding-left: {span['depth'] * 12}px; white-space: nowrap; overflow: hidden;">{html.escape(span['name'])}</div>
+                <div style="width: 30%; position: relative; height: 10px; background: #f2f2f2;">
+                    <div style="position: absolute; left: {offset:.1f}%; width: {width:.1f}%; height: 100%; background: {color};"></div>
+                </div>
+                <div style="width: 30%; white-space: nowrap;">{", ".join(details)}</div>
+            </div>""")
+    return '<h5 style="margin: 10px 0 5px 0;">Trace</h5>' + "".join(rows)
+
+def ingest_with_progress(directory_path, manifest=None):
+    """Stream a directory into the stores, reporting progress per parsed file.
+    
+    With a manifest, only files that changed since the last run are processed.
+    """
+    progress = st.progress(0.0, text="Discovering files...")
+    
+    def on_progress(done, total, file_path, chunk_count):
+        progress.progress(done / total, text=f"{done}/{total}: {os.path.basename(file_path)} ({chunk_count} chunks)")
+    
+    report = document_loader.ingest_directory(
+        directory_path,
+        add_chunks,
+        progress_callback=on_progress,
+        manifest=manifest,
+        delete_ids=delete_chunks
+    )
+    progress.empty()
+    for file_path in report["empty_files"]:
+        st.warning(f"No content extracted from {os.path.basename(file_path)}")
+    for file_path in report["failed_files"]:
+        st.error(f"Could not parse {os.path.basename(file_path)}; its previous version is kept")
+    return report
+
 # Sidebar for document uploading and settings
 with st.sidebar:
     st.title("⚖️ Legal RAG System")
@@ -41,23 +124,15 @@ with st.sidebar:
                 # Create a temporary directory to save the uploaded files
                 with tempfile.TemporaryDirectory() as temp_dir:
                     # Save uploaded files to temp directory
-                    file_paths = []
                     for uploaded_file in uploaded_files:
                         file_path = os.path.join(temp_dir, uploaded_file.name)
                         with open(file_path, "wb") as f:
                             f.write(uploaded_file.getbuffer())
-                        file_paths.append(file_path)
                     
-                    # Process each file
-                    all_docs = []
-                    for file_path in file_paths:
-                        docs = document_loader.load_file(file_path)
-                        all_docs.extend(docs)
+                    report = ingest_with_progress(temp_dir)
                     
-                    # Add to vector store
-                    if all_docs:
-                        vector_store.add_documents(all_docs)
-                        st.success(f"Successfully added {len(all_docs)} document chunks to the vector store!")
+                    if report["chunks"]:
+                        st.success(f"Successfully added {report['chunks']} document chunks to the vector store!")
                     else:
                         st.error("No documents were processed. Please check the file formats.")
     
@@ -68,14 +143,18 @@ with st.sidebar:
             if not os.path.exists(directory_path):
                 st.error(f"Directory {directory_path} does not exist!")
             else:
-                with st.spinner("Processing documents from directory..."):
-                    docs = document_loader.load_directory(directory_path)
-                    
-                    if docs:
-                        vector_store.add_documents(docs)
-                        st.success(f"Successfully added {len(docs)} document chunks to the vector store!")
-                    else:
-                        st.error("No documents were processed. Please check the directory content.")
+                report = ingest_with_progress(directory_path, manifest=get_registry().get_ingest_manifest())
+                changed = report["files"] - report["unchanged"]
+                
+                if changed or report["removed"]:
+                    st.success(
+                        f"Synced {report['files']} files: {report['chunks']} chunks from {changed} new or modified files, "
+                        f"{report['unchanged']} unchanged, {report['removed']} removed."
+                    )
+                elif report["files"]:
+                    st.info(f"All {report['files']} files are already up to date.")
+                else:
+                    st.error("No documents were processed. Please check the directory content.")
     
     # Vector store stats
     st.markdown("---")
@@ -93,6 +172,9 @@ with st.sidebar:
     if st.button("Clear Vector Store", type="primary"):
         try:
             vector_store.delete_collection()
+            lexical_index.clear()
+            get_registry().get_ingest_manifest().clear()
+            get_registry().get_deduplicator().clear()
             st.success("Vector store collection deleted!")
         except Exception as e:
             st.error(f"Error deleting collection: {str(e)}")
@@ -111,6 +193,9 @@ and relevant web sources if needed.
 # Initialize chat history and metadata visibility state
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "memory" not in st.session_state:
+    # Bounded history for the model: recent turns verbatim, older ones summarized
+    st.session_state.memory = ConversationMemory()
 if "show_metadata" not in st.session_state:
     st.session_state.show_metadata = False
 
@@ -135,67 +220,79 @@ if prompt := st.chat_input("Ask a legal question..."):
     
     # Display assistant response
     with st.chat_message("assistant"):
-        with st.spinner("Researching..."):
-            # Format chat history for the model
-            chat_history = [
-                {"role": msg["role"], "content": msg["content"]} 
-                for msg in st.session_state.messages[:-1]  # Exclude the current query
-            ]
-            
-            # Process the query through the workflow
-            response_container = st.empty()
-            response_container.markdown("Researching your legal question...")
-            
-            # Process the query
-            try:
-                result = workflow.process_query(prompt)
-            except google_exceptions.NotFound as e:
-                print(f"Error processing query with Gemini model: {e}")
-                print("Please check your Google API configuration and model availability")
-                raise
-            
-            # Format the response
-            answer = result["answer"]
-            
-            # Add references if available
-            if result["references"]:
-                answer += "\n\n**References:**\n"
-                for ref in result["references"]:
-                    answer += f"- {ref}\n"
-            
-            # Format metadata
-            confidence = result.get("confidence", 0.0)
-            confidence_color = "green" if confidence > 0.7 else "orange" if confidence > 0.4 else "red"
-            search_performed = result.get("search_performed", False)
-            docs_retrieved = bool(result.get("references", []))
-            
-            metadata = f"""
-            <div style="font-size: 0.8em; color: gray; margin-top: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px; display: {'block' if st.session_state.show_metadata else 'none'};">
-                <h4 style="margin: 0 0 10px 0;">Response Metadata</h4>
-                <p>Confidence: <span style="color: {confidence_color};">{confidence:.2f}</span></p>
-                <p>Search performed: {"Yes" if search_performed else "No"}</p>
-                <p>Documents retrieved: {"Yes" if docs_retrieved else "No"}</p>
-                <p>Number of references: {len(result.get("references", []))}</p>
-                <p>Response length: {len(answer)} characters</p>
-                <p>Processing time: {result.get("processing_time", "N/A")} seconds</p>
-            </div>
-            """
-            
-            # Store answer and metadata separately
-            message_content = {
-                "answer": answer,
-                "metadata": metadata
-            }
-            
-            # Display the answer first
-            response_container.markdown(answer)
-            
-            # Only show metadata if toggle is enabled
-            if st.session_state.show_metadata:
-                response_container.markdown(metadata, unsafe_allow_html=True)
-            
-            # Store in chat history with structured content
-            st.session_state.messages.append({"role": "assistant", "content": message_content})
+        # Earlier turns for the model, within the history token budget
+        chat_history = st.session_state.memory.messages()
+        
+        # Progress steps go in a collapsible status box, answer tokens straight into the chat
+        status = st.status("Researching your legal question...")
+        result = {}
+        
+        def answer_stream():
+            for event in workflow.stream_query(prompt, chat_history=chat_history):
+                if event["type"] == "step":
+                    status.write(event["message"])
+                elif event["type"] == "token":
+                    yield event["content"]
+                elif event["type"] == "result":
+                    result.update(event["result"])
+            status.update(label="Research complete", state="complete", expanded=False)
+        
+        # Process the query
+        try:
+            st.write_stream(answer_stream())
+        except google_exceptions.NotFound as e:
+            print(f"Error processing query with Gemini model: {e}")
+            print("Please check your Google API configuration and model availability")
+            raise
+        
+        # Format the response
+        answer = result.get("answer", "")
+        if answer:
+            st.session_state.memory.add_turn(prompt, answer)
+        
+        # Add references if available
+        if result.get("references"):
+            references = "\n\n**References:**\n"
+            for ref in result["references"]:
+                references += f"- {ref}\n"
+            st.markdown(references)
+            answer += references
+        
+        # Format metadata
+        confidence = result.get("confidence", 0.0)
+        confidence_color = "green" if confidence > 0.7 else "orange" if confidence > 0.4 else "red"
+        search_performed = result.get("search_performed", False)
+        docs_retrieved = bool(result.get("references", []))
+        tokens = result.get("tokens") or {}
+        
+        metadata = f"""
+        <div style="font-size: 0.8em; color: gray; margin-top: 20px; padding: 10px; border: 1px solid #ddd; border-radius: 5px; display: {'block' if st.session_state.show_metadata else 'none'};">
+            <h4 style="margin: 0 0 10px 0;">Response Metadata</h4>
+            <p>Confidence: <span style="color: {confidence_color};">{confidence:.2f}</span></p>
+            <p>Search performed: {"Yes" if search_performed else "No"}</p>
+            <p>Documents retrieved: {"Yes" if docs_retrieved else "No"}</p>
+            <p>Number of references: {len(result.get("references", []))}</p>
+            <p>Cache hit: {"Yes" if result.get("cache_hit") else "No"}</p>
+            <p>LLM calls: {result.get("llm_calls", "N/A")} / Search calls: {result.get("search_calls", "N/A")}</p>
+            <p>Response length: {len(answer)} characters</p>
+            <p>Tokens: {tokens.get("input", 0)} in / {tokens.get("output", 0)} out</p>
+            <p>Processing time: {result.get("processing_time", "N/A")} seconds</p>
+            {waterfall_html(result.get("trace", []))}
+        </div>
+        """
+        
+        # Store answer and metadata separately
+        message_content = {
+            "answer": answer,
+            "metadata": metadata
+        }
+        
+        # Only show metadata if toggle is enabled
+        if st.session_state.show_metadata:
+            st.markdown(metadata, unsafe_allow_html=True)
+        
+        # Store in chat history with structured content
+        st.session_state.messages.append({"role": "assistant", "content": message_content})
 
 # Add footer
 st.markdown("""
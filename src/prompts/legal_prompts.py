@@ -62,6 +62,8 @@ Focus on:
 - Relevant laws, regulations, or case names
 - Jurisdictional specifics
 - Reformulating the question to target specific legal sources
+
+Return only the queries, one per line, without numbering or commentary.
 """)
 ])
 
@@ -101,4 +103,36 @@ Provide:
 2. Brief explanation for your score
 3. Key information from the document relevant to the query
 """)
-])
\ No newline at end of file
+])
+
+# Batched document relevance evaluation prompt (one call scores every retrieved chunk)
+BATCH_DOCUMENT_RELEVANCE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You evaluate the relevance of retrieved legal documents to the original query.
+Your job is to determine how well each document addresses the specific legal question."""),
+    ("user", """Original query: {query}
+
+Documents:
+{documents}
+
+Evaluate the relevance of each document to the query on a scale of 1-10, where:
+1 = Completely irrelevant
+10 = Directly answers the query with authoritative legal information
+
+Respond with exactly one line per document, in this format and nothing else:
+Document <number>: <score>
+""")
+])
+
+# Conversation summary prompt (folds older turns into a running summary)
+CONVERSATION_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", """You maintain a concise running summary of a conversation between a user and a legal research assistant.
+The summary gives later questions their context, so keep the facts, parties, jurisdictions, documents and legal issues discussed, and the conclusions reached."""),
+    ("user", """Current summary:
+{summary}
+
+New conversation turns:
+{conversation}
+
+Update the summary to include the new turns. Keep it under {max_words} words and respond with the summary only.
+""")
+])
@@ -0,0 +1,204 @@
+"""Fitting retrieved context into a token budget.
+
+``ContextPacker`` turns (document, distance) pairs into prompt context:
+
+1. Chunks of the same source are ordered by position and merged where they
+   overlap (``CHUNK_OVERLAP`` makes neighbouring chunks repeat text) or
+   directly follow each other, so shared text appears once.
+2. Chunks whose text is contained in an already kept chunk are dropped.
+3. The merged passages are added best first until the budget is spent; the
+   passage that crosses the budget is cut at a sentence boundary.
+
+``fit_text`` bounds free text (web results, intermediate LLM output) the same
+way. Token counts use a character estimate by default (about four characters
+per token for Gemini); any ``str -> int`` counter can be passed instead.
+"""
+import math
+import re
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from ..config.config import CHUNK_OVERLAP, CONTEXT_TOKEN_BUDGET
+
+CHARS_PER_TOKEN = 4
+_SENTENCE_END = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def text_overlap(left: str, right: str, max_overlap: int = 2 * CHUNK_OVERLAP, min_overlap: int = 50) -> int:
+    """Length of the longest suffix of ``left`` that is a prefix of ``right`` (0 if shorter than min_overlap)."""
+    limit = min(len(left), len(right), max_overlap)
+    if limit < min_overlap:
+        return 0
+    tail = left[-limit:]
+    probe = right[:min_overlap]
+    position = tail.find(probe)
+    while position != -1:
+        length = limit - position
+        if right.startswith(tail[position:]):
+            return length
+        position = tail.find(probe, position + 1)
+    return 0
+
+
+def fit_text(text: str, max_tokens: int, token_counter: Callable[[str], int] = estimate_tokens,
+             marker: str = " [...]") -> str:
+    """Cut a text to at most ``max_tokens``, at the last sentence or line break that fits."""
+    if max_tokens <= 0:
+        return ""
+    if token_counter(text) <= max_tokens:
+        return text
+    # Binary search on the character length, then back off to a boundary
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if token_counter(text[:middle] + marker) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    cut = text[:low]
+    boundaries = [match.start() for match in _SENTENCE_END.finditer(cut)]
+    if boundaries and boundaries[-1] > low // 2:
+        cut = cut[:boundaries[-1]]
+    return cut.rstrip() + marker if cut.strip() else ""
+
+
+class Passage(NamedTuple):
+    """Merged text of one or more chunks of a source."""
+    document: Document
+    score: float  # Best (lowest) distance among the merged chunks
+    rank: int  # Retrieval rank of the best chunk
+    chunks: int
+
+
+class ContextPacker:
+    """Deduplicate, merge and pack retrieved chunks into a token budget."""
+
+    def __init__(self, max_tokens: int = CONTEXT_TOKEN_BUDGET,
+                 token_counter: Callable[[str], int] = estimate_tokens,
+                 max_overlap: int = 2 * CHUNK_OVERLAP, min_passage_tokens: int = 50):
+        """Initialize the packer.
+
+        Args:
+            max_tokens (int): Token budget for the formatted context
+            token_counter (Callable): Counts the tokens of a string
+            max_overlap (int): Longest overlap (in characters) looked for between neighbours
+            min_passage_tokens (int): A passage is only cut to fit if at least this many tokens remain,
+                and packing stops once fewer remain
+        """
+        self.max_tokens = max_tokens
+        self.token_counter = token_counter
+        self.max_overlap = max_overlap
+        self.min_passage_tokens = min_passage_tokens
+
+    def merge(self, docs: Sequence[Tuple[Document, float]]) -> List[Passage]:
+        """Merge overlapping and adjacent chunks of each source, best passage first."""
+        by_source = {}
+        for rank, (doc, score) in enumerate(docs):
+            by_source.setdefault(doc.metadata.get("source"), []).append((rank, doc, score))
+
+        passages = []
+        for entries in by_source.values():
+            # Document order: by offset where the chunker recorded one, else by page
+            entries.sort(key=lambda entry: (entry[1].metadata.get("page", 0),
+                                            entry[1].metadata.get("start_index", entry[0])))
+            current = None
+            for rank, doc, score in entries:
+                if current is not None:
+                    # Without offsets the order is a guess, so try both ways round
+                    joined = self._join(current.document, doc) or self._join(doc, current.document)
+                    if joined is not None:
+                        current = Passage(joined, min(current.score, score), min(current.rank, rank),
+                                          current.chunks + 1)
+                        continue
+                    passages.append(current)
+                current = Passage(doc, score, rank, 1)
+            passages.append(current)
+
+        passages.sort(key=lambda passage: passage.rank)
+        return self._drop_contained(passages)
+
+    def _join(self, first: Document, second: Document) -> Optional[Document]:
+        left, right = first.page_content, second.page_content
+        if right in left:
+            return first
+        overlap = text_overlap(left, right, self.max_overlap)
+        if overlap:
+            text = left + right[overlap:]
+        elif self._adjacent(first, second):
+            text = left + "\n" + right
+        else:
+            return None
+        metadata = dict(first.metadata)
+        if second.metadata.get("section_path") != first.metadata.get("section_path"):
+            metadata.pop("section_path", None)
+            metadata.pop("section", None)
+        metadata["end_index"] = self._end(second)
+        return Document(page_content=text, metadata=metadata)
+
+    @staticmethod
+    def _end(doc: Document) -> Optional[int]:
+        if "end_index" in doc.metadata:
+            return doc.metadata["end_index"]
+        start = doc.metadata.get("start_index")
+        return None if start is None else start + len(doc.page_content)
+
+    def _adjacent(self, first: Document, second: Document) -> bool:
+        end, start = self._end(first), second.metadata.get("start_index")
+        # Chunk text is stripped, so a few characters of whitespace may separate neighbours
+        return end is not None and start is not None and 0 <= start - end <= 4
+
+    @staticmethod
+    def _drop_contained(passages: List[Passage]) -> List[Passage]:
+        kept: List[Passage] = []
+        for passage in passages:
+            text = passage.document.page_content
+            if any(text in other.document.page_content for other in kept):
+                continue
+            # A lower-ranked passage that contains a kept one takes its place
+            for i, other in enumerate(kept):
+                if other.document.page_content in text:
+                    kept[i] = passage._replace(score=other.score, rank=other.rank)
+                    break
+            else:
+                kept.append(passage)
+        return kept
+
+    def pack(self, docs: Sequence[Tuple[Document, float]],
+             format_passage: Callable[[int, Passage, str], str]) -> List[str]:
+        """Format merged passages best first until the budget is spent.
+
+        A passage that does not fit is cut to the remaining budget, or skipped
+        if too little would be left of it, so shorter lower-ranked passages can
+        still fill the space; packing stops once less than
+        ``min_passage_tokens`` remain.
+
+        Args:
+            docs (Sequence): (document, distance) pairs, best first
+            format_passage (Callable): Renders (number, passage, content) as prompt text
+
+        Returns:
+            List[str]: The rendered passages that fit
+        """
+        packed, used = [], 0
+        for passage in self.merge(docs):
+            number = len(packed) + 1
+            content = passage.document.page_content
+            rendered = format_passage(number, passage, content)
+            tokens = self.token_counter(rendered)
+            if used + tokens > self.max_tokens:
+                remaining = self.max_tokens - used - self.token_counter(format_passage(number, passage, ""))
+                if remaining < self.min_passage_tokens:
+                    continue
+                rendered = format_passage(number, passage, fit_text(content, remaining, self.token_counter))
+                tokens = self.token_counter(rendered)
+            packed.append(rendered)
+            used += tokens
+            if self.max_tokens - used < self.min_passage_tokens:
+                break
+        return packed
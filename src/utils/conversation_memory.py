@@ -0,0 +1,175 @@
+"""Bounded chat history for follow-up questions.
+
+``ConversationMemory`` keeps the latest question/answer pairs verbatim and
+folds older turns into a running summary:
+
+1. ``add_turn`` stores the turn (the answer cut to the history budget, since
+   nothing longer can ever be sent) and, once more than ``recent_turns`` are
+   held, hands the oldest ones to a background summarization. Adding a turn
+   never waits on the LLM.
+2. ``messages`` renders the summary followed by the turns, newest kept first,
+   within ``max_tokens``. Turns whose summarization has not finished yet are
+   still included verbatim while the budget allows, so nothing drops out of
+   the history while the summary catches up.
+"""
+import logging
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, List, NamedTuple, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.output_parsers import StrOutputParser
+
+from .context_packer import estimate_tokens, fit_text
+from .registry import get_registry
+from ..config.config import MEMORY_RECENT_TURNS, MEMORY_TOKEN_BUDGET, MEMORY_SUMMARY_TOKEN_BUDGET
+from ..prompts.legal_prompts import CONVERSATION_SUMMARY_PROMPT
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of our earlier conversation:\n"
+_MAX_PENDING_TURNS = 20  # Unsummarized turns kept while summarization keeps failing
+
+
+class Turn(NamedTuple):
+    """One question and the answer given to it."""
+    question: str
+    answer: str
+
+
+class ConversationMemory:
+    """Last N turns verbatim plus an incrementally updated summary, within a token budget."""
+
+    def __init__(self, llm=None, recent_turns: int = MEMORY_RECENT_TURNS,
+                 max_tokens: int = MEMORY_TOKEN_BUDGET, summary_tokens: int = MEMORY_SUMMARY_TOKEN_BUDGET,
+                 token_counter: Callable[[str], int] = estimate_tokens, executor: Optional[Executor] = None):
+        """Initialize an empty memory.
+
+        Args:
+            llm: Chat model that writes the summary (defaults to the shared
+                Gemini client at temperature 0, created on first use)
+            recent_turns (int): Latest turns kept verbatim
+            max_tokens (int): Token budget for the rendered history
+            summary_tokens (int): Token budget for the running summary
+            token_counter (Callable): Counts the tokens of a string
+            executor (Executor, optional): Runs summarization in the background
+                (defaults to the shared "memory" thread pool)
+        """
+        self.recent_turns = recent_turns
+        self.max_tokens = max_tokens
+        self.summary_tokens = min(summary_tokens, max_tokens // 2)
+        self.token_counter = token_counter
+        self._llm = llm
+        self._executor = executor
+        self._chain = None
+        self._lock = threading.Lock()
+        self._recent: List[Turn] = []
+        self._pending: List[Turn] = []  # Aged out of the recent turns, not yet in the summary
+        self._future: Optional[Future] = None
+        self._generation = 0  # Bumped by clear so a summary of forgotten turns is discarded
+        self.summary = ""
+
+    @property
+    def turns(self) -> int:
+        """Turns held verbatim (recent plus not yet summarized)."""
+        with self._lock:
+            return len(self._pending) + len(self._recent)
+
+    def _summary_chain(self):
+        if self._chain is None:
+            llm = self._llm if self._llm is not None else get_registry().get_llm(temperature=0)
+            self._chain = CONVERSATION_SUMMARY_PROMPT | llm | StrOutputParser()
+        return self._chain
+
+    def add_turn(self, question: str, answer: str):
+        """Record a turn; turns beyond the most recent ones are summarized in the background."""
+        turn = Turn(fit_text(question, self.max_tokens, self.token_counter),
+                    fit_text(answer, self.max_tokens, self.token_counter))
+        with self._lock:
+            self._recent.append(turn)
+            aged_out = max(0, len(self._recent) - self.recent_turns)
+            if aged_out:
+                self._pending.extend(self._recent[:aged_out])
+                del self._recent[:aged_out]
+            if len(self._pending) > _MAX_PENDING_TURNS:
+                logger.warning(f"Dropping {len(self._pending) - _MAX_PENDING_TURNS} unsummarized turns")
+                del self._pending[:-_MAX_PENDING_TURNS]
+            start = bool(self._pending) and (self._future is None or self._future.done())
+            if start:
+                executor = self._executor or get_registry().get_executor("memory", max_workers=2)
+                self._future = executor.submit(self._summarize)
+
+    def _summarize(self):
+        """Fold pending turns into the summary until none are left (one run at a time)."""
+        while True:
+            with self._lock:
+                batch, summary, generation = list(self._pending), self.summary, self._generation
+            if not batch:
+                return
+            try:
+                text = self._summary_chain().invoke({
+                    "summary": summary or "(none yet)",
+                    "conversation": self._render(batch),
+                    "max_words": self.summary_tokens * 3 // 4,
+                })
+            except Exception as e:
+                # The turns stay pending and are retried with the next turn
+                logger.warning(f"Conversation summarization failed: {str(e)}")
+                return
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self.summary = fit_text(text.strip(), self.summary_tokens, self.token_counter)
+                # Turns added meanwhile sit after the batch; drop exactly the summarized ones
+                if self._pending[:len(batch)] == batch:
+                    del self._pending[:len(batch)]
+
+    @staticmethod
+    def _render(turns: List[Turn]) -> str:
+        return "\n\n".join(f"User: {turn.question}\nAssistant: {turn.answer}" for turn in turns)
+
+    def wait(self, timeout: Optional[float] = None):
+        """Block until any background summarization has finished."""
+        future = self._future
+        if future is not None:
+            future.result(timeout=timeout)
+
+    def messages(self) -> List[BaseMessage]:
+        """The history as chat messages, oldest first, within ``max_tokens``."""
+        with self._lock:
+            summary, turns = self.summary, self._pending + self._recent
+
+        budget = self.max_tokens
+        header = []
+        if summary:
+            text = SUMMARY_PREFIX + summary
+            budget -= self.token_counter(text)
+            header = [HumanMessage(content=text)]
+
+        selected: List[Turn] = []
+        for turn in reversed(turns):
+            cost = self.token_counter(turn.question) + self.token_counter(turn.answer)
+            if cost <= budget:
+                selected.append(turn)
+                budget -= cost
+                continue
+            if not selected:
+                # The latest turn is always kept, its answer cut to what is left
+                answer = fit_text(turn.answer, budget - self.token_counter(turn.question), self.token_counter)
+                if answer:
+                    selected.append(Turn(turn.question, answer))
+            break
+
+        history = list(header)
+        for turn in reversed(selected):
+            history += [HumanMessage(content=turn.question), AIMessage(content=turn.answer)]
+        return history
+
+    def clear(self):
+        """Forget the conversation (a running summarization finishes but is discarded)."""
+        with self._lock:
+            self._recent.clear()
+            self._pending.clear()
+            self.summary = ""
+            self._generation += 1
@@ -1,5 +1,4 @@
 from langchain_community.document_loaders import (
-    DirectoryLoader, 
     PyPDFLoader, 
     TextLoader,
     UnstructuredFileLoader,
@@ -7,102 +6,295 @@ from langchain_community.document_loaders import (
     Docx2txtLoader  # Changed from DocxLoader
 )
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from collections import deque
+from itertools import groupby
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 from config import CHUNK_SIZE, CHUNK_OVERLAP
+from src.config.config import (
+    CHUNKING_MODE,
+    INGEST_MAX_WORKERS,
+    INGEST_BATCH_SIZE,
+    METADATA_EXTRACTION_ENABLED,
+    METADATA_SCAN_CHARS,
+)
+from src.utils.legal_chunker import LegalChunker
+from src.utils.legal_metadata import extract_metadata
+from src.data.manifest import IngestionManifest, ManifestEntry, hash_file
+import hashlib
 import os
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+SUPPORTED_EXTENSIONS = (".pdf", ".txt", ".docx", ".csv")
+
+_worker_loader = None
+
+
+def _init_worker(chunking_mode, extract_metadata):
+    """Process-pool initializer: build this process's loader with the parent loader's settings."""
+    global _worker_loader
+    _worker_loader = DocumentLoader(chunking_mode=chunking_mode, extract_metadata=extract_metadata)
+
+
+def _load_file_in_worker(file_path):
+    """Process-pool entry point: parse and split one file with the per-process loader."""
+    return _worker_loader._parse_file(file_path)
+
 class DocumentLoader:
-    def __init__(self):
-        """Initialize document loader with text splitter."""
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=CHUNK_SIZE,
-            chunk_overlap=CHUNK_OVERLAP,
-            separators=["\n\n", "\n", ".", " ", ""]
-        )
-        
-    def load_directory(self, directory_path):
-        """Load all supported documents from a directory."""
+    def __init__(self, chunking_mode=CHUNKING_MODE, extract_metadata=METADATA_EXTRACTION_ENABLED):
+        """Initialize document loader with text splitter.
+        
+        Args:
+            chunking_mode (str): "structure" to chunk along sections and clauses,
+                or "recursive" for fixed-size character chunks
+            extract_metadata (bool): Tag chunks with jurisdiction, court, document
+                type and effective date so retrieval can filter on them
+        """
+        self.chunking_mode = chunking_mode
+        self.extract_metadata = extract_metadata
+        if chunking_mode == "structure":
+            self.text_splitter = LegalChunker(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        else:
+            self.text_splitter = RecursiveCharacterTextSplitter(
+                chunk_size=CHUNK_SIZE,
+                chunk_overlap=CHUNK_OVERLAP,
+                separators=["\n\n", "\n", ".", " ", ""]
+            )
+        
+    @staticmethod
+    def discover_files(directory_path) -> List[str]:
+        """List every supported file under a directory, in a stable order."""
         if not os.path.exists(directory_path):
             raise ValueError(f"Directory {directory_path} does not exist")
         
-        loaders = []
-        
-        # PDF loader
-        pdf_loader = DirectoryLoader(
-            directory_path, 
-            glob="**/*.pdf", 
-            loader_cls=PyPDFLoader
-        )
-        loaders.append(pdf_loader)
-        
-        # Text loader
-        text_loader = DirectoryLoader(
-            directory_path, 
-            glob="**/*.txt", 
-            loader_cls=TextLoader
-        )
-        loaders.append(text_loader)
-        
-        # DOCX loader - Updated to use Docx2txtLoader
-        docx_loader = DirectoryLoader(
-            directory_path, 
-            glob="**/*.docx", 
-            loader_cls=Docx2txtLoader
-        )
-        loaders.append(docx_loader)
-        
-        # CSV loader
-        csv_loader = DirectoryLoader(
-            directory_path, 
-            glob="**/*.csv", 
-            loader_cls=CSVLoader
-        )
-        loaders.append(csv_loader)
-        
-        # Load documents
-        all_documents = []
-        for loader in loaders:
-            try:
-                documents = loader.load()
-                logger.info(f"Loaded {len(documents)} documents using {loader.__class__.__name__}")
-                all_documents.extend(documents)
-            except Exception as e:
-                logger.error(f"Error loading documents with {loader.__class__.__name__}: {e}")
-        
-        # Split documents
-        if all_documents:
-            return self.text_splitter.split_documents(all_documents)
-        else:
-            logger.warning(f"No documents were loaded from {directory_path}")
-            return []
+        files = []
+        for root, _, names in os.walk(directory_path):
+            for name in names:
+                if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                    files.append(os.path.join(root, name))
+        return sorted(files)
+    
+    def iter_files(self, file_paths, max_workers=INGEST_MAX_WORKERS) -> Iterator[Tuple[str, List]]:
+        """Parse and split files in a process pool, yielding (path, chunks) as each finishes.
+        
+        At most two files per worker are in flight, so only their chunks are
+        held in memory at once. Chunks are None for a file that failed to parse,
+        so callers can tell it apart from a file with no content.
+        """
+        if max_workers <= 1:
+            for file_path in file_paths:
+                try:
+                    chunks = self._parse_file(file_path)
+                except Exception as e:
+                    logger.error(f"Error loading {file_path}: {e}")
+                    chunks = None
+                yield file_path, chunks
+            return
+        
+        remaining = iter(file_paths)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(self.chunking_mode, self.extract_metadata)) as pool:
+            pending = {}
+            
+            def submit_next():
+                file_path = next(remaining, None)
+                if file_path is not None:
+                    pending[pool.submit(_load_file_in_worker, file_path)] = file_path
+            
+            for _ in range(2 * max_workers):
+                submit_next()
+            
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = pending.pop(future)
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        logger.error(f"Error loading {file_path}: {e}")
+                        chunks = None
+                    submit_next()
+                    yield file_path, chunks
+    
+    def ingest_directory(
+        self,
+        directory_path,
+        add_batch: Callable[[List], None],
+        batch_size: int = INGEST_BATCH_SIZE,
+        progress_callback: Optional[Callable[[int, int, str, int], None]] = None,
+        max_workers: int = INGEST_MAX_WORKERS,
+        manifest: Optional[IngestionManifest] = None,
+        delete_ids: Optional[Callable[[List[str]], None]] = None
+    ) -> Dict:
+        """Parse a directory in parallel and stream its chunks out in bounded batches.
+        
+        With a manifest, only new and modified files are parsed: the old chunks
+        of modified files and the chunks of files that disappeared are passed to
+        ``delete_ids``. A file is recorded in the manifest once all of its chunks
+        have been handed to ``add_batch``. A file that fails to parse keeps its
+        old chunks and manifest entry, so it is retried on the next run.
+        
+        Args:
+            directory_path (str): Directory to ingest recursively
+            add_batch (Callable): Receives each batch of at most ``batch_size`` chunks,
+                e.g. ``vector_store.add_documents``
+            batch_size (int): Maximum chunks per batch
+            progress_callback (Callable, optional): Called after each parsed file with
+                (files done, files to parse, file path, chunks from that file)
+            max_workers (int): Parser processes; 1 parses in this process
+            manifest (IngestionManifest, optional): Record of previously ingested files
+            delete_ids (Callable, optional): Deletes chunks by ID; required with a manifest
+        
+        Returns:
+            Dict: Counts of files, chunks, unchanged, modified and removed files,
+                plus the files that yielded no chunks and the files that failed to parse
+        """
+        files = [os.path.abspath(path) for path in self.discover_files(directory_path)]
+        report = {"files": len(files), "chunks": 0, "unchanged": 0, "modified": 0, "removed": 0, "empty_files": [],
+                  "failed_files": []}
+        
+        known = {}
+        stats = {}
+        to_parse = files
+        if manifest is not None:
+            known = manifest.entries(os.path.join(os.path.abspath(directory_path), ""))
+            to_parse = []
+            for path in files:
+                stat = os.stat(path)
+                stats[path] = (stat.st_size, stat.st_mtime)
+                entry = known.get(path)
+                if entry and (entry.size, entry.mtime) == stats[path]:
+                    report["unchanged"] += 1
+                    continue
+                content_hash = hash_file(path)
+                if entry and entry.content_hash == content_hash:
+                    # Touched but identical: refresh size/mtime so it is not hashed again
+                    manifest.record(entry._replace(size=stat.st_size, mtime=stat.st_mtime))
+                    report["unchanged"] += 1
+                    continue
+                stats[path] += (content_hash,)
+                to_parse.append(path)
+            
+            removed = [path for path in known if path not in stats]
+            for path in removed:
+                if known[path].chunk_ids:
+                    delete_ids(known[path].chunk_ids)
+                manifest.forget(path)
+            report["removed"] = len(removed)
+        
+        batch = []
+        pending = deque()  # (manifest entry, chunks queued up to and including this file)
+        queued = flushed = 0
+        
+        def flush(count):
+            nonlocal batch, flushed
+            if count:
+                add_batch(batch[:count])
+                batch = batch[count:]
+                flushed += count
+            while pending and pending[0][1] <= flushed:
+                manifest.record(pending.popleft()[0])
+        
+        for done, (file_path, chunks) in enumerate(self.iter_files(to_parse, max_workers), 1):
+            if chunks is None:
+                report["failed_files"].append(file_path)
+                if progress_callback:
+                    progress_callback(done, len(to_parse), file_path, 0)
+                continue
+            if not chunks:
+                report["empty_files"].append(file_path)
+            report["chunks"] += len(chunks)
+            
+            if manifest is not None:
+                size, mtime, content_hash = stats[file_path]
+                file_key = hashlib.sha1(f"{file_path}\0{content_hash}".encode("utf-8")).hexdigest()[:16]
+                for i, chunk in enumerate(chunks):
+                    chunk.metadata["chunk_id"] = f"{file_key}:{i}"
+                previous = known.get(file_path)
+                if previous:
+                    report["modified"] += 1
+                    if previous.chunk_ids:
+                        delete_ids(previous.chunk_ids)
+                queued += len(chunks)
+                pending.append((
+                    ManifestEntry(file_path, size, mtime, content_hash,
+                                  [chunk.metadata["chunk_id"] for chunk in chunks]),
+                    queued
+                ))
+            
+            batch.extend(chunks)
+            while len(batch) >= batch_size:
+                flush(batch_size)
+            flush(0)
+            if progress_callback:
+                progress_callback(done, len(to_parse), file_path, len(chunks))
+        
+        flush(len(batch))
+        if not files:
+            logger.warning(f"No supported documents found in {directory_path}")
+        return report
+    
+    def load_directory(self, directory_path, max_workers=INGEST_MAX_WORKERS):
+        """Load and split all supported documents from a directory into one list.
+        
+        Prefer ingest_directory for large corpora; this holds every chunk in memory.
+        """
+        all_chunks = []
+        self.ingest_directory(directory_path, all_chunks.extend, max_workers=max_workers)
+        return all_chunks
+    
+    @staticmethod
+    def annotate_metadata(documents, scan_chars=METADATA_SCAN_CHARS):
+        """Add the structured metadata of each source to all of its pages.
+        
+        Metadata the loader already set (e.g. by the caller) is kept.
+        """
+        for _, pages in groupby(documents, key=lambda document: document.metadata.get("source")):
+            pages = list(pages)
+            text, length = [], 0
+            for page in pages:
+                if length >= scan_chars:
+                    break
+                text.append(page.page_content)
+                length += len(page.page_content)
+            extracted = extract_metadata("\n".join(text)[:scan_chars])
+            for page in pages:
+                for key, value in extracted.items():
+                    page.metadata.setdefault(key, value)
+        return documents
     
     def load_file(self, file_path):
         """Load a single file based on its extension."""
         if not os.path.exists(file_path):
             raise ValueError(f"File {file_path} does not exist")
         
-        _, ext = os.path.splitext(file_path.lower())
-        
         try:
-            if ext == '.pdf':
-                loader = PyPDFLoader(file_path)
-            elif ext == '.txt':
-                loader = TextLoader(file_path)
-            elif ext == '.docx':
-                loader = Docx2txtLoader(file_path)  # Changed from DocxLoader
-            elif ext == '.csv':
-                loader = CSVLoader(file_path)
-            else:
-                # Try with unstructured for other file types
-                loader = UnstructuredFileLoader(file_path)
-            
-            documents = loader.load()
-            logger.info(f"Loaded {len(documents)} documents from {file_path}")
-            return self.text_splitter.split_documents(documents)
-        
+            return self._parse_file(file_path)
         except Exception as e:
             logger.error(f"Error loading {file_path}: {e}")
-            return []
\ No newline at end of file
+            return []
+    
+    def _parse_file(self, file_path):
+        """Parse and split one file, letting parser errors propagate."""
+        _, ext = os.path.splitext(file_path.lower())
+        
+        if ext == '.pdf':
+            loader = PyPDFLoader(file_path)
+        elif ext == '.txt':
+            loader = TextLoader(file_path)
+        elif ext == '.docx':
+            loader = Docx2txtLoader(file_path)  # Changed from DocxLoader
+        elif ext == '.csv':
+            loader = CSVLoader(file_path)
+        else:
+            # Try with unstructured for other file types
+            loader = UnstructuredFileLoader(file_path)
+        
+        documents = loader.load()
+        logger.info(f"Loaded {len(documents)} documents from {file_path}")
+        if self.extract_metadata:
+            self.annotate_metadata(documents)
+        return self.text_splitter.split_documents(documents)
\ No newline at end of file
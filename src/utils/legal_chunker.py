@@ -0,0 +1,180 @@
+"""Chunking aligned to the structure of legal documents.
+
+A single pass over the lines of a document recognizes headings such as
+"Article IV", "Section 12.3", "§ 1983", "1.2(a)" and "(iii)", and keeps a stack
+of the enclosing units. Each chunk covers whole units where they fit in
+``chunk_size`` and records its position in the document as ``section_path``
+metadata (e.g. "Article IV > Section 4.2 > (a)"). Consecutive small units of
+the same section are packed together. Units longer than ``chunk_size`` are
+split at paragraph and sentence boundaries.
+"""
+import re
+from bisect import bisect_right
+from itertools import groupby
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from .text_splitter import PARAGRAPH, SENTENCE, split_offsets
+
+_ROMAN = re.compile(r"^[ivxlc]+$", re.IGNORECASE)
+
+# Heading markers at the start of a line, most specific first
+_ARTICLE = re.compile(r"\s*(article|part|chapter|title)\s+([ivxlc]+|\d+)\b", re.IGNORECASE)
+_SECTION = re.compile(r"\s*(section|sec\.|§+)\s*(\d+[a-z]?(?:\.\d+)*)", re.IGNORECASE)
+# "1." / "1.2" / "1(a)" / "1.2(a)"; a bare "42 " is body text (e.g. "42 U.S.C.")
+_NUMBERED = re.compile(r"\s*(\d+(?:\.\d+)*)(?:\.(?=\s)|(?<=\.\d)(?=\s|\()|(?<=\d)(?=\())((?:\([a-z0-9]+\))*)",
+                       re.IGNORECASE)
+_CLAUSE = re.compile(r"\s*((?:\([a-z0-9]+\))+)(?=\s)", re.IGNORECASE)
+_CLAUSE_PART = re.compile(r"\(([a-z0-9]+)\)", re.IGNORECASE)
+
+_ARTICLE_LEVEL = 1
+_NUMBER_LEVEL = 2  # Plus one per dotted component beyond the first
+_LETTER_LEVEL = 20
+_ROMAN_LEVEL = 21
+_DIGIT_LEVEL = 22
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    path: Tuple[str, ...]
+
+
+def _clause_levels(markers: str, stack: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Levels for a run of parenthesized markers such as "(a)(ii)"."""
+    levels = []
+    for label in _CLAUSE_PART.findall(markers):
+        if label.isdigit():
+            level = _DIGIT_LEVEL
+        elif _is_roman(label.lower(), stack + levels):
+            level = _ROMAN_LEVEL
+        else:
+            level = _LETTER_LEVEL
+        levels.append((level, f"({label})"))
+    return levels
+
+
+def _is_roman(label: str, stack: List[Tuple[int, str]]) -> bool:
+    if not _ROMAN.match(label):
+        return False
+    if len(label) > 1:
+        return True
+    open_levels = {level: name.strip("()").lower() for level, name in stack}
+    if label == "i":
+        # "(i)" under a lettered clause is a numeral, unless it follows "(h)"
+        return _LETTER_LEVEL in open_levels and open_levels[_LETTER_LEVEL] != "h"
+    # "(v)" and "(x)" continue an open roman list
+    return label in ("v", "x") and _ROMAN_LEVEL in open_levels
+
+
+def parse_heading(line: str, stack: List[Tuple[int, str]]) -> List[Tuple[int, str]]:
+    """Return the (level, label) units a line opens, outermost first, or [] for body text."""
+    match = _ARTICLE.match(line)
+    if match:
+        return [(_ARTICLE_LEVEL, f"{match.group(1).title()} {match.group(2).upper()}")]
+    match = _SECTION.match(line)
+    if match:
+        number = match.group(2)
+        return [(_NUMBER_LEVEL + number.count("."), f"Section {number}")]
+    match = _NUMBERED.match(line)
+    if match and len(line) > match.end():
+        number = match.group(1)
+        opened = [(_NUMBER_LEVEL + number.count("."), number)]
+        return opened + _clause_levels(match.group(2), stack + opened)
+    match = _CLAUSE.match(line)
+    if match:
+        return _clause_levels(match.group(1), stack)
+    return []
+
+
+def iter_units(text: str) -> Iterator[_Unit]:
+    """Yield the structural units of a text, with their section paths, in one pass."""
+    stack: List[Tuple[int, str]] = []
+    unit_start = 0
+    unit_path: Tuple[str, ...] = ()
+    position = 0
+    for line in text.splitlines(keepends=True):
+        opened = parse_heading(line, stack)
+        if opened:
+            if position > unit_start:
+                yield _Unit(unit_start, position, unit_path)
+            for level, label in opened:
+                while stack and stack[-1][0] >= level:
+                    stack.pop()
+                stack.append((level, label))
+            unit_start = position
+            unit_path = tuple(label for _, label in stack)
+        position += len(line)
+    if position > unit_start:
+        yield _Unit(unit_start, position, unit_path)
+
+
+def _common_prefix(a: Tuple[str, ...], b: Tuple[str, ...]) -> Tuple[str, ...]:
+    prefix = []
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        prefix.append(x)
+    return tuple(prefix)
+
+
+class LegalChunker:
+    """Drop-in alternative to RecursiveCharacterTextSplitter for legal text."""
+
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200, path_separator: str = " > "):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.path_separator = path_separator
+
+    def split_offsets(self, text: str) -> List[Tuple[int, int, Tuple[str, ...]]]:
+        """Return (start, end, section path) for every chunk of a text."""
+        chunks = []
+        pending: Optional[_Unit] = None
+        for unit in iter_units(text):
+            if pending is not None:
+                same_section = unit.path[:1] == pending.path[:1]
+                if same_section and unit.end - pending.start <= self.chunk_size:
+                    pending = _Unit(pending.start, unit.end, _common_prefix(pending.path, unit.path))
+                    continue
+                chunks.extend(self._fit(text, pending))
+            pending = unit
+        if pending is not None:
+            chunks.extend(self._fit(text, pending))
+        return [(start, end, path) for start, end, path in chunks if text[start:end].strip()]
+
+    def _fit(self, text: str, unit: _Unit) -> List[Tuple[int, int, Tuple[str, ...]]]:
+        if unit.end - unit.start <= self.chunk_size:
+            return [unit]
+        # An oversized provision is split at paragraph, then sentence boundaries
+        offsets = split_offsets(text[unit.start:unit.end], self.chunk_size,
+                                min(self.chunk_overlap, self.chunk_size - 1), separators=(PARAGRAPH, SENTENCE))
+        return [(unit.start + int(start), unit.start + int(end), unit.path) for start, end in offsets]
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end].strip() for start, end, _ in self.split_offsets(text)]
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """Chunk documents, joining consecutive pages of one source so sections can span pages."""
+        chunks = []
+        for _, pages in groupby(documents, key=lambda document: document.metadata.get("source")):
+            pages = list(pages)
+            page_starts, parts, length = [], [], 0
+            for page in pages:
+                content = page.page_content
+                if not content.endswith("\n"):
+                    content += "\n"
+                page_starts.append(length)
+                parts.append(content)
+                length += len(content)
+            text = "".join(parts)
+
+            for start, end, path in self.split_offsets(text):
+                page = pages[bisect_right(page_starts, start) - 1]
+                metadata = dict(page.metadata)
+                metadata["start_index"] = start
+                if path:
+                    metadata["section_path"] = self.path_separator.join(path)
+                    metadata["section"] = path[-1]
+                chunks.append(Document(page_content=text[start:end].strip(), metadata=metadata))
+        return chunks
@@ -0,0 +1,242 @@
+"""Structured metadata for legal documents and the filters a query implies.
+
+``extract_metadata`` reads the opening text of a document and returns the
+fields retrieval can filter on:
+
+- ``jurisdiction``: "Federal", a US state ("New York"), or a country/bloc
+- ``court``: court level for judicial documents: "supreme", "appellate" or "trial"
+- ``doc_type``: "case", "statute", "regulation" or "contract"
+- ``effective_date`` (ISO) and ``effective_year`` (int)
+
+``infer_filters`` maps a question onto the same fields, producing a
+Chroma-style ``where`` filter (e.g. ``{"jurisdiction": "New York"}``).
+Both are conservative regex heuristics: a field is omitted rather than guessed.
+"""
+import re
+from collections import Counter
+from datetime import date
+from typing import Any, Dict, Optional
+
+_STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky",
+    "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
+    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey", "New Mexico",
+    "New York", "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania",
+    "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont",
+    "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming",
+]
+
+# Citation-style abbreviations and postal codes that are never ordinary words
+_STATE_ABBREVIATIONS = {
+    "N.Y.": "New York", "NY": "New York", "NYC": "New York",
+    "Cal.": "California", "CA": "California",
+    "Tex.": "Texas", "TX": "Texas",
+    "Fla.": "Florida", "FL": "Florida",
+    "Ill.": "Illinois", "IL": "Illinois",
+    "N.J.": "New Jersey", "NJ": "New Jersey",
+    "Mass.": "Massachusetts",
+    "Pa.": "Pennsylvania",
+    "Del.": "Delaware",
+    "Wash.": "Washington", "WA": "Washington",
+    "N.C.": "North Carolina", "NC": "North Carolina",
+    "Mich.": "Michigan",
+    "Ga.": "Georgia",
+}
+
+_COUNTRIES = {
+    "united kingdom": "United Kingdom", "uk": "United Kingdom", "england": "United Kingdom",
+    "european union": "European Union", "eu": "European Union",
+    "canada": "Canada", "australia": "Australia", "india": "India",
+}
+
+_STATE_PATTERN = re.compile(r"\b(" + "|".join(sorted(_STATES, key=len, reverse=True)) + r")\b")
+_STATE_ABBREVIATION_PATTERN = re.compile(
+    r"(?<![\w.])(" + "|".join(re.escape(a) for a in sorted(_STATE_ABBREVIATIONS, key=len, reverse=True)) + r")(?!\w)"
+)
+_COUNTRY_PATTERN = re.compile(r"\b(" + "|".join(sorted(_COUNTRIES, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+_FEDERAL_PATTERN = re.compile(
+    r"\b(\d+\s*U\.?S\.?C\.?|\d+\s*C\.?F\.?R\.?|United States (District )?Court|U\.S\. Supreme Court|"
+    r"Supreme Court of the United States|Circuit|federal law|Congress|Federal Register)\b",
+    re.IGNORECASE
+)
+# "laws of the State of New York", "State of Texas", "Supreme Court of California"
+_GOVERNING_PATTERN = re.compile(
+    r"\b(?:laws? of|State of|Commonwealth of|Court of|Courts? of the State of)\s+(?:the\s+)?(?:State of\s+)?("
+    + "|".join(_STATES) + r")\b"
+)
+
+_COURT_PATTERNS = [
+    ("supreme", re.compile(r"\bsupreme court\b", re.IGNORECASE)),
+    ("appellate", re.compile(r"\b(court of appeals?|appellate (division|court)|circuit court of appeals|"
+                             r"(first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth|eleventh|"
+                             r"d\.c\.|federal) circuit|\d+(st|nd|rd|th) cir\.)", re.IGNORECASE)),
+    ("trial", re.compile(r"\b(district court|trial court|superior court|court of common pleas|county court)\b",
+                         re.IGNORECASE)),
+]
+
+_DOC_TYPE_SIGNALS = {
+    "case": re.compile(r"\b(plaintiffs?|defendants?|appellants?|appellees?|petitioners?|respondents?|"
+                       r"opinion of the court|affirmed|reversed|remanded|we hold|v\.)", re.IGNORECASE),
+    "statute": re.compile(r"(§|\b(be it enacted|enacted|this act|public law|chapter \d+|\d+\s*u\.?s\.?c\.?|"
+                          r"code|statute))", re.IGNORECASE),
+    "regulation": re.compile(r"\b(c\.?f\.?r\.?|federal register|final rule|proposed rule|regulations?|"
+                             r"agency|promulgated)\b", re.IGNORECASE),
+    "contract": re.compile(r"\b(agreement|whereas|hereinafter|the parties|in witness whereof|"
+                           r"governing law|indemnif\w+|termination|party)\b", re.IGNORECASE),
+}
+_DOC_TYPE_MIN_SIGNALS = 3
+
+_MONTHS = {name: i for i, name in enumerate(
+    ["january", "february", "march", "april", "may", "june", "july", "august",
+     "september", "october", "november", "december"], 1)}
+_MONTH = r"(" + "|".join(_MONTHS) + r")"
+_DATE = (r"(" + _MONTH + r"\s+\d{1,2},?\s+\d{4}|\d{1,2}(?:st|nd|rd|th)?\s+(?:day of\s+)?" + _MONTH + r",?\s+\d{4}|"
+         r"\d{4}-\d{2}-\d{2}|\d{1,2}/\d{1,2}/\d{4})")
+_DATED_PATTERN = re.compile(
+    r"\b(effective(?:\s+date)?(?:\s+(?:as of|on|from))?|dated(?:\s+as of)?|decided|filed|enacted|"
+    r"adopted|entered into(?:\s+(?:as of|on))?|approved)[:\s,]+(?:this\s+)?" + _DATE,
+    re.IGNORECASE
+)
+
+
+def parse_date(text: str) -> Optional[date]:
+    """Parse "January 5, 2021", "5th day of January, 2021", "2021-01-05" or "01/05/2021"."""
+    text = text.strip().lower().replace(",", "")
+    try:
+        match = re.fullmatch(r"(\d{4})-(\d{2})-(\d{2})", text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        match = re.fullmatch(r"(\d{1,2})/(\d{1,2})/(\d{4})", text)
+        if match:
+            return date(int(match.group(3)), int(match.group(1)), int(match.group(2)))
+        match = re.fullmatch(r"([a-z]+)\s+(\d{1,2})\s+(\d{4})", text)
+        if match and match.group(1) in _MONTHS:
+            return date(int(match.group(3)), _MONTHS[match.group(1)], int(match.group(2)))
+        match = re.fullmatch(r"(\d{1,2})(?:st|nd|rd|th)?\s+(?:day of\s+)?([a-z]+)\s+(\d{4})", text)
+        if match and match.group(2) in _MONTHS:
+            return date(int(match.group(3)), _MONTHS[match.group(2)], int(match.group(1)))
+    except ValueError:  # e.g. February 30
+        return None
+    return None
+
+
+def _jurisdiction(text: str) -> Optional[str]:
+    votes = Counter()
+    for match in _GOVERNING_PATTERN.finditer(text):
+        votes[match.group(1)] += 5
+    for match in _STATE_PATTERN.finditer(text):
+        votes[match.group(1)] += 1
+    for match in _STATE_ABBREVIATION_PATTERN.finditer(text):
+        votes[_STATE_ABBREVIATIONS[match.group(1)]] += 1
+    for match in _COUNTRY_PATTERN.finditer(text):
+        # Short forms ("UK", "EU") only count in upper case
+        if len(match.group(1)) > 2 or match.group(1).isupper():
+            votes[_COUNTRIES[match.group(1).lower()]] += 1
+    votes["Federal"] += 2 * len(_FEDERAL_PATTERN.findall(text))
+    if not votes:
+        return None
+    (best, count), = votes.most_common(1)
+    return best if count >= 2 else None
+
+
+def extract_metadata(text: str) -> Dict[str, Any]:
+    """Extract jurisdiction, court, document type and effective date from a document's text.
+
+    Args:
+        text (str): The document text (its opening pages are enough)
+
+    Returns:
+        Dict[str, Any]: The fields that could be determined
+    """
+    metadata: Dict[str, Any] = {}
+    jurisdiction = _jurisdiction(text)
+    if jurisdiction:
+        metadata["jurisdiction"] = jurisdiction
+
+    signals = {kind: len(pattern.findall(text)) for kind, pattern in _DOC_TYPE_SIGNALS.items()}
+    doc_type, count = max(signals.items(), key=lambda item: item[1])
+    if count >= _DOC_TYPE_MIN_SIGNALS:
+        metadata["doc_type"] = doc_type
+
+    if metadata.get("doc_type") in (None, "case"):
+        for court, pattern in _COURT_PATTERNS:
+            if pattern.search(text[:3000]):
+                metadata["court"] = court
+                break
+
+    for match in _DATED_PATTERN.finditer(text):
+        effective = parse_date(match.group(2))
+        if effective:
+            metadata["effective_date"] = effective.isoformat()
+            metadata["effective_year"] = effective.year
+            break
+    return metadata
+
+
+_QUERY_DOC_TYPES = [
+    ("case", re.compile(r"\b(case law|cases|court decisions?|rulings?|precedents?|opinions?|held|holding)\b",
+                        re.IGNORECASE)),
+    ("statute", re.compile(r"\b(statutes?|statutory|code sections?|u\.?s\.?c\.?)\b|§", re.IGNORECASE)),
+    ("regulation", re.compile(r"\b(regulations?|regulatory rules?|c\.?f\.?r\.?)\b", re.IGNORECASE)),
+    ("contract", re.compile(r"\b(our|the|this|my) (contracts?|agreements?)\b", re.IGNORECASE)),
+]
+_QUERY_FEDERAL = re.compile(r"\b(federal(ly)?|u\.s\. supreme court|circuit|u\.?s\.?c\.?|c\.?f\.?r\.?)\b",
+                            re.IGNORECASE)
+_YEAR_BOUNDS = [
+    (re.compile(r"\b(?:since|from|as of)\s+((?:19|20)\d{2})\b", re.IGNORECASE), "$gte"),
+    (re.compile(r"\b(?:after)\s+((?:19|20)\d{2})\b", re.IGNORECASE), "$gt"),
+    (re.compile(r"\b(?:before|prior to)\s+((?:19|20)\d{2})\b", re.IGNORECASE), "$lt"),
+]
+_YEAR_RANGE = re.compile(r"\bbetween\s+((?:19|20)\d{2})\s+and\s+((?:19|20)\d{2})\b", re.IGNORECASE)
+
+
+def _query_jurisdictions(query: str):
+    found = []
+    found.extend(match.group(1) for match in _STATE_PATTERN.finditer(query.title()))
+    found.extend(_STATE_ABBREVIATIONS[match.group(1)] for match in _STATE_ABBREVIATION_PATTERN.finditer(query))
+    for match in _COUNTRY_PATTERN.finditer(query):
+        if len(match.group(1)) > 2 or match.group(1).isupper():
+            found.append(_COUNTRIES[match.group(1).lower()])
+    if _QUERY_FEDERAL.search(query):
+        found.append("Federal")
+    # "Washington" in "Washington, D.C." or "West Virginia" also matching "Virginia"
+    found = [name for name in found if not any(name != other and name in other for other in found)]
+    return list(dict.fromkeys(found))
+
+
+def infer_filters(query: str) -> Dict[str, Any]:
+    """Infer a metadata filter from a question.
+
+    Returns:
+        Dict[str, Any]: Chroma-style filter; keys are combined with AND, and a
+            field with several candidate values becomes ``{"$in": [...]}``
+    """
+    filters: Dict[str, Any] = {}
+    jurisdictions = _query_jurisdictions(query)
+    if len(jurisdictions) == 1:
+        filters["jurisdiction"] = jurisdictions[0]
+    elif jurisdictions:
+        filters["jurisdiction"] = {"$in": jurisdictions}
+
+    doc_types = [doc_type for doc_type, pattern in _QUERY_DOC_TYPES if pattern.search(query)]
+    if len(doc_types) == 1:
+        filters["doc_type"] = doc_types[0]
+
+    for court, pattern in _COURT_PATTERNS:
+        if pattern.search(query):
+            filters["court"] = court
+            break
+
+    bounds = {}
+    match = _YEAR_RANGE.search(query)
+    if match:
+        bounds = {"$gte": int(match.group(1)), "$lte": int(match.group(2))}
+    else:
+        for pattern, operator in _YEAR_BOUNDS:
+            match = pattern.search(query)
+            if match:
+                bounds[operator] = int(match.group(1))
+    if bounds:
+        filters["effective_year"] = bounds
+    return filters
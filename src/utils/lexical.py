@@ -0,0 +1,53 @@
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Sequence
+
+# Keeps citation pieces such as "1983", "u.s.c" and "§" as tokens
+_TOKEN_PATTERN = re.compile(r"§|\w+(?:\.\w+)*\.?")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have how i in is it its of on or that the "
+    "their there this to was what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed."""
+    return [
+        token.rstrip(".") or token
+        for token in _TOKEN_PATTERN.findall(text.lower())
+        if token not in STOPWORDS
+    ]
+
+
+def bm25_scores(query_tokens: Sequence[str], documents_tokens: Sequence[Sequence[str]],
+                k1: float = 1.5, b: float = 0.75) -> List[float]:
+    """Score each tokenized document against the query with Okapi BM25.
+
+    IDF is computed over ``documents_tokens`` itself, which makes this suited
+    to reranking a small candidate set rather than searching a corpus.
+    """
+    n = len(documents_tokens)
+    if n == 0:
+        return []
+    avg_length = sum(len(tokens) for tokens in documents_tokens) / n or 1.0
+    document_frequency: Dict[str, int] = Counter()
+    for tokens in documents_tokens:
+        document_frequency.update(set(tokens))
+
+    query_terms = set(query_tokens)
+    scores = []
+    for tokens in documents_tokens:
+        term_frequency = Counter(tokens)
+        length_norm = k1 * (1 - b + b * len(tokens) / avg_length)
+        score = 0.0
+        for term in query_terms:
+            tf = term_frequency.get(term)
+            if not tf:
+                continue
+            df = document_frequency[term]
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            score += idf * tf * (k1 + 1) / (tf + length_norm)
+        scores.append(score)
+    return scores
@@ -0,0 +1,29 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Hashable]], k: int = 60,
+                           weights: Optional[Sequence[float]] = None) -> List[Tuple[Hashable, float]]:
+    """Merge ranked lists of keys with reciprocal-rank fusion.
+
+    Each key scores ``sum(weight / (k + rank))`` over the lists it appears in
+    (ranks start at 1), so agreement between retrievers outweighs a single
+    high rank.
+
+    Args:
+        rankings: Ranked lists of keys, best first
+        k (int): Damping constant; larger values flatten the rank curve
+        weights: Optional per-list weights (default 1.0 each)
+
+    Returns:
+        List[Tuple[Hashable, float]]: (key, fused score) pairs, best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[Hashable, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        seen = set()
+        for rank, key in enumerate(ranking, 1):
+            if key in seen:
+                continue
+            seen.add(key)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
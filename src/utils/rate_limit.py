@@ -0,0 +1,50 @@
+import threading
+from typing import Optional
+
+from langchain_core.rate_limiters import BaseRateLimiter, InMemoryRateLimiter
+
+
+class UpstreamRateLimiter(BaseRateLimiter):
+    """Token-bucket limit on requests to one upstream API, adjustable at runtime.
+
+    One instance per upstream is shared by every client of that API (see
+    ``ComponentRegistry.get_rate_limiter``); Gemini chat models take it as
+    their ``rate_limiter`` and the search chain acquires it before each
+    Tavily request. Clients keep the same object when the rate changes, so
+    ``set_rate`` applies to clients that are already built. With no rate
+    set, acquiring never waits.
+    """
+
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None, burst: int = 1):
+        """Initialize the limiter.
+
+        Args:
+            name (str): Upstream label, e.g. "gemini" or "tavily"
+            requests_per_minute (float, optional): Sustained request rate; None for no limit
+            burst (int): Requests that may be made back to back after an idle spell
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._bucket: Optional[InMemoryRateLimiter] = None
+        self.requests_per_minute: Optional[float] = None
+        self.set_rate(requests_per_minute, burst)
+
+    def set_rate(self, requests_per_minute: Optional[float], burst: int = 1):
+        """Change the limit; None or 0 removes it."""
+        with self._lock:
+            self.requests_per_minute = requests_per_minute or None
+            self._bucket = None
+            if self.requests_per_minute:
+                self._bucket = InMemoryRateLimiter(
+                    requests_per_second=self.requests_per_minute / 60,
+                    check_every_n_seconds=min(0.1, 30 / self.requests_per_minute),
+                    max_bucket_size=max(1, burst)
+                )
+
+    def acquire(self, *, blocking: bool = True) -> bool:
+        bucket = self._bucket
+        return True if bucket is None else bucket.acquire(blocking=blocking)
+
+    async def aacquire(self, *, blocking: bool = True) -> bool:
+        bucket = self._bucket
+        return True if bucket is None else await bucket.aacquire(blocking=blocking)
@@ -0,0 +1,209 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List
+
+from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
+from tavily import AsyncTavilyClient, TavilyClient
+from ..cache.llm_cache import InMemoryLRUBackend, LLMCallCache, SQLiteBackend
+from ..cache.response_cache import ResponseCache
+from ..cache.search_cache import SearchCache
+from ..config.config import (
+    CACHE_DIR,
+    GOOGLE_API_KEY,
+    TAVILY_API_KEY,
+    TAVILY_API_BASE_URL,
+    MODEL_NAME,
+    EMBEDDING_MODEL_NAME,
+    TEMPERATURE,
+    MAX_OUTPUT_TOKENS,
+    WORKFLOW_MAX_WORKERS,
+    RETRIEVAL_MODE,
+    RESPONSE_CACHE_SIMILARITY_THRESHOLD,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_SQLITE,
+    LLM_CACHE_TTL,
+    EMBEDDING_CACHE_ENABLED,
+    GEMINI_REQUESTS_PER_MINUTE,
+    TAVILY_REQUESTS_PER_MINUTE,
+    TRACE_EXPORTER,
+    TRACE_PATH,
+)
+from .rate_limit import UpstreamRateLimiter
+from .tracing import EXPORTERS, SpanExporter, TracingCallbackHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class ComponentRegistry:
+    """Process-wide, lazily-built store of heavyweight shared resources.
+
+    Every component is built at most once per key. Builds for the same key are
+    serialized by a per-key lock, so concurrent first requests share one
+    instance instead of racing to construct duplicates.
+    """
+
+    def __init__(self):
+        self._components: Dict[Hashable, Any] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the component stored under ``key``, building it on first use."""
+        component = self._components.get(key, _MISSING)
+        if component is not _MISSING:
+            return component
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            component = self._components.get(key, _MISSING)
+            if component is _MISSING:
+                logger.info(f"Initializing shared component: {key}")
+                component = factory()
+                self._components[key] = component
+            return component
+
+    def get_llm(self, model: str = MODEL_NAME, temperature: float = TEMPERATURE) -> ChatGoogleGenerativeAI:
+        """Get the shared Gemini chat client for a model/temperature pair."""
+        return self.get_or_create(
+            ("llm", model, float(temperature)),
+            lambda: ChatGoogleGenerativeAI(
+                model=model,
+                google_api_key=GOOGLE_API_KEY,
+                temperature=temperature,
+                max_output_tokens=MAX_OUTPUT_TOKENS,
+                rate_limiter=self.get_rate_limiter("gemini"),
+                callbacks=[self.get_tracing_handler()]
+            )
+        )
+
+    def get_tracing_handler(self) -> TracingCallbackHandler:
+        """Get the callback handler that records LLM calls in the current trace."""
+        return self.get_or_create(("tracing_handler",), TracingCallbackHandler)
+
+    def get_trace_exporters(self) -> List[SpanExporter]:
+        """Get the exporters finished traces are written to (none when TRACE_EXPORTER is None)."""
+        return self.get_or_create(
+            ("trace_exporters",),
+            lambda: [EXPORTERS[TRACE_EXPORTER](TRACE_PATH)] if TRACE_EXPORTER else []
+        )
+
+    def get_rate_limiter(self, upstream: str) -> UpstreamRateLimiter:
+        """Get the request limiter shared by every client of an upstream ("gemini" or "tavily")."""
+        defaults = {"gemini": GEMINI_REQUESTS_PER_MINUTE, "tavily": TAVILY_REQUESTS_PER_MINUTE}
+        return self.get_or_create(
+            ("rate_limiter", upstream),
+            lambda: UpstreamRateLimiter(upstream, defaults.get(upstream))
+        )
+
+    def get_embeddings(self, model: str = EMBEDDING_MODEL_NAME):
+        """Get the shared embedding model, batched and backed by the on-disk vector cache."""
+        from ..data.embeddings import CachedEmbeddings, EmbeddingCache
+
+        def build():
+            embeddings = GoogleGenerativeAIEmbeddings(model=model, google_api_key=GOOGLE_API_KEY)
+            cache = EmbeddingCache() if EMBEDDING_CACHE_ENABLED else None
+            return CachedEmbeddings(embeddings, cache=cache, namespace=model)
+
+        return self.get_or_create(("embeddings", model), build)
+
+    def get_vector_store(self):
+        """Get the shared vector store handle."""
+        # Imported lazily: the vector store itself pulls its embeddings from here
+        from ..data.vector_store import VectorStore
+
+        return self.get_or_create(("vector_store",), VectorStore)
+
+    def get_lexical_index(self):
+        """Get the shared BM25 index kept alongside the vector store."""
+        from ..data.lexical_index import LexicalIndex
+
+        return self.get_or_create(("lexical_index",), LexicalIndex)
+
+    def get_deduplicator(self):
+        """Get the shared chunk deduplication index."""
+        from ..data.dedup import ChunkDeduplicator
+
+        return self.get_or_create(("deduplicator",), ChunkDeduplicator)
+
+    def get_ingest_manifest(self):
+        """Get the shared record of ingested files."""
+        from ..data.manifest import IngestionManifest
+
+        return self.get_or_create(("ingest_manifest",), IngestionManifest)
+
+    def get_tavily_client(self) -> TavilyClient:
+        """Get the shared Tavily search client."""
+        return self.get_or_create(
+            ("tavily",),
+            lambda: TavilyClient(api_key=TAVILY_API_KEY, api_base_url=TAVILY_API_BASE_URL)
+        )
+
+    def get_async_tavily_client(self) -> AsyncTavilyClient:
+        """Get the shared async Tavily search client."""
+        return self.get_or_create(
+            ("async_tavily",),
+            lambda: AsyncTavilyClient(api_key=TAVILY_API_KEY, api_base_url=TAVILY_API_BASE_URL)
+        )
+
+    def get_response_cache(self) -> ResponseCache:
+        """Get the shared on-disk response cache."""
+        def build():
+            embed_fn = None
+            if RESPONSE_CACHE_SIMILARITY_THRESHOLD is not None:
+                embed_fn = self.get_embeddings().embed_query
+            return ResponseCache(embed_fn=embed_fn)
+
+        return self.get_or_create(("response_cache",), build)
+
+    def get_search_cache(self) -> SearchCache:
+        """Get the shared on-disk web search cache."""
+        return self.get_or_create(("search_cache",), SearchCache)
+
+    def get_llm_cache(self) -> LLMCallCache:
+        """Get the shared LLM sub-call cache (no backends when LLM_CACHE_ENABLED is off)."""
+        def build():
+            backends = []
+            if LLM_CACHE_ENABLED:
+                backends.append(InMemoryLRUBackend(max_entries=LLM_CACHE_MAX_ENTRIES))
+                if LLM_CACHE_SQLITE:
+                    backends.append(SQLiteBackend(CACHE_DIR / "llm_calls.sqlite", ttl=LLM_CACHE_TTL))
+            return LLMCallCache(backends)
+
+        return self.get_or_create(("llm_cache",), build)
+
+    def get_executor(self, name: str = "workflow", max_workers: int = WORKFLOW_MAX_WORKERS) -> ThreadPoolExecutor:
+        """Get a shared thread pool for running blocking calls in parallel."""
+        return self.get_or_create(
+            ("executor", name),
+            lambda: ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        )
+
+    def warm_up(self):
+        """Eagerly build the default components so the first query pays no setup cost."""
+        self.get_vector_store()
+        if RETRIEVAL_MODE == "hybrid":
+            self.get_lexical_index()
+        self.get_tavily_client()
+        for temperature in (0, 0.2, TEMPERATURE):
+            self.get_llm(temperature=temperature)
+
+    def reset(self):
+        """Drop every cached component (mainly for tests)."""
+        with self._lock:
+            self._components.clear()
+            self._key_locks.clear()
+
+
+_registry = ComponentRegistry()
+
+
+def get_registry() -> ComponentRegistry:
+    """Return the process-wide component registry."""
+    return _registry
@@ -1,3 +1,29 @@
+import mmap
+import re
+from bisect import bisect_right
+from typing import Iterator, Optional, Sequence, Union
+
+import numpy as np
+
+# Boundary kinds, in order of preference when choosing where a chunk ends
+CLAUSE = "clause"
+PARAGRAPH = "paragraph"
+SENTENCE = "sentence"
+DEFAULT_SEPARATORS = (CLAUSE, PARAGRAPH, SENTENCE)
+
+# Clause numbering at the start of a line: "1.", "1.2", "1.2(a)", "(a)", "(iv)"
+_CLAUSE_NUMBER = r"[ \t]*(?:\d+(?:\.\d+)*\.?(?:\([a-z0-9]+\))*|\([a-z0-9]+\))[ \t]"
+_CLAUSE_NUMBER_TEXT = re.compile(_CLAUSE_NUMBER, re.IGNORECASE)
+_CLAUSE_NUMBER_BYTES = re.compile(_CLAUSE_NUMBER.encode("ascii"), re.IGNORECASE)
+
+_NEWLINE = ord("\n")
+_SENTENCE_END = np.array([ord("."), ord("?"), ord("!")], dtype=np.uint32)
+_WHITESPACE = np.array([ord(" "), ord("\n"), ord("\t"), ord("\r")], dtype=np.uint32)
+_DIGITS_AND_PAREN = np.array([ord(c) for c in "0123456789( \t"], dtype=np.uint32)
+
+TextSource = Union[str, bytes, bytearray, mmap.mmap]
+
+
 def split_text(text, chunk_size=1000, overlap=100):
     """
     Splits the input text into manageable chunks.
@@ -10,12 +36,191 @@ def split_text(text, chunk_size=1000, overlap=100):
     Returns:
     - List[str]: A list of text chunks.
     """
-    chunks = []
+    return list(TextChunks(text, split_offsets(text, chunk_size, overlap, separators=None)))
+
+
+def _code_units(text: TextSource) -> np.ndarray:
+    """View the text as an integer array indexed like the text itself."""
+    if isinstance(text, str):
+        if text.isascii():
+            return np.frombuffer(text.encode("ascii"), dtype=np.uint8)
+        return np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+    # bytes, bytearray and mmap are viewed in place
+    return np.frombuffer(text, dtype=np.uint8)
+
+
+def find_boundaries(text: TextSource, block_size: int = 1 << 24) -> dict:
+    """
+    Finds the positions where a chunk may end, by kind.
+
+    Positions are exclusive end offsets (the next chunk may start there).
+    The text is scanned in blocks so temporary masks stay small even for
+    memory-mapped files of several gigabytes.
+
+    Parameters:
+    - text (str | bytes | mmap): The text to scan.
+    - block_size (int): Code units scanned per block.
+
+    Returns:
+    - dict: Sorted int64 arrays keyed by CLAUSE, PARAGRAPH and SENTENCE.
+    """
+    units = _code_units(text)
+    clause_number = _CLAUSE_NUMBER_TEXT if isinstance(text, str) else _CLAUSE_NUMBER_BYTES
+    n = len(units)
+    found = {CLAUSE: [], PARAGRAPH: [], SENTENCE: []}
+
+    for begin in range(0, n, block_size):
+        # One unit of lookahead so pairs spanning the block edge are seen
+        block = units[begin:min(begin + block_size + 1, n)]
+        inner = min(block_size, n - begin)
+
+        newlines = np.flatnonzero(block[:inner] == _NEWLINE)
+        following = newlines + 1 < len(block)
+        newlines, nexts = newlines[following], block[newlines[following] + 1]
+
+        found[PARAGRAPH].append(begin + newlines[nexts == _NEWLINE] + 2)
+
+        line_starts = newlines[np.isin(nexts, _DIGITS_AND_PAREN)] + 1
+        # Only lines that start with a digit, "(" or indentation need the regex check
+        line_starts = np.array(
+            [pos for pos in line_starts if clause_number.match(text, begin + pos)], dtype=np.int64
+        )
+        found[CLAUSE].append(begin + line_starts)
+
+        ends = np.flatnonzero(np.isin(block[:inner], _SENTENCE_END))
+        ends = ends[ends + 1 < len(block)]
+        found[SENTENCE].append(begin + ends[np.isin(block[ends + 1], _WHITESPACE)] + 1)
+
+    return {
+        kind: np.concatenate(parts).astype(np.int64) if parts else np.empty(0, dtype=np.int64)
+        for kind, parts in found.items()
+    }
+
+
+def split_offsets(text: TextSource, chunk_size: int = 1000, overlap: int = 100,
+                  separators: Optional[Sequence[str]] = DEFAULT_SEPARATORS) -> np.ndarray:
+    """
+    Computes chunk boundaries without copying any text.
+
+    With ``separators=None`` the chunks are exactly those of the original
+    ``split_text``. Otherwise each chunk ends at the last boundary of the most
+    preferred kind that falls in the second half of its window, and at a hard
+    cut when there is none. Consecutive chunks overlap by ``overlap`` units.
+
+    Parameters:
+    - text (str | bytes | mmap): The text to split. Offsets count characters
+      for str and bytes otherwise (cuts never split a UTF-8 sequence).
+    - chunk_size (int): The maximum size of each chunk.
+    - overlap (int): The number of overlapping units between chunks.
+    - separators (Sequence[str] | None): Boundary kinds in order of preference.
+
+    Returns:
+    - np.ndarray: An (n, 2) int64 array of [start, end) offsets.
+    """
+    if not 0 <= overlap < chunk_size:
+        raise ValueError("overlap must be non-negative and smaller than chunk_size")
+    n = len(text)
+    if n == 0:
+        return np.empty((0, 2), dtype=np.int64)
+
+    is_bytes = not isinstance(text, str)
+    units = _code_units(text) if is_bytes else None
+
+    if not separators:
+        starts = np.arange(0, n, chunk_size - overlap, dtype=np.int64)
+        offsets = np.stack([starts, np.minimum(starts + chunk_size, n)], axis=1)
+        if is_bytes:
+            offsets = _snap_utf8(units, offsets)
+        return offsets
+
+    boundaries = find_boundaries(text)
+    # bisect on lists is several times faster than per-chunk np.searchsorted calls
+    levels = [boundaries[kind].tolist() for kind in separators]
+    min_fill = chunk_size // 2
+    offsets = []
     start = 0
+    while start < n:
+        limit = min(start + chunk_size, n)
+        end = limit
+        if limit < n:
+            for bounds in levels:
+                i = bisect_right(bounds, limit) - 1
+                if i >= 0 and bounds[i] > start + min_fill:
+                    end = bounds[i]
+                    break
+            if is_bytes and end == limit:
+                end = _utf8_floor(units, end, start + 1)
+        offsets.append((start, end))
+        if end >= n:
+            break
+        start = max(end - overlap, start + 1)
+        if is_bytes:
+            start = _utf8_floor(units, start, 0)
+
+    return np.array(offsets, dtype=np.int64).reshape(-1, 2)
+
+
+def _utf8_floor(units: np.ndarray, position: int, lowest: int) -> int:
+    """Move a byte offset back off UTF-8 continuation bytes."""
+    while position > lowest and position < len(units) and units[position] & 0xC0 == 0x80:
+        position -= 1
+    return position
+
+
+def _snap_utf8(units: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    n = len(units)
+    for _ in range(3):  # A UTF-8 sequence has at most three continuation bytes
+        inner = offsets < n
+        positions = np.where(inner, offsets, 0)
+        continuation = inner & ((units[positions] & 0xC0) == 0x80)
+        if not continuation.any():
+            break
+        offsets = offsets - continuation
+    return offsets
+
+
+class TextChunks:
+    """A lazy sequence of chunks: text is only sliced (and decoded) when accessed."""
+
+    def __init__(self, text: TextSource, offsets: np.ndarray, encoding: str = "utf-8"):
+        self.text = text
+        self.offsets = offsets
+        self.encoding = encoding
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index]
+        piece = self.text[int(start):int(end)]
+        if not isinstance(piece, str):
+            piece = bytes(piece).decode(self.encoding, errors="replace")
+        return piece
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self.offsets)):
+            yield self[index]
+
+
+class MappedTextFile(TextChunks):
+    """Chunks of a memory-mapped text file; use as a context manager to unmap it."""
+
+    def __init__(self, path, chunk_size: int = 1000, overlap: int = 100,
+                 separators: Optional[Sequence[str]] = DEFAULT_SEPARATORS, encoding: str = "utf-8"):
+        self._file = open(path, "rb")
+        try:
+            mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # Empty files cannot be mapped
+            mapped = b""
+        super().__init__(mapped, split_offsets(mapped, chunk_size, overlap, separators), encoding)
+
+    def close(self):
+        if isinstance(self.text, mmap.mmap):
+            self.text.close()
+        self._file.close()
 
-    while start < len(text):
-        end = min(start + chunk_size, len(text))
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
+    def __enter__(self) -> "MappedTextFile":
+        return self
 
-    return chunks
\ No newline at end of file
+    def __exit__(self, *exc_info):
+        self.close()
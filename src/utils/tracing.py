@@ -0,0 +1,327 @@
+"""Per-query spans for latency, token and cache accounting.
+
+A trace covers one query. Inside it, ``span`` times a block of work (a graph
+node, a Tavily request, a vector search) and records its attributes, such as
+token counts and cache hits, plus any error. Spans nest through context
+variables. That carries them across ``await`` and into asyncio tasks; work
+handed to a thread pool must be submitted with ``submit_in_context`` to stay
+in the trace. Outside a trace, ``span`` does nothing, so instrumented code
+costs next to nothing when it runs on its own.
+
+LLM calls are traced by ``TracingCallbackHandler``, which the registry
+attaches to every Gemini client; it reads token usage from the response.
+
+When a trace ends it is handed to the configured exporters:
+
+- ``JsonlSpanExporter`` appends one JSON object per span.
+- ``OTelFileExporter`` appends one OTLP/JSON ``ExportTraceServiceRequest`` per
+  trace, the format read by the OpenTelemetry Collector's ``otlpjsonfile``
+  receiver.
+"""
+import asyncio
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+logger = logging.getLogger(__name__)
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    """One timed unit of work within a trace."""
+
+    def __init__(self, trace_id: str, name: str, kind: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_time = time.time()
+        self._started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        """Add or overwrite attributes."""
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.duration_ms is not None:
+            return
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "duration_ms": None if self.duration_ms is None else round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """The spans of one query, rooted at a span covering the whole query."""
+
+    def __init__(self, name: str, **attributes):
+        self.trace_id = os.urandom(16).hex()
+        self._lock = threading.Lock()
+        self.root = Span(self.trace_id, name, "query", attributes=attributes)
+        self.spans: List[Span] = [self.root]
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span] = None, **attributes) -> Span:
+        span = Span(self.trace_id, name, kind, (parent or self.root).span_id, attributes)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @property
+    def duration(self) -> float:
+        """Seconds the query took (so far, while the trace is open)."""
+        if self.root.duration_ms is not None:
+            return self.root.duration_ms / 1000
+        return time.perf_counter() - self.root._started
+
+    def token_usage(self) -> Dict[str, int]:
+        """Input and output tokens summed over the LLM spans."""
+        usage = {"input": 0, "output": 0}
+        for span in self.spans:
+            if span.kind == "llm":
+                usage["input"] += span.attributes.get("input_tokens") or 0
+                usage["output"] += span.attributes.get("output_tokens") or 0
+        return usage
+
+    def waterfall(self) -> List[Dict[str, Any]]:
+        """Spans in start order with their offset from the query start and nesting depth."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span._started)
+        depths = {}
+        rows = []
+        for span in spans:
+            depth = depths[span.span_id] = depths.get(span.parent_id, -1) + 1
+            duration = span.duration_ms if span.duration_ms is not None else self.duration * 1000
+            rows.append({
+                "name": span.name,
+                "kind": span.kind,
+                "depth": depth,
+                "start_ms": round((span._started - self.root._started) * 1000, 3),
+                "duration_ms": round(duration, 3),
+                "attributes": span.attributes,
+                "error": span.error,
+            })
+        return rows
+
+
+@contextmanager
+def trace(name: str, exporters: Sequence["SpanExporter"] = (), **attributes) -> Iterator[Trace]:
+    """Open a trace for one query; it is exported to ``exporters`` when the block exits."""
+    current = Trace(name, **attributes)
+    trace_token = _current_trace.set(current)
+    span_token = _current_span.set(current.root)
+    try:
+        yield current
+    except BaseException as e:
+        current.root.end(error=e)
+        raise
+    finally:
+        current.root.end()
+        try:
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+        except ValueError:
+            pass  # A generator closed from another context (e.g. by the garbage collector)
+        for exporter in exporters:
+            try:
+                exporter.export(current)
+            except Exception as e:
+                logger.warning(f"Trace export failed: {str(e)}")
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Time the enclosed block as a child of the current span (no-op outside a trace)."""
+    current = _current_trace.get()
+    if current is None:
+        yield _NOOP_SPAN
+        return
+    child = current.start_span(name, kind, _current_span.get(), **attributes)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.end(error=e)
+        raise
+    finally:
+        child.end()
+        _current_span.reset(token)
+
+
+def traced(fn: Callable, name: str, kind: str = "node") -> Callable:
+    """Wrap a sync or async function so every call is recorded as a span."""
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(*args, **kwargs):
+            with span(name, kind):
+                return await fn(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with span(name, kind):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+def submit_in_context(executor: Executor, fn: Callable, *args, **kwargs) -> Future:
+    """``executor.submit`` that runs ``fn`` inside the caller's trace."""
+    return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records an "llm" span per chat model call, with its token usage."""
+
+    run_inline = True  # Keep callbacks in the caller's context, where the current span lives
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+
+    def _start(self, serialized: Optional[Dict[str, Any]], run_id: UUID, **kwargs):
+        current = _current_trace.get()
+        if current is None:
+            return
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name", "llm")
+        self._spans[run_id] = current.start_span(f"llm.{model}", "llm", _current_span.get())
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs):
+        self._start(serialized, run_id, **kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs):
+        self._start(serialized, run_id, **kwargs)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs):
+        llm_span = self._spans.pop(run_id, None)
+        if llm_span is None:
+            return
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage is None:
+            usage = (response.llm_output or {}).get("usage_metadata")
+        if usage:
+            llm_span.set(input_tokens=usage.get("input_tokens"), output_tokens=usage.get("output_tokens"))
+        llm_span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        llm_span = self._spans.pop(run_id, None)
+        if llm_span is not None:
+            llm_span.end(error=error)
+
+
+class SpanExporter:
+    """Appends finished traces to a file; subclasses choose the record format."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def records(self, finished: Trace) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def export(self, finished: Trace):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in self.records(finished))
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+
+class JsonlSpanExporter(SpanExporter):
+    """One JSON object per span."""
+
+    def records(self, finished: Trace) -> List[Dict[str, Any]]:
+        return [span.to_dict() for span in finished.spans]
+
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otel_value(item) for item in value]}}
+    return {"stringValue": str(value)}
+
+
+class OTelFileExporter(SpanExporter):
+    """One OTLP/JSON ExportTraceServiceRequest per trace."""
+
+    service_name = "legal-rag-system"
+
+    def records(self, finished: Trace) -> List[Dict[str, Any]]:
+        spans = []
+        for span in finished.spans:
+            start = int(span.start_time * 1e9)
+            record = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(start),
+                "endTimeUnixNano": str(start + int((span.duration_ms or 0) * 1e6)),
+                "attributes": [{"key": "span.kind", "value": _otel_value(span.kind)}] + [
+                    {"key": key, "value": _otel_value(value)}
+                    for key, value in span.attributes.items() if value is not None
+                ],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                record["parentSpanId"] = span.parent_id
+            spans.append(record)
+        return [{
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }]
+        }]
+
+
+EXPORTERS = {
+    "jsonl": JsonlSpanExporter,
+    "otel": OTelFileExporter,
+}
@@ -0,0 +1,83 @@
+"""A local stand-in for the Tavily search API.
+
+Point a client at it with ``TavilyClient(api_key="test", api_base_url=server.url)``
+(or set ``TAVILY_API_BASE_URL``). Every request body is recorded, and responses
+can be delayed to exercise timeouts and request coalescing.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeTavilyServer:
+    """Threaded HTTP server answering POST /search with deterministic results."""
+
+    def __init__(self, delay: float = 0.0, available_results: int = 10, ignore_max_results: bool = False):
+        self.delay = delay
+        self.available_results = available_results
+        self.ignore_max_results = ignore_max_results
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake._lock:
+                    fake.requests.append(body)
+                if fake.delay:
+                    time.sleep(fake.delay)
+                payload = json.dumps(fake.response(body)).encode("utf-8")
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):  # The client timed out
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def response(self, body: dict) -> dict:
+        count = self.available_results
+        if not self.ignore_max_results:
+            count = min(count, body.get("max_results") or 5)
+        query = body.get("query", "")
+        return {
+            "query": query,
+            "results": [
+                {"title": f"Result {i} for {query}", "url": f"https://example.com/{i}",
+                 "content": f"Content {i} about {query}.", "score": 1.0 - i / 100}
+                for i in range(count)
+            ],
+            "response_time": self.delay,
+        }
+
+    def start(self) -> "FakeTavilyServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeTavilyServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
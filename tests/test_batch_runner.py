@@ -0,0 +1,135 @@
+import unittest
+import asyncio
+import json
+import tempfile
+import time
+import sys
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.batch_runner import BatchQuery, BatchRunner, completed_ids, load_queries
+from src.utils.rate_limit import UpstreamRateLimiter
+from src.utils.registry import get_registry
+
+
+class FakeWorkflow:
+    """Answers after a short delay; fails the first ``failures[query]`` attempts of a query."""
+
+    def __init__(self, delay=0.05, failures=None):
+        self.delay = delay
+        self.failures = dict(failures or {})
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def aprocess_query(self, query, chat_history=None):
+        self.calls.append(query)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        if self.failures.get(query, 0) > 0:
+            self.failures[query] -= 1
+            return {"answer": "An error occurred: 429 quota exceeded", "error": "429 quota exceeded"}
+        return {"answer": f"Answer to {query}", "references": ["Case 1"], "confidence": 0.8,
+                "search_performed": False, "llm_calls": 3, "search_calls": 0, "timed_out": [],
+                "error": None, "cache_hit": False}
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class TestBatchRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.dir = Path(self.temp_dir.name)
+        get_registry().reset()
+        self.addCleanup(get_registry().reset)
+
+    def test_load_jsonl_and_csv(self):
+        jsonl = self.dir / "queries.jsonl"
+        jsonl.write_text('{"id": "a", "query": "Is a verbal lease binding?"}\n\n"What is adverse possession?"\n'
+                         '{"query": "  "}\n', encoding="utf-8")
+        self.assertEqual(load_queries(jsonl), [BatchQuery("a", "Is a verbal lease binding?"),
+                                               BatchQuery("3", "What is adverse possession?")])
+
+        csv_path = self.dir / "queries.csv"
+        csv_path.write_text('id,query\nq1,"Statute of frauds, in brief"\n,Rule against perpetuities\n',
+                            encoding="utf-8")
+        self.assertEqual(load_queries(csv_path), [BatchQuery("q1", "Statute of frauds, in brief"),
+                                                  BatchQuery("2", "Rule against perpetuities")])
+
+        jsonl.write_text('{"id": 1, "query": "A"}\n{"id": 1, "query": "B"}\n', encoding="utf-8")
+        with self.assertRaises(ValueError):
+            load_queries(jsonl)
+
+    def test_bounded_concurrency_retries_and_streamed_output(self):
+        workflow = FakeWorkflow(failures={"Q2": 2, "Q3": 5})
+        runner = BatchRunner(workflow, concurrency=2, max_retries=2, backoff=0.01)
+        queries = [BatchQuery(str(i), f"Q{i}") for i in range(1, 6)]
+        output = self.dir / "results.jsonl"
+
+        summary = runner.run(queries, output)
+
+        self.assertEqual(workflow.max_in_flight, 2)
+        self.assertEqual((summary["succeeded"], summary["failed"]), (4, 1))
+        records = {record["id"]: record for record in _read(output)}
+        self.assertEqual(records["1"]["answer"], "Answer to Q1")
+        self.assertEqual(records["1"]["references"], ["Case 1"])
+        self.assertEqual(records["2"]["status"], "ok")
+        self.assertEqual(records["2"]["attempts"], 3)
+        self.assertEqual(records["3"]["status"], "error")
+        self.assertEqual(records["3"]["attempts"], 3)
+        self.assertGreater(records["1"]["processing_time"], 0)
+
+    def test_resume_skips_answered_queries(self):
+        output = self.dir / "results.jsonl"
+        output.write_text(
+            json.dumps({"id": "1", "status": "ok", "answer": "Earlier answer"}) + "\n"
+            + json.dumps({"id": "2", "status": "error"}) + "\n"
+            + '{"id": "3", "sta',  # Cut short by a crash
+            encoding="utf-8"
+        )
+        self.assertEqual(completed_ids(output), {"1"})
+
+        workflow = FakeWorkflow(delay=0)
+        queries = [BatchQuery(str(i), f"Q{i}") for i in range(1, 4)]
+        summary = BatchRunner(workflow, max_retries=0).run(queries, output)
+
+        self.assertEqual(sorted(workflow.calls), ["Q2", "Q3"])
+        self.assertEqual(summary["skipped"], 1)
+        records = _read(output)
+        self.assertEqual([record["id"] for record in records][:2], ["1", "2"])
+        self.assertEqual(completed_ids(output), {"1", "2", "3"})
+
+    def test_rate_limits_shared_per_upstream(self):
+        limiter = UpstreamRateLimiter("tavily", requests_per_minute=600)  # One request per 0.1s
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+
+        limiter.set_rate(None)
+        started = time.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        BatchRunner(FakeWorkflow(), gemini_rpm=120)
+        registry = get_registry()
+        self.assertEqual(registry.get_rate_limiter("gemini").requests_per_minute, 120)
+        with patch('src.utils.registry.ChatGoogleGenerativeAI') as mock_llm:
+            registry.get_llm(temperature=0)
+        self.assertIs(mock_llm.call_args.kwargs["rate_limiter"], registry.get_rate_limiter("gemini"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import sys
+import unittest
+from pathlib import Path
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.bench_suite import latency_summary, run_suites
+from benchmarks.compare import compare
+from benchmarks.corpus import synthetic_chunks
+from benchmarks.fakes import FakeGeminiChatModel, HashingEmbeddings
+from src.utils.registry import get_registry
+
+
+class TestBenchmarkFakes(unittest.TestCase):
+
+    def test_fake_gemini_is_deterministic_and_reports_usage(self):
+        llm = FakeGeminiChatModel(output_tokens=30)
+        first = llm.invoke([HumanMessage(content="Does this need search?")])
+        second = llm.invoke([HumanMessage(content="Does this need search?")])
+
+        self.assertEqual(first.content, second.content)
+        self.assertRegex(first.content.splitlines()[0], r"(NEEDS_SEARCH|NO_SEARCH)$")
+        self.assertEqual(first.usage_metadata["output_tokens"], 30)
+        self.assertEqual("".join(chunk.content for chunk in llm.stream("Does this need search?")), first.content)
+
+    def test_hashing_embeddings_rank_similar_text_closer(self):
+        embeddings = HashingEmbeddings(dimensions=64)
+        query, near, far = embeddings.embed_documents(
+            ["breach of contract damages", "damages for breach of contract", "zoning variance hearing"]
+        )
+        dot = lambda a, b: sum(x * y for x, y in zip(a, b))
+        self.assertGreater(dot(query, near), dot(query, far))
+
+    def test_synthetic_chunks_are_reproducible(self):
+        first = [chunk.page_content for chunk in synthetic_chunks(5, seed=3)]
+        self.assertEqual(first, [chunk.page_content for chunk in synthetic_chunks(5, seed=3)])
+        self.assertIn("jurisdiction", next(synthetic_chunks(1)).metadata)
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(get_registry().reset)
+
+    def test_suites_report_latency_percentiles(self):
+        options = {"chunks": 60, "queries": 6, "concurrency": 2, "workflow_chunks": 60, "llm_latency": 0.0,
+                   "token_latency": 0.0, "output_tokens": 16, "tavily_latency": 0.0, "dimensions": 32, "seed": 0}
+        results = run_suites(["workflow", "retrieval", "splitters"], options, isolate=False)
+
+        self.assertEqual(results["workflow"]["latency"]["count"], 6)
+        self.assertEqual(results["workflow"]["latency"]["errors"], 0)
+        self.assertGreater(results["workflow"]["output_tokens"], 0)
+        self.assertEqual(results["retrieval"]["index"]["chunks"], 60)
+        for key in ("p50_ms", "p95_ms", "p99_ms", "qps"):
+            self.assertIn(key, results["retrieval"]["latency"])
+        self.assertGreater(results["splitters"]["legal_chunker"]["chunks"], 0)
+        self.assertGreater(results["splitters"]["peak_rss_mb"], 0)
+
+    def test_compare_flags_regressions(self):
+        base = {"results": {"retrieval": {"latency": latency_summary([0.010, 0.012], 0.022)}}}
+        new = {"results": {"retrieval": {"latency": latency_summary([0.020, 0.024], 0.044)}}}
+        rows = {row[0]: row for row in compare(base, new, threshold=0.1)}
+
+        self.assertTrue(rows["retrieval.latency.p50_ms"][4])
+        self.assertTrue(rows["retrieval.latency.qps"][4])
+        self.assertNotIn("retrieval.latency.count", rows)
+
+    def test_compare_ignores_setup_metrics(self):
+        base = {"results": {"loader": {"setup_seconds": 1.0, "seconds": 1.0},
+                            "retrieval": {"index": {"seconds": 1.0, "chunks_per_second": 100.0}}}}
+        new = {"results": {"loader": {"setup_seconds": 3.0, "seconds": 1.0},
+                           "retrieval": {"index": {"seconds": 3.0, "chunks_per_second": 30.0}}}}
+        rows = {row[0]: row for row in compare(base, new, threshold=0.1)}
+
+        self.assertEqual(set(rows), {"loader.seconds"})
+        self.assertFalse(rows["loader.seconds"][4])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,307 @@
+import unittest
+import asyncio
+import tempfile
+import time
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest.mock import patch
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.cache.corpus_version import get_corpus_version, bump_corpus_version
+from src.cache.response_cache import ResponseCache, normalize_query
+from src.cache.llm_cache import LLMCallCache, InMemoryLRUBackend, SQLiteBackend
+from src.cache.search_cache import SearchCache
+from src.chains.search_chain import SearchChain
+from src.data.embeddings import CachedEmbeddings, EmbeddingCache
+from src.utils.registry import get_registry
+from tests.fake_tavily import FakeTavilyServer
+from tavily import AsyncTavilyClient, TavilyClient
+from src.prompts.legal_prompts import SEARCH_DETERMINATION_PROMPT
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import RunnableLambda
+
+RESPONSE = {"answer": "Six years.", "references": [], "confidence": 0.8, "search_performed": False}
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.version_path = Path(self.temp_dir.name) / "corpus_version"
+
+    def _cache(self, **kwargs):
+        return ResponseCache(
+            path=Path(self.temp_dir.name) / "responses.sqlite",
+            corpus_version_fn=lambda: get_corpus_version(self.version_path),
+            **kwargs
+        )
+
+    def test_normalized_exact_hit(self):
+        cache = self._cache()
+        cache.put("Statute of limitations for breach of contract in NY?", RESPONSE)
+
+        self.assertEqual(
+            normalize_query("  statute of LIMITATIONS for breach of contract in ny "),
+            "statute of limitations for breach of contract in ny"
+        )
+        self.assertEqual(cache.get("statute of  limitations for breach of contract in ny"), RESPONSE)
+        self.assertIsNone(cache.get("statute of limitations for fraud in ny"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_persists_across_instances(self):
+        self._cache().put("What is consideration?", RESPONSE)
+        self.assertEqual(self._cache().get("what is consideration"), RESPONSE)
+
+    def test_corpus_change_invalidates(self):
+        cache = self._cache()
+        cache.put("What is consideration?", RESPONSE)
+        bump_corpus_version(self.version_path)
+
+        self.assertIsNone(cache.get("What is consideration?"))
+        self.assertEqual(len(cache), 0)
+
+    def test_ttl_expiry(self):
+        cache = self._cache(ttl=0.05)
+        cache.put("What is consideration?", RESPONSE)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("What is consideration?"))
+
+    def test_lru_eviction(self):
+        cache = self._cache(max_entries=2)
+        cache.put("first", RESPONSE)
+        time.sleep(0.01)
+        cache.put("second", RESPONSE)
+        time.sleep(0.01)
+        cache.get("first")
+        time.sleep(0.01)
+        cache.put("third", RESPONSE)
+
+        self.assertIsNotNone(cache.get("first"))
+        self.assertIsNone(cache.get("second"))
+        self.assertIsNotNone(cache.get("third"))
+
+    def test_near_duplicate_hit(self):
+        vectors = {
+            "what is the statute of limitations for breach of contract": [1.0, 0.0, 0.1],
+            "statute of limitations for a breach of contract claim": [1.0, 0.0, 0.12],
+            "how do i register a trademark": [0.0, 1.0, 0.0],
+        }
+        cache = self._cache(embed_fn=vectors.__getitem__, similarity_threshold=0.95)
+        cache.put("What is the statute of limitations for breach of contract?", RESPONSE)
+
+        self.assertEqual(cache.get("Statute of limitations for a breach of contract claim"), RESPONSE)
+        self.assertIsNone(cache.get("How do I register a trademark?"))
+
+
+
+class TestLLMCallCache(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.llm = RunnableLambda(lambda prompt_value: self.calls.append(prompt_value) or "NEEDS_SEARCH")
+
+    def test_memoizes_by_rendered_prompt(self):
+        cache = LLMCallCache([InMemoryLRUBackend(max_entries=10)])
+        chain = cache.wrap(SEARCH_DETERMINATION_PROMPT, self.llm, namespace="search_determination")
+
+        self.assertEqual(chain.invoke({"query": "Latest GDPR fines?"}), "NEEDS_SEARCH")
+        self.assertEqual(chain.invoke({"query": "Latest GDPR fines?"}), "NEEDS_SEARCH")
+        chain.invoke({"query": "What is a tort?"})
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(cache.stats()["search_determination"], {"hits": 1, "misses": 2})
+
+    def test_async_path_shares_entries(self):
+        cache = LLMCallCache([InMemoryLRUBackend()])
+        chain = cache.wrap(SEARCH_DETERMINATION_PROMPT, self.llm)
+
+        chain.invoke({"query": "Latest GDPR fines?"})
+        self.assertEqual(asyncio.run(chain.ainvoke({"query": "Latest GDPR fines?"})), "NEEDS_SEARCH")
+        self.assertEqual(len(self.calls), 1)
+
+    def test_lru_backend_evicts(self):
+        backend = InMemoryLRUBackend(max_entries=2)
+        backend.set("a", 1)
+        backend.set("b", 2)
+        backend.get("a")
+        backend.set("c", 3)
+        self.assertEqual(backend.get("a"), 1)
+        self.assertIsNone(backend.get("b"))
+
+    def test_sqlite_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "llm_calls.sqlite"
+            first = LLMCallCache([InMemoryLRUBackend(), SQLiteBackend(path)])
+            first.wrap(SEARCH_DETERMINATION_PROMPT, self.llm).invoke({"query": "Latest GDPR fines?"})
+
+            second = LLMCallCache([InMemoryLRUBackend(), SQLiteBackend(path)])
+            second.wrap(SEARCH_DETERMINATION_PROMPT, self.llm).invoke({"query": "Latest GDPR fines?"})
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(second.stats()["default"]["hits"], 1)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic two-dimensional vectors; records each request's batch."""
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.batches.append([text])
+        return [float(len(text)), 0.0]
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.fake = FakeEmbeddings()
+
+    def _embeddings(self, **kwargs):
+        return CachedEmbeddings(self.fake, EmbeddingCache(Path(self.temp_dir.name)), namespace="fake", **kwargs)
+
+    def test_batches_and_skips_cached_texts(self):
+        embeddings = self._embeddings(batch_size=2, max_concurrency=2)
+        texts = ["a", "bb", "ccc", "bb", "dddd", "eeeee"]
+
+        vectors = embeddings.embed_documents(texts)
+        self.assertEqual(vectors[1], [2.0, 1.0])
+        self.assertEqual(vectors[1], vectors[3])
+        self.assertEqual(sorted(len(batch) for batch in self.fake.batches), [1, 2, 2])
+
+        self.fake.batches.clear()
+        self.assertEqual(embeddings.embed_documents(texts + ["ffffff"]), vectors + [[6.0, 1.0]])
+        self.assertEqual(self.fake.batches, [["ffffff"]])
+
+    def test_vectors_persist_across_instances(self):
+        self._embeddings().embed_documents(["Section 1983"])
+        self._embeddings().embed_query("statute of limitations")
+        self.fake.batches.clear()
+
+        reopened = self._embeddings()
+        self.assertEqual(reopened.embed_documents(["Section 1983"]), [[12.0, 1.0]])
+        self.assertEqual(reopened.embed_query("statute of limitations"), [22.0, 0.0])
+        self.assertEqual(self.fake.batches, [])
+        self.assertEqual(reopened.stats()["hits"], 2)
+
+
+class TestSearchCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = Path(self.temp_dir.name) / "searches.sqlite"
+
+    def _chain(self, server, cache=None, **kwargs):
+        """A SearchChain talking to the fake server, built outside the shared registry."""
+        registry = get_registry()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        with patch('src.utils.registry.ChatGoogleGenerativeAI'), \
+                patch.object(registry, "get_tavily_client",
+                             return_value=TavilyClient(api_key="test", api_base_url=server.url)), \
+                patch.object(registry, "get_async_tavily_client",
+                             return_value=AsyncTavilyClient(api_key="test", api_base_url=server.url)), \
+                patch.object(registry, "get_search_cache", return_value=cache or SearchCache(self.path)):
+            return SearchChain(**kwargs)
+
+    def test_ttl_and_persistence(self):
+        cache = SearchCache(self.path, ttl=60)
+        key = cache.make_key("Statute of limitations in NY?", max_results=5)
+        self.assertEqual(key, cache.make_key("statute of limitations in ny", max_results=5))
+        self.assertNotEqual(key, cache.make_key("statute of limitations in ny", max_results=3))
+        cache.set(key, {"results": []})
+        self.assertEqual(SearchCache(self.path, ttl=60).get(key), {"results": []})
+
+        cache._conn.execute("UPDATE searches SET created_at = created_at - 120")
+        self.assertIsNone(cache.get(key))
+
+    def test_failed_fetch_is_not_cached(self):
+        cache = SearchCache(self.path)
+
+        def fail():
+            raise TimeoutError("upstream")
+
+        with self.assertRaises(TimeoutError):
+            cache.get_or_fetch("key", fail)
+        self.assertEqual(cache.get_or_fetch("key", lambda: {"results": [1]}), {"results": [1]})
+
+    def test_repeated_search_served_from_cache(self):
+        with FakeTavilyServer() as server:
+            chain = self._chain(server, max_results=3)
+            first = chain.search("adverse possession in Texas")
+            second = chain.search("Adverse possession in Texas?")
+            self.assertEqual(first, second)
+            self.assertEqual(len(first["search_results"]), 3)
+            self.assertEqual(len(server.requests), 1)
+            self.assertEqual(server.requests[0]["max_results"], 3)
+
+    def test_concurrent_identical_searches_coalesced(self):
+        cache = SearchCache(self.path)
+        with FakeTavilyServer(delay=0.3) as server:
+            chain = self._chain(server, cache=cache)
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda _: chain.search("fair use doctrine"), range(8)))
+            self.assertEqual(len(server.requests), 1)
+            self.assertTrue(all(result == results[0] for result in results))
+            self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_late_arrivals_never_refetch(self):
+        # Callers keep arriving around the moment the leader stores its result and retires its flight
+        cache = SearchCache(self.path)
+        fetches = []
+
+        def fetch():
+            fetches.append(1)
+            time.sleep(0.05)
+            return {"results": [1]}
+
+        def call(i):
+            time.sleep(i * 0.005)
+            return cache.get_or_fetch("key", fetch)
+
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(call, range(20)))
+        self.assertEqual(len(fetches), 1)
+        self.assertTrue(all(result == {"results": [1]} for result in results))
+        stats = cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"] + stats["coalesced"], 20)
+
+    def test_concurrent_async_searches_coalesced(self):
+        with FakeTavilyServer(delay=0.2) as server:
+            chain = self._chain(server)
+
+            async def run():
+                return await asyncio.gather(*(chain.asearch("fair use doctrine") for _ in range(5)))
+
+            results = asyncio.run(run())
+            self.assertEqual(len(server.requests), 1)
+            self.assertTrue(all(result["search_performed"] for result in results))
+
+    def test_timeout_and_result_limit(self):
+        with FakeTavilyServer(delay=1.0) as server:
+            chain = self._chain(server, timeout=0.2)
+            started = time.monotonic()
+            result = chain.search("slow query")
+            self.assertLess(time.monotonic() - started, 0.9)
+            self.assertFalse(result["search_performed"])
+
+        with FakeTavilyServer(ignore_max_results=True) as server:
+            chain = self._chain(server, max_results=2)
+            self.assertEqual(len(chain.search("any query")["search_results"]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+import tempfile
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import os
+from src.utils.document_loader import DocumentLoader
+from src.data.manifest import IngestionManifest
+
+
+class TestDocumentLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        root = Path(self.temp_dir.name)
+        (root / "nested").mkdir()
+        for i in range(5):
+            (root / f"statute_{i}.txt").write_text(f"Section {i}. " + "The tenant shall pay rent. " * 100)
+        (root / "nested" / "case.txt").write_text("The court held that the lease was void.")
+        (root / "notes.md").write_text("Not a supported format.")
+
+    def test_discover_files(self):
+        files = DocumentLoader.discover_files(self.temp_dir.name)
+        self.assertEqual(len(files), 6)
+        self.assertTrue(all(path.endswith(".txt") for path in files))
+
+    def test_ingest_directory_streams_bounded_batches(self):
+        batches, progress = [], []
+        report = DocumentLoader().ingest_directory(
+            self.temp_dir.name,
+            batches.append,
+            batch_size=4,
+            progress_callback=lambda done, total, path, count: progress.append((done, total)),
+            max_workers=2
+        )
+
+        self.assertEqual(report["files"], 6)
+        self.assertEqual(report["chunks"], sum(len(batch) for batch in batches))
+        self.assertTrue(all(len(batch) <= 4 for batch in batches))
+        self.assertEqual(progress[-1], (6, 6))
+        self.assertEqual(report["empty_files"], [])
+
+    def test_load_directory_matches_sequential_ingestion(self):
+        loader = DocumentLoader()
+        sequential = []
+        loader.ingest_directory(self.temp_dir.name, sequential.extend, max_workers=1)
+        self.assertEqual(
+            sorted(chunk.page_content for chunk in loader.load_directory(self.temp_dir.name)),
+            sorted(chunk.page_content for chunk in sequential)
+        )
+
+    def test_worker_count_does_not_change_chunks(self):
+        # Non-default settings must reach the pool workers too
+        loader = DocumentLoader(chunking_mode="recursive", extract_metadata=False)
+        key = lambda chunk: (chunk.metadata["source"], chunk.page_content, sorted(chunk.metadata.items()))
+        sequential = sorted(map(key, loader.load_directory(self.temp_dir.name, max_workers=1)))
+        parallel = sorted(map(key, loader.load_directory(self.temp_dir.name, max_workers=2)))
+        self.assertEqual(parallel, sequential)
+        self.assertTrue(all(dict(metadata).keys() == {"source"} for _, _, metadata in sequential))
+
+
+    def test_manifest_sync_only_processes_changes(self):
+        root = Path(self.temp_dir.name)
+        manifest = IngestionManifest(root / "manifest.sqlite")
+        loader = DocumentLoader()
+        stored = {}
+
+        def add_batch(chunks):
+            for chunk in chunks:
+                stored[chunk.metadata["chunk_id"]] = chunk.page_content
+
+        def delete_ids(ids):
+            for chunk_id in ids:
+                stored.pop(chunk_id)
+
+        def sync():
+            return loader.ingest_directory(root, add_batch, max_workers=1,
+                                           manifest=manifest, delete_ids=delete_ids)
+
+        first = sync()
+        self.assertEqual(first["unchanged"], 0)
+        initial_chunks = len(stored)
+        self.assertEqual(first["chunks"], initial_chunks)
+
+        second = sync()
+        self.assertEqual((second["unchanged"], second["chunks"]), (6, 0))
+        self.assertEqual(len(stored), initial_chunks)
+
+        # Touched but unchanged content is not re-parsed
+        os.utime(root / "statute_0.txt", (1, 1))
+        self.assertEqual(sync()["chunks"], 0)
+
+        (root / "nested" / "case.txt").write_text("The court held that the lease was valid.")
+        os.utime(root / "nested" / "case.txt", (2, 2))
+        (root / "statute_1.txt").unlink()
+        third = sync()
+        self.assertEqual((third["modified"], third["removed"], third["chunks"]), (1, 1, 1))
+        self.assertIn("The court held that the lease was valid.", stored.values())
+        self.assertNotIn("The court held that the lease was void.", stored.values())
+        self.assertEqual(len(manifest), 5)
+
+    def test_failed_reparse_keeps_previous_chunks(self):
+        root = Path(self.temp_dir.name)
+        manifest = IngestionManifest(root / "manifest.sqlite")
+        loader = DocumentLoader()
+        stored = {}
+
+        def add_batch(chunks):
+            for chunk in chunks:
+                stored[chunk.metadata["chunk_id"]] = chunk.page_content
+
+        def delete_ids(ids):
+            for chunk_id in ids:
+                stored.pop(chunk_id)
+
+        def sync():
+            return loader.ingest_directory(root, add_batch, max_workers=1,
+                                           manifest=manifest, delete_ids=delete_ids)
+
+        sync()
+        case_path = os.path.abspath(root / "nested" / "case.txt")
+        before = manifest.entries(os.path.join(os.path.abspath(root), ""))[case_path]
+
+        # Not valid UTF-8, so the text loader raises
+        (root / "nested" / "case.txt").write_bytes(b"\xff\xfe\xfa invalid")
+        report = sync()
+        self.assertEqual(report["failed_files"], [case_path])
+        self.assertEqual((report["modified"], report["empty_files"]), (0, []))
+        self.assertIn("The court held that the lease was void.", stored.values())
+        self.assertEqual(manifest.entries(os.path.join(os.path.abspath(root), ""))[case_path], before)
+
+        # The file is retried once it parses again
+        (root / "nested" / "case.txt").write_text("The court held that the lease was valid.")
+        self.assertEqual(sync()["modified"], 1)
+        self.assertIn("The court held that the lease was valid.", stored.values())
+        self.assertNotIn("The court held that the lease was void.", stored.values())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import threading
+import time
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.registry import ComponentRegistry
+
+
+class TestComponentRegistry(unittest.TestCase):
+
+    def test_component_built_once(self):
+        registry = ComponentRegistry()
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.01)
+            return object()
+
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(registry.get_or_create("vector_store", factory)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_distinct_keys_and_reset(self):
+        registry = ComponentRegistry()
+        first = registry.get_or_create(("llm", "model", 0.2), object)
+        second = registry.get_or_create(("llm", "model", 0.7), object)
+        self.assertIsNot(first, second)
+        self.assertIs(registry.get_or_create(("llm", "model", 0.2), object), first)
+
+        registry.reset()
+        self.assertIsNot(registry.get_or_create(("llm", "model", 0.2), object), first)
+
+
+if __name__ == '__main__':
+    unittest.main()
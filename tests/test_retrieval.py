@@ -0,0 +1,368 @@
+import unittest
+import tempfile
+import sys
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from langchain_core.documents import Document
+from src.data.lexical_index import LexicalIndex, chunk_id
+from src.data.dedup import ChunkDeduplicator
+from src.data.metadata_index import BitmapIndex
+from src.utils.legal_metadata import extract_metadata, infer_filters
+from src.utils.context_packer import ContextPacker, estimate_tokens, fit_text, text_overlap
+from src.utils.rank_fusion import reciprocal_rank_fusion
+from src.utils.registry import get_registry
+from src.chains.retrieval_chain import RetrievalChain
+
+CHUNKS = [
+    Document(page_content="Claims under 42 U.S.C. § 1983 require action under color of state law.",
+             metadata={"source": "civil_rights.pdf"}),
+    Document(page_content="Roe v. Wade was overruled by Dobbs v. Jackson Women's Health Organization.",
+             metadata={"source": "cases.pdf"}),
+    Document(page_content="A contract requires offer, acceptance and consideration.",
+             metadata={"source": "contracts.pdf"}),
+]
+
+
+class TestLexicalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = Path(self.temp_dir.name) / "lexical.sqlite"
+
+    def test_citation_lookup(self):
+        index = LexicalIndex(self.path, on_change=None)
+        self.assertEqual(index.add_documents(CHUNKS), 3)
+
+        results = index.search("section 1983 claim under 42 U.S.C.", k=2)
+        self.assertEqual(results[0][0].metadata["source"], "civil_rights.pdf")
+        self.assertEqual(index.search("Roe v. Wade", k=1)[0][0].metadata["source"], "cases.pdf")
+        self.assertEqual(index.search("unrelated gibberish"), [])
+
+    def test_incremental_and_persistent(self):
+        index = LexicalIndex(self.path, on_change=None)
+        index.add_documents(CHUNKS[:2])
+        self.assertEqual(index.add_documents(CHUNKS), 1)  # Already indexed chunks are skipped
+        index.remove([chunk_id(CHUNKS[1])])
+
+        reopened = LexicalIndex(self.path, on_change=None)
+        self.assertEqual(len(reopened), 2)
+        self.assertEqual(reopened.search("Roe v. Wade"), [])
+        self.assertEqual(reopened.search("consideration", k=1)[0][0].page_content, CHUNKS[2].page_content)
+
+        # A removed chunk can be indexed again
+        reopened.add_documents([CHUNKS[1]])
+        self.assertEqual(reopened.search("Dobbs", k=1)[0][0].metadata["source"], "cases.pdf")
+
+    def test_update_metadata_moves_chunk_between_filters(self):
+        index = LexicalIndex(self.path, on_change=None)
+        index.add_documents(CHUNKS)
+        cid = chunk_id(CHUNKS[1])
+        self.assertEqual(index.update_metadata({cid: {"source": "dobbs.pdf", "chunk_id": cid,
+                                                      "jurisdiction": "Federal"}}), 1)
+
+        self.assertEqual(len(index), 3)
+        results = index.search("Dobbs", k=3, filter={"jurisdiction": "Federal"})
+        self.assertEqual([doc.metadata["source"] for doc, _ in results], ["dobbs.pdf"])
+        self.assertEqual(LexicalIndex(self.path, on_change=None).search("Dobbs", k=1)[0][0].metadata["source"],
+                         "dobbs.pdf")
+
+
+CLAUSE = (
+    "Each party shall hold the other party's Confidential Information in strict confidence, shall not "
+    "disclose it to any third party except its employees and advisers who need to know it for the "
+    "Purpose and are bound by written obligations no less protective than these, and shall use it "
+    "solely for the Purpose. These obligations survive termination of this Agreement for five years "
+    "and do not apply to information that is or becomes public through no fault of the receiving party."
+)
+
+
+class TestChunkDeduplicator(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.path = Path(self.temp_dir.name) / "dedup.sqlite"
+
+    def _chunk(self, text, source, member, **metadata):
+        return Document(page_content=text, metadata={"source": source, "chunk_id": member, **metadata})
+
+    def test_exact_and_near_duplicates_stored_once(self):
+        deduplicator = ChunkDeduplicator(self.path)
+        chunks = [
+            self._chunk(CLAUSE, "nda_a.pdf", "a:0"),
+            self._chunk(CLAUSE.upper().replace(" ", "  "), "nda_b.pdf", "b:0"),
+            self._chunk(CLAUSE.replace("five years", "three years"), "nda_c.pdf", "c:0"),
+            self._chunk("Payment is due within thirty days of the invoice date.", "msa.pdf", "d:0"),
+        ]
+
+        unique = deduplicator.add(chunks)
+        self.assertEqual([chunk.metadata["chunk_id"] for chunk in unique], ["a:0", "d:0"])
+        self.assertEqual(deduplicator.sources("a:0"), ["nda_a.pdf", "nda_b.pdf", "nda_c.pdf"])
+
+    def test_stored_chunk_kept_until_last_source_removed(self):
+        deduplicator = ChunkDeduplicator(self.path)
+        deduplicator.add([self._chunk(CLAUSE, "nda_a.pdf", "a:0"), self._chunk(CLAUSE, "nda_b.pdf", "b:0")])
+
+        self.assertEqual(deduplicator.remove(["a:0"]).emptied, [])
+        reopened = ChunkDeduplicator(self.path)
+        self.assertEqual(reopened.sources("a:0"), ["nda_b.pdf"])
+        self.assertEqual(reopened.remove(["b:0"]).emptied, ["a:0"])
+
+        # With the group gone, the clause is stored again
+        self.assertEqual(len(reopened.add([self._chunk(CLAUSE, "nda_c.pdf", "c:0")])), 1)
+
+    def test_stored_chunk_repointed_when_its_source_goes_away(self):
+        deduplicator = ChunkDeduplicator(self.path)
+        deduplicator.add([self._chunk(CLAUSE, "nda_a.pdf", "a:0", doc_type="contract"),
+                          self._chunk(CLAUSE, "nda_b.pdf", "b:0", doc_type="contract")])
+
+        removal = deduplicator.remove(["b:0"])
+        self.assertEqual(removal, ([], {}))  # The stored chunk still stands for nda_a.pdf
+        deduplicator.add([self._chunk(CLAUSE, "nda_c.pdf", "c:0", doc_type="contract")])
+
+        removal = ChunkDeduplicator(self.path).remove(["a:0"])
+        self.assertEqual(removal.emptied, [])
+        self.assertEqual(removal.repointed,
+                         {"a:0": {"source": "nda_c.pdf", "chunk_id": "a:0", "doc_type": "contract"}})
+
+    def test_duplicates_with_different_filter_fields_stored_separately(self):
+        deduplicator = ChunkDeduplicator(self.path)
+        unique = deduplicator.add([
+            self._chunk(CLAUSE, "ny_nda.pdf", "a:0", jurisdiction="New York"),
+            self._chunk(CLAUSE, "tx_nda.pdf", "b:0", jurisdiction="Texas"),
+            self._chunk(CLAUSE.replace("five years", "three years"), "tx_nda_2.pdf", "c:0", jurisdiction="Texas"),
+        ])
+        self.assertEqual([chunk.metadata["chunk_id"] for chunk in unique], ["a:0", "b:0"])
+        self.assertEqual(deduplicator.sources("b:0"), ["tx_nda.pdf", "tx_nda_2.pdf"])
+
+
+class TestHybridRetrieval(unittest.TestCase):
+
+    def test_reciprocal_rank_fusion(self):
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+        self.assertEqual([key for key, _ in fused], ["a", "c", "b"])
+
+    @patch('src.utils.registry.ChatGoogleGenerativeAI')
+    def test_lexical_match_missed_by_vectors_is_retrieved(self, mock_llm):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            index = LexicalIndex(Path(temp_dir) / "lexical.sqlite", on_change=None)
+            index.add_documents(CHUNKS)
+            vector_store = MagicMock()
+            vector_store.similarity_search_with_score.return_value = [(CHUNKS[2], 0.4)]
+
+            registry = get_registry()
+            registry.reset()
+            deduplicator = ChunkDeduplicator(Path(temp_dir) / "dedup.sqlite")
+            with patch.object(registry, "get_vector_store", return_value=vector_store), \
+                    patch.object(registry, "get_lexical_index", return_value=index), \
+                    patch.object(registry, "get_deduplicator", return_value=deduplicator):
+                chain = RetrievalChain(retrieval_mode="hybrid", rerank_mode="off")
+                docs = chain.retrieve_documents("What does 42 U.S.C. § 1983 require?")
+
+            sources = [doc.metadata["source"] for doc, _ in docs]
+            self.assertIn("civil_rights.pdf", sources)
+            self.assertIn("contracts.pdf", sources)
+            self.assertEqual(docs[0][1], 0)
+            registry.reset()
+
+    @patch('src.utils.registry.ChatGoogleGenerativeAI')
+    def test_refined_queries_fused_by_chunk_id(self, mock_llm):
+        results = {
+            "original": [(CHUNKS[0], 0.2), (CHUNKS[1], 0.5)],
+            "refined": [(CHUNKS[2], 0.1), (CHUNKS[0], 0.3)],
+        }
+        vector_store = MagicMock()
+        vector_store.similarity_search_with_score.side_effect = lambda query, **kwargs: list(results[query])
+
+        registry = get_registry()
+        registry.reset()
+        self.addCleanup(registry.reset)
+        with tempfile.TemporaryDirectory() as temp_dir, \
+                patch.object(registry, "get_vector_store", return_value=vector_store), \
+                patch.object(registry, "get_deduplicator",
+                             return_value=ChunkDeduplicator(Path(temp_dir) / "dedup.sqlite")):
+            chain = RetrievalChain(retrieval_mode="vector", rerank_mode="off", metadata_filtering=False)
+            docs = chain.retrieve_documents("original", queries=["original", "refined"])
+
+        self.assertEqual(vector_store.similarity_search_with_score.call_count, 2)
+        # The chunk both queries found ranks first and appears once
+        self.assertEqual([chunk_id(doc) for doc, _ in docs],
+                         [chunk_id(CHUNKS[0]), chunk_id(CHUNKS[2]), chunk_id(CHUNKS[1])])
+        self.assertEqual(docs[0][1], 0)
+
+
+TAGGED_CHUNKS = [
+    Document(page_content="A landlord must return the security deposit within 14 days.",
+             metadata={"source": "ny_housing.pdf", "jurisdiction": "New York", "doc_type": "statute",
+                       "effective_year": 2019}),
+    Document(page_content="A landlord must return the security deposit within 21 days.",
+             metadata={"source": "ca_civil.pdf", "jurisdiction": "California", "doc_type": "statute",
+                       "effective_year": 2012}),
+    Document(page_content="The landlord withheld the security deposit; we reverse.",
+             metadata={"source": "ny_case.pdf", "jurisdiction": "New York", "doc_type": "case",
+                       "court": "appellate", "effective_year": 2022}),
+]
+
+
+class TestMetadataFiltering(unittest.TestCase):
+
+    def test_extract_metadata(self):
+        contract = (
+            "MASTER SERVICES AGREEMENT\n"
+            "This Agreement is entered into as of March 3, 2021 by and between Acme Corp. and Beta LLC "
+            "(hereinafter the Parties).\n"
+            "WHEREAS the Parties wish to cooperate;\n"
+            "12. Governing Law. This Agreement shall be governed by the laws of the State of New York.\n"
+            "IN WITNESS WHEREOF, each party has signed this Agreement."
+        )
+        self.assertEqual(extract_metadata(contract), {
+            "jurisdiction": "New York", "doc_type": "contract",
+            "effective_date": "2021-03-03", "effective_year": 2021
+        })
+
+        opinion = (
+            "UNITED STATES COURT OF APPEALS FOR THE NINTH CIRCUIT\n"
+            "Smith, Plaintiff-Appellant, v. Jones, Defendant-Appellee.\n"
+            "Filed January 12, 2018\n"
+            "We hold that the district court erred, and reverse and remand."
+        )
+        metadata = extract_metadata(opinion)
+        self.assertEqual(metadata["jurisdiction"], "Federal")
+        self.assertEqual(metadata["doc_type"], "case")
+        self.assertEqual(metadata["court"], "appellate")
+        self.assertEqual(metadata["effective_date"], "2018-01-12")
+
+        self.assertEqual(extract_metadata("Some notes about the weather."), {})
+
+    def test_infer_filters(self):
+        self.assertEqual(infer_filters("What is the security deposit statute in New York?"),
+                         {"jurisdiction": "New York", "doc_type": "statute"})
+        self.assertEqual(infer_filters("NY vs CA case law on deposits since 2020"), {
+            "jurisdiction": {"$in": ["New York", "California"]}, "doc_type": "case",
+            "effective_year": {"$gte": 2020}
+        })
+        self.assertEqual(infer_filters("West Virginia rules between 2010 and 2015"),
+                         {"jurisdiction": "West Virginia", "effective_year": {"$gte": 2010, "$lte": 2015}})
+        self.assertEqual(infer_filters("What are the elements of negligence?"), {})
+
+    def test_bitmap_index(self):
+        bitmaps = BitmapIndex(fields=("jurisdiction", "effective_year"))
+        for position, chunk in enumerate(TAGGED_CHUNKS):
+            bitmaps.add(position, chunk.metadata)
+        bitmaps.add(20, {"jurisdiction": "Texas"})
+
+        def rows(where):
+            return bitmaps.mask(where, 21).nonzero()[0].tolist()
+
+        self.assertEqual(rows({"jurisdiction": "New York"}), [0, 2])
+        self.assertEqual(rows({"jurisdiction": {"$in": ["California", "Texas"]}}), [1, 20])
+        self.assertEqual(rows({"jurisdiction": "New York", "effective_year": {"$gte": 2020}}), [2])
+        self.assertEqual(rows({"$or": [{"effective_year": {"$lt": 2015}}, {"jurisdiction": "Texas"}]}), [1, 20])
+        self.assertEqual(rows({"jurisdiction": "Ohio"}), [])
+        self.assertIsNone(bitmaps.mask({"source": "ny_case.pdf"}, 21))
+
+    def test_lexical_search_filters_before_scoring(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "lexical.sqlite"
+            LexicalIndex(path, on_change=None).add_documents(TAGGED_CHUNKS)
+            index = LexicalIndex(path, on_change=None)  # Bitmaps are rebuilt from stored metadata
+            results = index.search("landlord security deposit", k=3, filter={"jurisdiction": "California"})
+            self.assertEqual([doc.metadata["source"] for doc, _ in results], ["ca_civil.pdf"])
+            results = index.search("landlord security deposit", k=3, filter={"source": "ny_case.pdf"})
+            self.assertEqual([doc.metadata["source"] for doc, _ in results], ["ny_case.pdf"])
+
+    @patch('src.utils.registry.ChatGoogleGenerativeAI')
+    def test_inferred_filter_pushed_down_and_topped_up(self, mock_llm):
+        vector_store = MagicMock()
+        vector_store.similarity_search_with_score.side_effect = lambda query, k, filter=None: (
+            [(TAGGED_CHUNKS[0], 0.2)] if filter else [(CHUNKS[2], 0.1), (TAGGED_CHUNKS[0], 0.2)]
+        )
+        registry = get_registry()
+        registry.reset()
+        with patch.object(registry, "get_vector_store", return_value=vector_store):
+            chain = RetrievalChain(retrieval_mode="vector", rerank_mode="off")
+            with patch('src.chains.retrieval_chain.DEDUP_ENABLED', False):
+                docs = chain.retrieve_documents("How fast must a New York landlord return a deposit?")
+        registry.reset()
+
+        first_call = vector_store.similarity_search_with_score.call_args_list[0]
+        self.assertEqual(first_call.kwargs["filter"], {"jurisdiction": "New York"})
+        # The matching chunk ranks first; unfiltered results only fill the remaining slots
+        self.assertEqual([doc.metadata["source"] for doc, _ in docs], ["ny_housing.pdf", "contracts.pdf"])
+
+
+LEASE_TEXT = " ".join(
+    f"Clause {i}: the {party} shall {duty} within {i * 7} days of written notice."
+    for i, (party, duty) in enumerate(
+        [(party, duty) for party in ("tenant", "landlord", "guarantor")
+         for duty in ("repair the premises", "pay the deposit", "insure the building", "remove all fixtures")], 1)
+)
+
+
+class TestContextPacker(unittest.TestCase):
+
+    def _chunk(self, start, end, source="lease.pdf", **metadata):
+        return Document(page_content=LEASE_TEXT[start:end], metadata={"source": source, **metadata})
+
+    def test_text_overlap(self):
+        self.assertEqual(text_overlap(LEASE_TEXT[:300], LEASE_TEXT[200:500]), 100)
+        self.assertEqual(text_overlap(LEASE_TEXT[:300], LEASE_TEXT[400:700]), 0)
+
+    def test_overlapping_chunks_merged_once(self):
+        other = Document(page_content="Rent is due on the first day of each month.", metadata={"source": "other.pdf"})
+        docs = [(self._chunk(200, 500), 0.1), (self._chunk(0, 300), 0.3), (other, 0.5)]
+        passages = ContextPacker().merge(docs)
+        self.assertEqual(len(passages), 2)
+        self.assertEqual(passages[0].document.page_content, LEASE_TEXT[:500])
+        self.assertEqual((passages[0].score, passages[0].chunks), (0.1, 2))
+        self.assertEqual(passages[1].document.metadata["source"], "other.pdf")
+
+        # Text repeated in another source is only shown once
+        duplicate = [(self._chunk(0, 300), 0.1), (self._chunk(50, 150, "copy.pdf"), 0.2)]
+        self.assertEqual(len(ContextPacker().merge(duplicate)), 1)
+
+    def test_adjacent_chunks_merged_by_offset(self):
+        docs = [(self._chunk(100, 200, start_index=100), 0.2), (self._chunk(0, 100, start_index=0), 0.1),
+                (self._chunk(400, 500, start_index=400), 0.3)]
+        passages = ContextPacker().merge(docs)
+        self.assertEqual([passage.chunks for passage in passages], [2, 1])
+        self.assertEqual(passages[0].document.page_content, LEASE_TEXT[:100] + "\n" + LEASE_TEXT[100:200])
+
+    def test_packed_context_fits_budget(self):
+        docs = [(Document(page_content=f"Lease {i}. {LEASE_TEXT}", metadata={"source": f"lease_{i}.pdf"}), i / 10)
+                for i in range(10)]
+        context = RetrievalChain.format_documents(docs, max_tokens=400)
+        self.assertLessEqual(estimate_tokens(context), 400)
+        self.assertTrue(context.startswith("Document 1:\nSource: lease_0.pdf"))
+        self.assertIn("[...]", context)
+
+        packed = ContextPacker(max_tokens=10_000).pack(docs[:2], lambda number, passage, content: content)
+        self.assertEqual(packed, [doc.page_content for doc, _ in docs[:2]])
+
+    def test_passage_that_does_not_fit_is_skipped_not_final(self):
+        contents = [" ".join(f"{word}{i}" for i in range(count))
+                    for word, count in (("rent", 20), ("deposit", 200), ("notice", 15))]
+        docs = [(Document(page_content=content, metadata={"source": f"lease_{i}.pdf"}), i / 10)
+                for i, content in enumerate(contents)]
+        header = " ".join(["header"] * 10)
+        packer = ContextPacker(max_tokens=60, min_passage_tokens=25, token_counter=lambda text: len(text.split()))
+
+        packed = packer.pack(docs, lambda number, passage, content: f"{header} {content}")
+        # 30 tokens remain after the first passage: too few to cut the second down usefully, enough for the third
+        self.assertEqual(packed, [f"{header} {contents[0]}", f"{header} {contents[2]}"])
+
+    def test_fit_text_cuts_at_sentence(self):
+        self.assertEqual(fit_text("Short.", 10), "Short.")
+        cut = fit_text(LEASE_TEXT, 40)
+        self.assertLessEqual(estimate_tokens(cut), 40)
+        self.assertTrue(cut.endswith("notice. [...]"))
+
+
+if __name__ == '__main__':
+    unittest.main()
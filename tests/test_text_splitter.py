@@ -0,0 +1,104 @@
+import unittest
+import tempfile
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.utils.text_splitter import (
+    CLAUSE,
+    MappedTextFile,
+    TextChunks,
+    find_boundaries,
+    split_offsets,
+    split_text,
+)
+from src.utils.legal_chunker import LegalChunker
+from langchain_core.documents import Document
+
+CONTRACT = (
+    "MASTER SERVICES AGREEMENT\n\n"
+    "1. Definitions. The following terms apply throughout.\n"
+    "1.1 \"Services\" means the work described in each Statement of Work.\n"
+    "1.2(a) The Customer shall pay all undisputed invoices. Payment is due in thirty days.\n"
+    "(b) Late payments accrue interest at one percent per month.\n\n"
+    "2. Term. This Agreement lasts three years. Either party may renew it by notice.\n"
+)
+
+
+def split_text_loop(text, chunk_size=1000, overlap=100):
+    chunks = []
+    start = 0
+    while start < len(text):
+        chunks.append(text[start:min(start + chunk_size, len(text))])
+        start += chunk_size - overlap
+    return chunks
+
+
+class TestTextSplitter(unittest.TestCase):
+
+    def test_split_text_matches_original_semantics(self):
+        for chunk_size, overlap in [(1000, 100), (40, 10), (17, 0)]:
+            self.assertEqual(split_text(CONTRACT, chunk_size, overlap),
+                             split_text_loop(CONTRACT, chunk_size, overlap))
+        with self.assertRaises(ValueError):
+            split_text(CONTRACT, 10, 10)
+
+    def test_clause_numbering_boundaries(self):
+        starts = [CONTRACT[position:position + 6] for position in find_boundaries(CONTRACT)[CLAUSE]]
+        self.assertEqual(starts, ["1. Def", "1.1 \"S", "1.2(a)", "(b) La", "2. Ter"])
+
+    def test_chunks_end_on_separators(self):
+        chunks = list(TextChunks(CONTRACT, split_offsets(CONTRACT, chunk_size=120, overlap=0)))
+        self.assertEqual("".join(chunks), CONTRACT)
+        self.assertTrue(all(len(chunk) <= 120 for chunk in chunks))
+        for chunk in chunks[:-1]:
+            self.assertTrue(chunk.endswith(("\n", ".")), chunk)
+
+    def test_memory_mapped_utf8(self):
+        text = "§ 1983 claims require state action. Überprüfung folgt. " * 200
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir) / "statute.txt"
+            path.write_text(text, encoding="utf-8")
+            for separators in (None, (CLAUSE,)):
+                with MappedTextFile(path, chunk_size=100, overlap=10, separators=separators) as chunks:
+                    decoded = list(chunks)
+                    self.assertTrue(all("�" not in chunk for chunk in decoded))
+                    self.assertEqual(chunks.offsets.shape[1], 2)
+
+
+STATUTE_PAGES = [
+    "ARTICLE IV\nPAYMENT\nSection 4.1 Fees. The Customer shall pay the fees in Schedule 1.\n"
+    "Section 4.2 Invoices.\n(a) Invoices are due in thirty days.\n(b) Disputed amounts:\n",
+    "(i) must be notified in writing within ten days; and\n(ii) are excluded from interest.\n"
+    "(c) Late amounts accrue interest under 42 U.S.C. 1961.\n"
+    "ARTICLE V\nTERM\nSection 5.1 This Agreement lasts three years.\n",
+]
+
+
+class TestLegalChunker(unittest.TestCase):
+
+    def _chunks(self, chunk_size):
+        pages = [Document(page_content=text, metadata={"source": "msa.pdf", "page": i})
+                 for i, text in enumerate(STATUTE_PAGES)]
+        return LegalChunker(chunk_size=chunk_size, chunk_overlap=20).split_documents(pages)
+
+    def test_chunks_follow_sections_across_pages(self):
+        chunks = self._chunks(chunk_size=400)
+        self.assertEqual([chunk.metadata["section_path"] for chunk in chunks], ["Article IV", "Article V"])
+        # Section 4.2 spans the page break but stays in one chunk
+        self.assertIn("Disputed amounts:\n(i) must be notified", chunks[0].page_content)
+        self.assertEqual([chunk.metadata["page"] for chunk in chunks], [0, 1])
+
+    def test_small_chunk_size_keeps_clause_paths(self):
+        paths = [chunk.metadata.get("section_path") for chunk in self._chunks(chunk_size=80)]
+        self.assertIn("Article IV > Section 4.2 > (b) > (ii)", paths)
+        self.assertIn("Article IV > Section 4.2 > (c)", paths)
+        # "42 U.S.C." inside a clause is not mistaken for a heading
+        self.assertFalse(any(path and "42" in path for path in paths))
+
+
+if __name__ == '__main__':
+    unittest.main()
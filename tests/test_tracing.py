@@ -0,0 +1,109 @@
+import asyncio
+import json
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from uuid import uuid4
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.utils.tracing import (
+    JsonlSpanExporter,
+    OTelFileExporter,
+    TracingCallbackHandler,
+    current_trace,
+    span,
+    submit_in_context,
+    trace,
+    traced,
+)
+
+
+class TestTracing(unittest.TestCase):
+
+    def test_spans_nest_into_a_waterfall(self):
+        with trace("query", query="q") as query_trace:
+            with span("gather", "node"):
+                with span("tavily_search", "search", cache_hit=True):
+                    pass
+            with span("research", "node"):
+                pass
+
+        rows = query_trace.waterfall()
+        self.assertEqual([(row["name"], row["depth"]) for row in rows],
+                         [("query", 0), ("gather", 1), ("tavily_search", 2), ("research", 1)])
+        self.assertTrue(rows[2]["attributes"]["cache_hit"])
+        # Offsets and durations are rounded separately, hence the slack
+        self.assertLessEqual(rows[3]["start_ms"] + rows[3]["duration_ms"], rows[0]["duration_ms"] + 0.01)
+        self.assertIsNone(current_trace())
+
+    def test_span_records_error(self):
+        with self.assertRaises(ValueError):
+            with trace("query") as query_trace:
+                with span("vector_search", "vector"):
+                    raise ValueError("index missing")
+
+        errors = {row["name"]: row["error"] for row in query_trace.waterfall()}
+        self.assertEqual(errors["vector_search"], "ValueError: index missing")
+        self.assertIsNotNone(errors["query"])
+
+    def test_span_outside_trace_is_noop(self):
+        with span("vector_search", "vector") as untraced:
+            untraced.set(cache_hit=False)
+        self.assertIsNone(current_trace())
+
+    def test_spans_follow_work_into_threads_and_tasks(self):
+        async def fetch():
+            with span("async_fetch", "search"):
+                await asyncio.sleep(0)
+
+        with ThreadPoolExecutor(max_workers=2) as executor, trace("query") as query_trace:
+            with span("gather", "node"):
+                submit_in_context(executor, traced(lambda: None, "retrieve", "branch")).result()
+                asyncio.run(fetch())
+
+        parents = {span.name: span.parent_id for span in query_trace.spans}
+        ids = {span.name: span.span_id for span in query_trace.spans}
+        self.assertEqual(parents["retrieve"], ids["gather"])
+        self.assertEqual(parents["async_fetch"], ids["gather"])
+
+    def test_callback_handler_records_token_usage(self):
+        handler = TracingCallbackHandler()
+        message = AIMessage(content="answer", usage_metadata={"input_tokens": 120, "output_tokens": 30,
+                                                              "total_tokens": 150})
+        with trace("query") as query_trace:
+            run_id = uuid4()
+            handler.on_chat_model_start({}, [[]], run_id=run_id,
+                                        invocation_params={"model": "gemini-2.0-flash"})
+            handler.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]), run_id=run_id)
+
+        self.assertEqual(query_trace.token_usage(), {"input": 120, "output": 30})
+        self.assertEqual(query_trace.spans[-1].name, "llm.gemini-2.0-flash")
+
+    def test_exporters_append_finished_traces(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            jsonl = JsonlSpanExporter(Path(temp_dir) / "traces.jsonl")
+            otel = OTelFileExporter(Path(temp_dir) / "traces.otlp.jsonl")
+            with trace("query", [jsonl, otel]):
+                with span("tavily_search", "search", results=3):
+                    pass
+
+            spans = [json.loads(line) for line in jsonl.path.read_text().splitlines()]
+            self.assertEqual([record["name"] for record in spans], ["query", "tavily_search"])
+            self.assertEqual(spans[1]["parent_id"], spans[0]["span_id"])
+
+            request = json.loads(otel.path.read_text())
+            otel_spans = request["resourceSpans"][0]["scopeSpans"][0]["spans"]
+            self.assertEqual(otel_spans[1]["parentSpanId"], otel_spans[0]["spanId"])
+            self.assertIn({"key": "results", "value": {"intValue": "3"}}, otel_spans[1]["attributes"])
+
+
+if __name__ == "__main__":
+    unittest.main()
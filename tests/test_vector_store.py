@@ -0,0 +1,196 @@
+import unittest
+import asyncio
+import tempfile
+import sys
+from pathlib import Path
+
+# Add the project root to Python path
+PROJECT_ROOT = Path(__file__).parent.parent.absolute()
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.data.vector_store import VectorStore, normalize_filter
+from src.cache.corpus_version import bump_corpus_version, get_corpus_version
+from src.cache.response_cache import ResponseCache
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+VOCABULARY = ["contract", "breach", "tenant", "lease", "patent", "copyright"]
+
+
+class BagOfWordsEmbeddings(Embeddings):
+    """Counts of a fixed vocabulary, so similar wording means similar vectors."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _embed(self, text):
+        words = text.lower().split()
+        return [float(words.count(term)) + 0.01 for term in VOCABULARY]
+
+    def embed_documents(self, texts):
+        self.calls += 1
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _documents():
+    return [
+        Document(page_content="breach of contract damages", metadata={"source": "a.pdf", "year": 2019}),
+        Document(page_content="contract formation and contract terms", metadata={"source": "a.pdf", "year": 2021}),
+        Document(page_content="tenant lease termination", metadata={"source": "b.pdf", "year": 2021}),
+        Document(page_content="patent and copyright infringement", metadata={"source": "c.pdf", "tags": ["ip"]}),
+    ]
+
+
+class VectorStoreTests:
+    """Backend-independent behaviour; subclasses provide ``_store``."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.embeddings = BagOfWordsEmbeddings()
+        self.version_path = Path(self.temp_dir.name) / "corpus_version"
+
+    def _bump(self):
+        bump_corpus_version(self.version_path)
+
+    def test_similarity_search_orders_by_distance(self):
+        store = self._store()
+        store.add_documents(_documents())
+        results = store.similarity_search_with_score("contract breach", k=2)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0].page_content, "breach of contract damages")
+        self.assertLessEqual(results[0][1], results[1][1])
+        self.assertEqual(results[0][0].metadata["source"], "a.pdf")
+
+    def test_metadata_filter(self):
+        store = self._store()
+        store.add_documents(_documents())
+        results = store.similarity_search_with_score("contract", k=4, filter={"source": "b.pdf"})
+        self.assertEqual([doc.page_content for doc, _ in results], ["tenant lease termination"])
+
+        results = store.similarity_search_with_score("contract", k=4, filter={"source": "a.pdf", "year": 2021})
+        self.assertEqual([doc.page_content for doc, _ in results], ["contract formation and contract terms"])
+
+        results = store.similarity_search_with_score(
+            "contract", k=4, filter={"$or": [{"source": "b.pdf"}, {"year": {"$lt": 2020}}]}
+        )
+        self.assertEqual(len(results), 2)
+
+    def test_batched_upsert_replaces_by_chunk_id(self):
+        store = self._store(batch_size=2)
+        documents = _documents()
+        ids = store.add_documents(documents)
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(self.embeddings.calls, 2)
+
+        store.add_documents(documents[:1])
+        self.assertEqual(store.get_collection_stats()["count"], 4)
+
+    def test_delete_and_clear(self):
+        store = self._store()
+        ids = store.add_documents(_documents())
+        store.delete(ids[:1])
+        self.assertEqual(store.get_collection_stats()["count"], 3)
+        contents = [doc.page_content for doc, _ in store.similarity_search_with_score("contract breach", k=4)]
+        self.assertNotIn("breach of contract damages", contents)
+
+        store.delete_collection()
+        self.assertEqual(store.get_collection_stats()["count"], 0)
+        store.add_documents(_documents()[:1])
+        self.assertEqual(store.get_collection_stats()["count"], 1)
+
+    def test_async_search(self):
+        store = self._store()
+        store.add_documents(_documents())
+        results = asyncio.run(store.asimilarity_search_with_score("tenant lease", k=1))
+        self.assertEqual(results[0][0].page_content, "tenant lease termination")
+
+    def test_stats_and_persistence(self):
+        self._store().add_documents(_documents())
+        stats = self._store().get_collection_stats()
+        self.assertEqual(stats["name"], "test_collection")
+        self.assertEqual(stats["count"], 4)
+
+    def test_update_metadata_keeps_vector(self):
+        store = self._store()
+        ids = store.add_documents(_documents())
+        calls = self.embeddings.calls
+        store.update_metadata({ids[0]: {"source": "d.pdf", "year": 2019}})
+
+        self.assertEqual(self.embeddings.calls, calls)
+        self.assertEqual(store.get_collection_stats()["count"], 4)
+        results = store.similarity_search_with_score("contract breach", k=4, filter={"source": "d.pdf"})
+        self.assertEqual([doc.page_content for doc, _ in results], ["breach of contract damages"])
+        self.assertAlmostEqual(results[0][1], store.similarity_search_with_score("contract breach", k=1)[0][1])
+        results = store.similarity_search_with_score("contract breach", k=4, filter={"source": "a.pdf"})
+        self.assertEqual([doc.page_content for doc, _ in results], ["contract formation and contract terms"])
+
+    def test_writes_invalidate_cached_responses(self):
+        cache = ResponseCache(path=Path(self.temp_dir.name) / "responses.sqlite",
+                              corpus_version_fn=lambda: get_corpus_version(self.version_path))
+        store = self._store()
+        cache.put("What is consideration?", {"answer": "A bargained-for exchange."})
+        store.add_documents(_documents())
+        self.assertIsNone(cache.get("What is consideration?"))
+
+        cache.put("What is consideration?", {"answer": "A bargained-for exchange."})
+        store.delete([])
+        self.assertIsNotNone(cache.get("What is consideration?"))  # Nothing was deleted
+        store.delete_collection()
+        self.assertIsNone(cache.get("What is consideration?"))
+
+
+class TestLocalVectorStore(VectorStoreTests, unittest.TestCase):
+
+    def _store(self, **kwargs):
+        return VectorStore(backend="local", collection_name="test_collection", embeddings=self.embeddings,
+                           directory=Path(self.temp_dir.name), on_change=self._bump, **kwargs)
+
+    def test_brute_force_spans_blocks(self):
+        store = VectorStore(backend="local", collection_name="test_collection", embeddings=self.embeddings,
+                            directory=Path(self.temp_dir.name), block_rows=2, on_change=self._bump)
+        store.add_documents(_documents())
+        results = store.similarity_search_with_score("patent copyright", k=1)
+        self.assertEqual(results[0][0].page_content, "patent and copyright infringement")
+        self.assertAlmostEqual(results[0][1], 0.0, places=3)
+
+    def test_indexed_fields_filtered_by_bitmaps(self):
+        documents = _documents()
+        documents[0].metadata["jurisdiction"] = "New York"
+        documents[2].metadata["jurisdiction"] = "New York"
+        self._store().add_documents(documents)
+        store = self._store()  # Bitmaps are rebuilt from stored metadata
+        self.assertTrue(store.backend._bitmaps.supports({"jurisdiction": "New York"}))
+        results = store.similarity_search_with_score("contract", k=4, filter={"jurisdiction": "New York"})
+        self.assertEqual(sorted(doc.metadata["source"] for doc, _ in results), ["a.pdf", "b.pdf"])
+
+    def test_non_scalar_metadata_is_stored_as_json(self):
+        store = self._store()
+        store.add_documents(_documents())
+        results = store.similarity_search_with_score("patent", k=1)
+        self.assertEqual(results[0][0].metadata["tags"], '["ip"]')
+
+
+class TestChromaVectorStore(VectorStoreTests, unittest.TestCase):
+
+    def _store(self, **kwargs):
+        return VectorStore(backend="chroma", collection_name="test_collection", embeddings=self.embeddings,
+                           persist_directory=self.temp_dir.name, on_change=self._bump, **kwargs)
+
+
+class TestNormalizeFilter(unittest.TestCase):
+
+    def test_wraps_multiple_keys_in_and(self):
+        self.assertIsNone(normalize_filter({}))
+        self.assertEqual(normalize_filter({"source": "a"}), {"source": "a"})
+        self.assertEqual(normalize_filter({"source": "a", "year": 2020}),
+                         {"$and": [{"source": "a"}, {"year": 2020}]})
+        self.assertEqual(normalize_filter({"year": {"$gte": 2010, "$lte": 2015}}),
+                         {"$and": [{"year": {"$gte": 2010}}, {"year": {"$lte": 2015}}]})
+
+
+if __name__ == '__main__':
+    unittest.main()